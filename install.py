@@ -9,7 +9,8 @@ mejores prácticas de HyDE para módulos waybar.
 Características:
 - Detecta automáticamente el nombre de usuario
 - Busca o crea el layout específico del usuario (usuario.jsonc)
-- Instala scripts en ~/.local/bin/
+- Instala la lógica precompilada (.pyc) en ~/.local/lib/todolist/ y
+  lanzadores mínimos en ~/.local/bin/
 - Crea la configuración del módulo en waybar
 - Actualiza automáticamente includes.json
 - Integra el módulo en el layout del usuario
@@ -18,19 +19,33 @@ Características:
 import os
 import shutil
 import json
+import py_compile
 import subprocess
 import sys
 import re
 from pathlib import Path
 from getpass import getuser
 
+# Lanzador de ~/.local/bin: waybar lo ejecuta cada pocos segundos. Un script
+# ejecutado como __main__ se recompila en cada arranque; el módulo importado
+# desde ~/.local/lib/todolist usa su .pyc. -I ignora PYTHON* y el site del
+# usuario y -S no importa site (la lógica solo usa la biblioteca estándar)
+LANZADOR = """#!{python} -IS
+# Generado por install.py: la lógica está en {lib}
+import sys
+sys.path.insert(0, {lib!r})
+from {modulo} import main
+main()
+"""
+
 class HyDETodolistInstaller:
-    def __init__(self):
+    def __init__(self, follow=False):
         self.user = getuser()
         self.project_dir = Path(__file__).parent
         self.home = Path.home()
         self.config_waybar = self.home / ".config" / "waybar"
         self.local_bin = self.home / ".local" / "bin"
+        self.local_lib = self.home / ".local" / "lib" / "todolist"
         self.modules_dir = self.config_waybar / "modules"
         self.layouts_dir = self.config_waybar / "layouts"
         self.includes_file = self.config_waybar / "includes" / "includes.json"
@@ -38,10 +53,28 @@ class HyDETodolistInstaller:
         # Layout específico del usuario
         self.user_layout = self.layouts_dir / f"{self.user}.jsonc"
         
-        # Archivos del módulo todolist
+        # Programas del módulo todolist: su lógica va precompilada a
+        # ~/.local/lib/todolist/ y en ~/.local/bin/ queda un lanzador
         self.scripts = [
             "scripts/current.py",
-            "scripts/choose_and_check.py"
+            "scripts/choose_and_check.py",
+            "scripts/todolistctl.py"
+        ]
+
+        # Módulos de apoyo importados por los programas (también precompilados)
+        self.modules = [
+            "scripts/todolist_core.py",
+            "scripts/todolist_cache.py",
+            "scripts/todolist_incremental.py",
+            "scripts/todolist_escritura.py",
+            "scripts/todolist_render.py",
+            "scripts/todolist_indice.py",
+            "scripts/todolist_frecencia.py",
+            "scripts/todolist_agregado.py",
+            "scripts/todolist_servidor.py",
+            "scripts/todolist_runtime.py",
+            "scripts/todolist_lote.py",
+            "scripts/todolist_watcher.py"
         ]
         
         # Configuración del módulo
@@ -57,6 +90,15 @@ class HyDETodolistInstaller:
             }
         }
 
+        # Modo continuo: un solo proceso que imprime solo cuando cambia el estado
+        self.follow = follow
+        if follow:
+            module = self.module_config["custom/todolist"]
+            module["exec"] = f'{self.local_bin / "current.py"} --follow'
+            del module["interval"]
+            # Clic central: marcar la tarea de la barra vía el servidor residente
+            module["on-click-middle"] = f'{self.local_bin / "todolistctl.py"} next'
+
     def check_dependencies(self):
         """Verificar dependencias necesarias"""
         print("🔍 Verificando dependencias...")
@@ -89,6 +131,7 @@ class HyDETodolistInstaller:
         
         directories = [
             self.local_bin,
+            self.local_lib,
             self.modules_dir,
             self.layouts_dir,
             self.config_waybar / "includes",
@@ -100,16 +143,17 @@ class HyDETodolistInstaller:
             print(f"   ✅ {directory}")
 
     def install_scripts(self):
-        """Instalar scripts en ~/.local/bin/"""
+        """Instalar la lógica precompilada en ~/.local/lib/todolist/ y los lanzadores en ~/.local/bin/"""
         print("📜 Instalando scripts...")
         
         missing_scripts = []
+        self.local_lib.mkdir(parents=True, exist_ok=True)
         
-        for script in self.scripts:
+        for script in self.scripts + self.modules:
             src = self.project_dir / script
             # Solo usar el nombre del archivo para el destino, no la ruta completa
             script_name = Path(script).name
-            dst = self.local_bin / script_name
+            dst = self.local_lib / script_name
             
             if not src.exists():
                 print(f"   ❌ Script no encontrado: {src}")
@@ -124,12 +168,34 @@ class HyDETodolistInstaller:
             new_path = f'Path.home() / ".local" / "share" / "todolist" / "todolist.md"'
             content = content.replace(old_path, new_path)
             
-            # Escribir script actualizado
             dst.write_text(content, encoding='utf-8')
-            dst.chmod(0o755)
+            dst.chmod(0o644)
+            
+            # Precompilar ahora: los lanzadores corren con -I y nunca tienen
+            # que escribir el .pyc en el primer sondeo de waybar
+            try:
+                py_compile.compile(str(dst), doraise=True)
+            except py_compile.PyCompileError as e:
+                print(f"   ❌ No se pudo compilar {dst}: {e.msg}")
+                missing_scripts.append(script)
+                continue
+            
+            # Copias sueltas de instalaciones anteriores en ~/.local/bin/
+            old_copy = self.local_bin / script_name
+            if script in self.modules and old_copy.exists():
+                old_copy.unlink()
             
             print(f"   ✅ {script} → {dst}")
         
+        for script in self.scripts:
+            launcher = self.local_bin / Path(script).name
+            launcher.write_text(LANZADOR.format(
+                python=sys.executable, lib=str(self.local_lib), modulo=Path(script).stem
+            ), encoding='utf-8')
+            launcher.chmod(0o755)
+            
+            print(f"   ✅ Lanzador {launcher} (python -IS)")
+        
         if missing_scripts:
             print(f"   ⚠️  Scripts faltantes: {', '.join(missing_scripts)}")
             return False
@@ -351,13 +417,18 @@ class HyDETodolistInstaller:
         print(f"   👤 Usuario detectado: {self.user}")
         print(f"   📄 Layout utilizado: {self.user_layout}")
         print(f"   📜 Scripts instalados en: {self.local_bin}")
+        print(f"   📦 Lógica precompilada en: {self.local_lib}")
         print(f"   📁 Datos de tareas en: ~/.local/share/todolist/")
         print(f"   🧩 Módulo waybar: custom/todolist")
+        if self.follow:
+            print(f"   ⚡ Modo continuo: current.py --follow (sin interval)")
         print()
         print("🎮 Cómo usar:")
         print("   • El módulo aparecerá automáticamente en waybar")
         print("   • Click izquierdo: Abrir interfaz rofi")
         print("   • Click derecho: Abrir interfaz rofi")
+        if self.follow:
+            print("   • Click central: Marcar la tarea mostrada (todolistctl.py next)")
         print("   • Tooltip: Ver estructura completa de tareas")
         print()
         print("📝 Editar tareas:")
@@ -365,6 +436,7 @@ class HyDETodolistInstaller:
         print()
         print("🔧 Comandos directos:")
         print(f"   {self.local_bin}/current.py                    # Ver primera tarea")
+        print(f"   {self.local_bin}/current.py --follow           # Salida continua para waybar")
         print(f"   {self.local_bin}/current.py \"nombre tarea\"     # Marcar tarea")
         print(f"   {self.local_bin}/choose_and_check.py           # Interfaz rofi")
         print()
@@ -406,6 +478,23 @@ class HyDETodolistInstaller:
             print(f"❌ Error durante la instalación: {e}")
             sys.exit(1)
 
-if __name__ == "__main__":
-    installer = HyDETodolistInstaller()
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Instalar módulo todolist para HyDE"
+    )
+
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Configurar waybar con current.py --follow (proceso continuo, sin interval)"
+    )
+
+    args = parser.parse_args()
+
+    installer = HyDETodolistInstaller(follow=args.follow)
     installer.run()
+
+if __name__ == "__main__":
+    main()
@@ -142,6 +142,7 @@ class ModuleRestarter:
         verificaciones = [
             (Path.home() / ".local" / "bin" / "current.py", "Script current.py"),
             (Path.home() / ".local" / "bin" / "choose_and_check.py", "Script choose_and_check.py"),
+            (Path.home() / ".local" / "lib" / "todolist" / "current.py", "Lógica precompilada"),
             (Path.home() / ".config" / "waybar" / "modules" / "custom-todolist.jsonc", "Módulo waybar"),
             (Path.home() / ".local" / "share" / "todolist" / "todolist.md", "Archivo de tareas")
         ]
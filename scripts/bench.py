@@ -0,0 +1,705 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del módulo todolist-tree
+===================================
+
+Mide el rendimiento de las piezas internas sobre archivos de tareas sintéticos.
+
+Uso:
+    ./scripts/bench.py incremental --tareas 20000
+    ./scripts/bench.py memoria --tareas 200000
+    ./scripts/bench.py tooltip --tareas 20000
+    ./scripts/bench.py render --tareas 20000
+    ./scripts/bench.py sondeo --archivos 50000
+    ./scripts/bench.py latencia --tareas 2000
+    ./scripts/bench.py arranque --repeticiones 30 --umbral-ms 60
+    ./scripts/bench.py suite --tamanos 100,10000,1000000 --salida antes.json
+    ./scripts/bench.py comparar antes.json despues.json --umbral 10
+"""
+
+import argparse
+import json
+import random
+import os
+import platform
+import resource
+import select
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from todolist_compacto import ArbolCompacto
+from todolist_core import (
+    buscar_primera_tarea_pendiente, buscar_primera_tarea_pendiente_lazy, calcular_ids,
+    generar_tooltip, generar_tooltip_acotado, listar_tareas_pendientes, marcar_tarea,
+    parsear_tareas
+)
+from todolist_incremental import ArbolIncremental
+from todolist_indice import actualizar_indice, archivos_con_tareas
+from todolist_render import RenderizadorMemo
+
+def generar_lineas(tareas, profundidad=3, ramas=5, completadas=0.3, tabs=False, semilla=0):
+    """
+    Generar un markdown de tareas sintético con `tareas` checkboxes.
+    Cada tarea tiene hasta `ramas` hijos y el árbol no pasa de `profundidad`.
+    """
+    rnd = random.Random(semilla)
+    unidad = "\t" if tabs else "    "
+    lineas = ["# Tareas sintéticas\n", "\n"]
+    contador = 0
+
+    def rama(nivel):
+        nonlocal contador
+        while contador < tareas:
+            check = "x" if rnd.random() < completadas else " "
+            lineas.append(f"{unidad * nivel}- [{check}] Tarea {contador} nivel {nivel}\n")
+            contador += 1
+            if nivel + 1 < profundidad and rnd.random() < 0.5:
+                for _ in range(rnd.randint(1, ramas)):
+                    if contador >= tareas:
+                        return
+                    rama(nivel + 1)
+            if nivel > 0:
+                return
+
+    rama(0)
+    return lineas
+
+def medir(funcion, repeticiones):
+    """Tiempo medio en milisegundos de `repeticiones` llamadas"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+def bench_incremental(args):
+    """Reparseo completo frente a incremental para ediciones típicas"""
+    base = generar_lineas(args.tareas, tabs=args.tabs)
+    rnd = random.Random(1)
+    medio = len(base) // 2
+
+    def alternar(lineas):
+        nuevas = list(lineas)
+        i = next(i for i in range(medio, len(nuevas)) if "- [" in nuevas[i])
+        nuevas[i] = nuevas[i].replace("[ ]", "[x]", 1) if "[ ]" in nuevas[i] else nuevas[i].replace("[x]", "[ ]", 1)
+        return nuevas
+
+    def insertar(lineas):
+        nuevas = list(lineas)
+        nuevas.insert(medio, "    - [ ] Tarea insertada\n")
+        return nuevas
+
+    def mover(lineas):
+        nuevas = list(lineas)
+        i = rnd.randrange(2, len(nuevas) - 40)
+        bloque = nuevas[i:i + 20]
+        del nuevas[i:i + 20]
+        j = rnd.randrange(2, len(nuevas))
+        nuevas[j:j] = bloque
+        return nuevas
+
+    print(f"📊 Reparseo incremental ({args.tareas} tareas, {len(base)} líneas)")
+    print(f"   {'edición':<12} {'completo ms':>12} {'incremental ms':>15} {'reenlazados':>12}")
+
+    for nombre, editar in (("alternar", alternar), ("insertar", insertar), ("mover", mover)):
+        ediciones = [editar(base) for _ in range(args.repeticiones)]
+
+        completo = medir(lambda: parsear_tareas(ediciones[0]), args.repeticiones)
+
+        # Cada edición parte de un árbol recién construido sobre la base
+        arboles = [ArbolIncremental(base) for _ in ediciones]
+        inicio = time.perf_counter()
+        for arbol, edicion in zip(arboles, ediciones):
+            arbol.actualizar(edicion)
+        incremental = (time.perf_counter() - inicio) * 1000 / len(ediciones)
+        reenlazados = sum(a.nodos_reenlazados for a in arboles) // len(arboles)
+
+        print(f"   {nombre:<12} {completo:>12.2f} {incremental:>15.2f} {reenlazados:>12}")
+
+def rss_kb():
+    """Memoria residente actual del proceso en KB (Linux)"""
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for linea in f:
+            if linea.startswith("VmRSS:"):
+                return int(linea.split()[1])
+    return 0
+
+def bench_rss_hijo(args):
+    """Proceso hijo de `memoria`: parsear con una representación y medir"""
+    lineas = generar_lineas(args.tareas, profundidad=args.profundidad, tabs=args.tabs)
+    buffer = "".join(lineas)
+    antes = rss_kb()
+    inicio = time.perf_counter()
+    if args.representacion == "nodo":
+        arbol = parsear_tareas(lineas)
+    else:
+        arbol = ArbolCompacto(buffer)
+    ms = (time.perf_counter() - inicio) * 1000
+    print(json.dumps({"ms": ms, "rss_kb": rss_kb() - antes, "nodos": len(arbol)}))
+
+def bench_memoria(args):
+    """RSS y tiempo de parseo: lista de Nodo frente a ArbolCompacto"""
+    print(f"📊 Memoria del árbol ({args.tareas} tareas, profundidad {args.profundidad})")
+    print(f"   {'representación':<16} {'parseo ms':>10} {'RSS MB':>8} {'bytes/nodo':>11}")
+
+    for representacion in ("nodo", "compacto"):
+        # Un proceso limpio por representación para que el RSS no se contamine
+        cmd = [
+            sys.executable, __file__, "_rss", representacion,
+            "--tareas", str(args.tareas), "--profundidad", str(args.profundidad)
+        ]
+        if args.tabs:
+            cmd.append("--tabs")
+        resultado = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+        por_nodo = resultado["rss_kb"] * 1024 / max(resultado["nodos"], 1)
+        print(f"   {representacion:<16} {resultado['ms']:>10.1f} "
+              f"{resultado['rss_kb'] / 1024:>8.1f} {por_nodo:>11.0f}")
+
+def bench_tooltip(args):
+    """Tooltip completo frente a acotado: tiempo de render y tamaño"""
+    nodos = parsear_tareas(generar_lineas(args.tareas, profundidad=args.profundidad,
+                                          completadas=args.completadas))
+    pendientes = sum(1 for n in nodos if not n.checked)
+    print(f"📊 Tooltip ({args.tareas} tareas, {pendientes} pendientes)")
+    print(f"   {'render':<28} {'ms':>8} {'líneas':>8} {'KB':>8}")
+
+    variantes = [("completo", lambda: generar_tooltip(nodos))]
+    for presupuesto in ((40, 4096, 5), (100, 16384, 3), (20, 2048, 1)):
+        variantes.append((f"acotado {presupuesto}",
+                          lambda p=presupuesto: generar_tooltip_acotado(nodos, *p)))
+
+    for nombre, render in variantes:
+        tooltip = render()
+        ms = medir(render, args.repeticiones)
+        print(f"   {nombre:<28} {ms:>8.2f} {tooltip.count(chr(10)) + 1:>8} "
+              f"{len(tooltip.encode('utf-8')) / 1024:>8.1f}")
+
+def bench_render(args):
+    """Render directo frente a memoizado tras alternar una tarea"""
+    arbol = ArbolIncremental(generar_lineas(args.tareas, profundidad=args.profundidad))
+    render = RenderizadorMemo()
+    render.tooltip(arbol.nodos)
+    render.menu(arbol.nodos)
+    render.tooltip_acotado(arbol.nodos)
+    rnd = random.Random(2)
+
+    directo = memo = 0.0
+    for _ in range(args.repeticiones):
+        nodo = rnd.choice(arbol.nodos)
+        nuevas = list(arbol.lineas)
+        linea = nuevas[nodo.linea_idx]
+        nuevas[nodo.linea_idx] = (linea.replace("[ ]", "[x]", 1) if "[ ]" in linea
+                                  else linea.replace("[x]", "[ ]", 1))
+        render.invalidar(arbol.actualizar(nuevas))
+
+        inicio = time.perf_counter()
+        render.tooltip(arbol.nodos)
+        render.menu(arbol.nodos)
+        render.tooltip_acotado(arbol.nodos)
+        memo += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        generar_tooltip(arbol.nodos)
+        listar_tareas_pendientes(arbol.nodos)
+        generar_tooltip_acotado(arbol.nodos)
+        directo += time.perf_counter() - inicio
+
+    print(f"📊 Render tras alternar una tarea ({args.tareas} tareas, {args.repeticiones} ediciones)")
+    print(f"   directo     {directo * 1000 / args.repeticiones:>8.2f} ms")
+    print(f"   memoizado   {memo * 1000 / args.repeticiones:>8.2f} ms")
+    print(f"   caché       {json.dumps(render.estadisticas())}")
+
+def crear_home_sintetico(raiz, archivos, con_tareas=0.2, semilla=0):
+    """
+    Home sintético con `archivos` markdown repartidos en proyecto/sub (dentro
+    del límite de profundidad del índice). Una fracción `con_tareas` son
+    listas de tareas; el resto, READMEs de texto de tamaño variable.
+    """
+    rnd = random.Random(semilla)
+    por_directorio = 100
+    for i in range(archivos):
+        directorio = raiz / f"proyecto{i // (por_directorio * 20)}" / f"sub{(i // por_directorio) % 20}"
+        if i % por_directorio == 0:
+            directorio.mkdir(parents=True, exist_ok=True)
+        if rnd.random() < con_tareas:
+            texto = "".join(generar_lineas(rnd.randint(5, 200), semilla=i))
+        else:
+            texto = "# README\n\n" + "Texto de documentación sin tareas.\n" * rnd.randint(5, 400)
+        (directorio / f"nota{i}.md").write_text(texto, encoding="utf-8")
+
+def bench_sondeo(args):
+    """Índice + sondeo de checkbox sobre un home sintético: frío, en caché y por hilos"""
+    with tempfile.TemporaryDirectory() as tmp:
+        home = Path(tmp)
+        inicio = time.perf_counter()
+        crear_home_sintetico(home, args.archivos)
+        print(f"📊 Sondeo de checkbox ({args.archivos} archivos, creados en "
+              f"{time.perf_counter() - inicio:.1f} s)")
+        print(f"   {'pasada':<22} {'s':>8} {'sondeados':>10} {'con tareas':>11}")
+
+        def pasada(nombre, indice, hilos):
+            # Vaciar la caché de páginas no es posible sin root: las pasadas
+            # frías miden lectura desde memoria, el coste es el de CPU y syscalls
+            inicio = time.perf_counter()
+            indice = actualizar_indice([home], hilos=hilos, indice=indice, guardar=False)
+            segundos = time.perf_counter() - inicio
+            print(f"   {nombre:<22} {segundos:>8.2f} {indice['estadisticas']['sondeados']:>10} "
+                  f"{len(archivos_con_tareas(indice)):>11}")
+            return indice
+
+        vacio = {"version": 0, "directorios": {}}
+        for hilos in sorted({1, args.hilos}):
+            indice = pasada(f"frío, {hilos} hilo(s)", dict(vacio), hilos)
+        indice = pasada("en caché", indice, args.hilos)
+
+        # Modificar el 1% de los archivos como un editor (temporal + rename)
+        tocados = 0
+        for directorio, entrada in indice["directorios"].items():
+            for nombre, *_ in entrada["archivos"][:1]:
+                ruta = os.path.join(directorio, nombre)
+                with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+                    f.write("- [ ] tarea nueva\n")
+                os.replace(ruta + ".tmp", ruta)
+                tocados += 1
+        pasada(f"{tocados} modificados", indice, args.hilos)
+
+def bench_latencia(args):
+    """
+    Latencia de clic a barra: desde lanzar el comando de marcar hasta que la
+    barra (current.py --follow) recibe la línea nueva. Antes: current.py
+    --mark-id (arranque completo, y la barra se entera por inotify). Después:
+    todolistctl.py next (orden al servidor residente, que publica al momento).
+    """
+    scripts = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        (base / "run").mkdir()
+        datos = base / ".local" / "share" / "todolist"
+        datos.mkdir(parents=True)
+        tareas = datos / "todolist.md"
+        tareas.write_text("".join(generar_lineas(args.tareas, completadas=0)), encoding="utf-8")
+        entorno = {**os.environ, "HOME": str(base), "XDG_RUNTIME_DIR": str(base / "run")}
+
+        barra = subprocess.Popen(
+            [sys.executable, str(scripts / "current.py"), "--follow"],
+            env=entorno, stdout=subprocess.PIPE, text=True
+        )
+
+        def esperar_texto(anterior):
+            # Leer líneas hasta que cambie el texto de la barra
+            while True:
+                if not select.select([barra.stdout], [], [], 10)[0]:
+                    raise RuntimeError("la barra no se actualizó en 10 s")
+                texto = json.loads(barra.stdout.readline())["text"]
+                if texto != anterior:
+                    return texto
+
+        def primera_id():
+            nodos = parsear_tareas(tareas.read_text(encoding="utf-8").splitlines(True))
+            primera = buscar_primera_tarea_pendiente(nodos)
+            return calcular_ids(nodos)[nodos.index(primera)]
+
+        try:
+            texto = esperar_texto(None)
+            resultados = {}
+            for nombre, comando in (
+                ("current.py --mark-id", lambda: [sys.executable, str(scripts / "current.py"),
+                                                  "--mark-id", primera_id()]),
+                ("todolistctl.py next", lambda: [sys.executable, str(scripts / "todolistctl.py"),
+                                                 "next"]),
+            ):
+                tiempos = []
+                for _ in range(args.repeticiones):
+                    orden = comando()
+                    inicio = time.perf_counter()
+                    clic = subprocess.Popen(orden, env=entorno, stdout=subprocess.DEVNULL)
+                    texto = esperar_texto(texto)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    if clic.wait() != 0:
+                        raise RuntimeError(f"{nombre} terminó con código {clic.returncode}")
+                resultados[nombre] = sorted(tiempos)
+        finally:
+            barra.terminate()
+            barra.wait()
+
+    print(f"📊 Latencia de clic a barra ({args.tareas} tareas, {args.repeticiones} clics)")
+    print(f"   {'comando':<22} {'mediana ms':>11} {'p95 ms':>8}")
+    for nombre, tiempos in resultados.items():
+        p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+        print(f"   {nombre:<22} {tiempos[len(tiempos) // 2]:>11.1f} {p95:>8.1f}")
+
+def importaciones(comando, entorno, cantidad=8):
+    """
+    Módulos que más tiempo propio tardan en importarse (-X importtime):
+    lista de (microsegundos, módulo) y el total de todas las importaciones
+    """
+    salida = subprocess.run(comando, env=entorno, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, check=True).stderr
+    modulos = []
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        propio, _, nombre = linea[len("import time:"):].split("|")
+        modulos.append((int(propio), nombre.strip()))
+    return sorted(modulos, reverse=True)[:cantidad], sum(us for us, _ in modulos)
+
+def bench_arranque(args):
+    """
+    Arranque en frío de los programas que lanza waybar: el script suelto
+    (se recompila en cada ejecución y arrastra site) frente al lanzador
+    -IS de install.py con la lógica precompilada. Con --umbral-ms sale con
+    código 1 si la mediana de algún lanzador lo supera (regresión).
+    """
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from install import HyDETodolistInstaller
+
+    scripts = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        datos = base / ".local" / "share" / "todolist"
+        datos.mkdir(parents=True)
+        (datos / "todolist.md").write_text("".join(generar_lineas(args.tareas)), encoding="utf-8")
+        entorno = {**os.environ, "HOME": str(base), "XDG_RUNTIME_DIR": str(base)}
+
+        instalador = HyDETodolistInstaller()
+        instalador.local_bin = base / ".local" / "bin"
+        instalador.local_lib = base / ".local" / "lib" / "todolist"
+        instalador.local_bin.mkdir(parents=True)
+        with open(os.devnull, "w") as nulo:
+            salida, sys.stdout = sys.stdout, nulo
+            try:
+                instalado = instalador.install_scripts()
+            finally:
+                sys.stdout = salida
+        if not instalado:
+            raise RuntimeError("install.py no pudo instalar los scripts")
+
+        casos = []
+        for programa, extra in (("current.py", {}), ("choose_and_check.py", {"ROFI_RETV": "0"})):
+            lanzador = instalador.local_bin / programa
+            casos.append((programa, "script suelto", [sys.executable, str(scripts / programa)], extra))
+            casos.append((programa, "lanzador -IS", [str(lanzador)], extra))
+
+        resultados = []
+        for programa, variante, comando, extra in casos:
+            entorno_caso = {**entorno, **extra}
+            # Una pasada previa: snapshot en caché y páginas del intérprete en memoria
+            subprocess.run(comando, env=entorno_caso, stdout=subprocess.DEVNULL, check=True)
+            tiempos = []
+            for _ in range(args.repeticiones):
+                inicio = time.perf_counter()
+                subprocess.run(comando, env=entorno_caso, stdout=subprocess.DEVNULL, check=True)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados.append((programa, variante, sorted(tiempos)))
+
+        lanzador = str(instalador.local_bin / "current.py")
+        top, total = importaciones([sys.executable, "-IS", "-X", "importtime", lanzador], entorno)
+        _, total_suelto = importaciones(
+            [sys.executable, "-X", "importtime", str(scripts / "current.py")], entorno
+        )
+
+    print(f"📊 Arranque en frío ({args.tareas} tareas, {args.repeticiones} ejecuciones)")
+    print(f"   {'programa':<20} {'variante':<15} {'mediana ms':>11} {'p95 ms':>8}")
+    regresiones = []
+    for programa, variante, tiempos in resultados:
+        mediana = tiempos[len(tiempos) // 2]
+        p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+        print(f"   {programa:<20} {variante:<15} {mediana:>11.1f} {p95:>8.1f}")
+        if args.umbral_ms and variante == "lanzador -IS" and mediana > args.umbral_ms:
+            regresiones.append(f"{programa}: {mediana:.1f} ms > {args.umbral_ms:g} ms")
+
+    print(f"\n📦 Importaciones de current.py (-X importtime, tiempo propio): "
+          f"{total_suelto / 1000:.1f} ms suelto, {total / 1000:.1f} ms con el lanzador")
+    for us, modulo in top:
+        print(f"   {us / 1000:>7.2f} ms  {modulo}")
+
+    if regresiones:
+        print("\n❌ Regresión de arranque:")
+        for regresion in regresiones:
+            print(f"   {regresion}")
+        sys.exit(1)
+    if args.umbral_ms:
+        print(f"\n✅ Todos los lanzadores por debajo de {args.umbral_ms:g} ms")
+
+# Formato de los JSON de `suite` (cambiar si cambia su estructura)
+VERSION_RESULTADOS = 1
+
+# Tamaños por defecto de la suite (número de checkbox)
+TAMANOS_SUITE = (100, 1000, 10000, 100000, 1000000)
+
+def cronometrar(funcion, repeticiones, preparar=None):
+    """
+    Tiempos en ms de `repeticiones` llamadas, ordenados. Si hay `preparar`,
+    su resultado se pasa a `funcion` y su coste no se mide.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        argumento = preparar() if preparar else None
+        inicio = time.perf_counter()
+        funcion(argumento) if preparar else funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tiempos)
+
+def pico_memoria(funcion, preparar=None):
+    """KB asignados en el pico de una llamada a `funcion` (tracemalloc)"""
+    argumento = preparar() if preparar else None
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        funcion(argumento) if preparar else funcion()
+        return (tracemalloc.get_traced_memory()[1] - base) // 1024
+    finally:
+        tracemalloc.stop()
+
+def etapas_suite(lineas, nodos):
+    """
+    Etapas medidas por la suite: (nombre, función, preparar). Marcar necesita
+    un árbol recién parseado en cada llamada (marca y propaga sobre él); la
+    tarea marcada es la última pendiente, el peor caso de buscar_por_texto.
+    """
+    ultima = next((n.texto for n in reversed(nodos) if not n.checked), nodos[-1].texto)
+
+    def fresco():
+        copia = list(lineas)
+        return copia, parsear_tareas(copia)
+
+    return [
+        ("parsear", lambda: parsear_tareas(lineas), None),
+        ("buscar_primera", lambda: buscar_primera_tarea_pendiente(nodos), None),
+        ("buscar_primera_perezosa", lambda: buscar_primera_tarea_pendiente_lazy(lineas), None),
+        ("tooltip", lambda: generar_tooltip(nodos), None),
+        ("tooltip_acotado", lambda: generar_tooltip_acotado(nodos), None),
+        ("listar_pendientes", lambda: listar_tareas_pendientes(nodos), None),
+        ("calcular_ids", lambda: calcular_ids(nodos), None),
+        ("marcar", lambda arbol: marcar_tarea(arbol[0], arbol[1], ultima), fresco),
+    ]
+
+def bench_suite_hijo(args):
+    """
+    Proceso hijo de `suite`: un tamaño en un proceso limpio, para que el
+    pico de RSS (ru_maxrss) sea solo suyo. Imprime su resultado en JSON.
+    """
+    inicio = time.perf_counter()
+    lineas = generar_lineas(args.tareas, profundidad=args.profundidad, ramas=args.ramas,
+                            completadas=args.completadas, tabs=args.tabs, semilla=args.semilla)
+    generar_ms = (time.perf_counter() - inicio) * 1000
+    nodos = parsear_tareas(lineas)
+
+    etapas = {"generar": {"ms_mediana": generar_ms, "ms_min": generar_ms, "pico_kb": None}}
+    for nombre, funcion, preparar in etapas_suite(lineas, nodos):
+        tiempos = cronometrar(funcion, args.repeticiones, preparar)
+        etapas[nombre] = {
+            "ms_mediana": tiempos[len(tiempos) // 2],
+            "ms_min": tiempos[0],
+            "pico_kb": pico_memoria(funcion, preparar)
+        }
+
+    print(json.dumps({
+        "tareas": args.tareas,
+        "lineas": len(lineas),
+        "nodos": len(nodos),
+        "pendientes": sum(1 for n in nodos if not n.checked),
+        "niveles": max(n.nivel for n in nodos) + 1 if nodos else 0,
+        "etapas": etapas,
+        # Linux: KB
+        "rss_max_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }))
+
+def commit_actual():
+    """Commit del árbol medido (si es un repositorio git), para comparar versiones"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def bench_suite(args):
+    """
+    Suite sobre archivos sintéticos de 100 a 1M checkbox: tiempo (mediana y
+    mínimo) y pico de memoria de cada etapa, y pico de RSS por tamaño. Con
+    --salida escribe los resultados en JSON para `comparar`.
+    """
+    tamanos = [int(t) for t in args.tamanos.split(",")] if args.tamanos else list(TAMANOS_SUITE)
+    parametros = {
+        "profundidad": args.profundidad, "ramas": args.ramas, "completadas": args.completadas,
+        "tabs": args.tabs, "semilla": args.semilla, "repeticiones": args.repeticiones
+    }
+    print(f"📊 Suite sintética (profundidad {args.profundidad}, ramas {args.ramas}, "
+          f"{args.completadas:.0%} completadas, {'tabs' if args.tabs else 'espacios'})")
+
+    resultados = []
+    for tareas in tamanos:
+        cmd = [sys.executable, __file__, "_suite", "--tareas", str(tareas)]
+        for opcion, valor in parametros.items():
+            if opcion == "tabs":
+                cmd += ["--tabs"] if valor else []
+            else:
+                cmd += [f"--{opcion}", str(valor)]
+        resultado = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+        resultados.append(resultado)
+
+        print(f"\n   {tareas} tareas ({resultado['lineas']} líneas, {resultado['pendientes']} pendientes, "
+              f"{resultado['niveles']} niveles, RSS máx {resultado['rss_max_kb'] / 1024:.1f} MB)")
+        print(f"   {'etapa':<24} {'mediana ms':>11} {'mín ms':>9} {'pico KB':>9}")
+        for etapa, medida in resultado["etapas"].items():
+            pico = "-" if medida["pico_kb"] is None else medida["pico_kb"]
+            print(f"   {etapa:<24} {medida['ms_mediana']:>11.3f} {medida['ms_min']:>9.3f} {pico:>9}")
+
+    if args.salida:
+        datos = {
+            "version": VERSION_RESULTADOS,
+            "commit": commit_actual(),
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "parametros": parametros,
+            "resultados": resultados
+        }
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados en {args.salida}")
+
+def bench_comparar(args):
+    """
+    Comparar dos JSON de `suite` (base y nuevo) por tamaño y etapa. Una etapa
+    es una regresión si su mediana empeora más de --umbral % y más de
+    --minimo-ms (el ruido de las etapas de microsegundos). Sale con código 1
+    si hay alguna.
+    """
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.nuevo, "r", encoding="utf-8") as f:
+        nuevo = json.load(f)
+    for datos, ruta in ((base, args.base), (nuevo, args.nuevo)):
+        if datos.get("version") != VERSION_RESULTADOS:
+            print(f"❌ {ruta}: formato {datos.get('version')}, se esperaba {VERSION_RESULTADOS}")
+            sys.exit(2)
+
+    print(f"📊 {base.get('commit') or args.base} → {nuevo.get('commit') or args.nuevo}")
+    if base["parametros"] != nuevo["parametros"]:
+        print(f"   ⚠️  Parámetros distintos: {base['parametros']} → {nuevo['parametros']}")
+
+    anteriores = {r["tareas"]: r for r in base["resultados"]}
+    regresiones = []
+    for resultado in nuevo["resultados"]:
+        anterior = anteriores.get(resultado["tareas"])
+        if anterior is None:
+            continue
+        rss = (resultado["rss_max_kb"] - anterior["rss_max_kb"]) / 1024
+        print(f"\n   {resultado['tareas']} tareas (RSS máx {rss:+.1f} MB)")
+        print(f"   {'etapa':<24} {'base ms':>10} {'nuevo ms':>10} {'cambio':>8} {'pico KB':>14}")
+        for etapa, medida in resultado["etapas"].items():
+            previa = anterior["etapas"].get(etapa)
+            if previa is None:
+                continue
+            antes, ahora = previa["ms_mediana"], medida["ms_mediana"]
+            cambio = (ahora - antes) / antes * 100 if antes else 0.0
+            marca = ""
+            if cambio > args.umbral and ahora - antes > args.minimo_ms:
+                marca = " ❌"
+                regresiones.append(f"{resultado['tareas']} tareas, {etapa}: {antes:.3f} → {ahora:.3f} ms")
+            pico = ""
+            if medida["pico_kb"] is not None and previa["pico_kb"] is not None:
+                pico = f"{previa['pico_kb']} → {medida['pico_kb']}"
+            print(f"   {etapa:<24} {antes:>10.3f} {ahora:>10.3f} {cambio:>+7.1f}% {pico:>14}{marca}")
+
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones de más del {args.umbral:g}%:")
+        for regresion in regresiones:
+            print(f"   {regresion}")
+        sys.exit(1)
+    print(f"\n✅ Ninguna etapa empeora más del {args.umbral:g}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del módulo todolist")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    inc = sub.add_parser("incremental", help="Reparseo completo frente a incremental")
+    inc.add_argument("--tareas", type=int, default=20000)
+    inc.add_argument("--repeticiones", type=int, default=20)
+    inc.add_argument("--tabs", action="store_true", help="Indentar con tabs en lugar de espacios")
+    inc.set_defaults(funcion=bench_incremental)
+
+    mem = sub.add_parser("memoria", help="RSS y parseo: Nodo frente a ArbolCompacto")
+    mem.add_argument("--tareas", type=int, default=200000)
+    mem.add_argument("--profundidad", type=int, default=4)
+    mem.add_argument("--tabs", action="store_true", help="Indentar con tabs en lugar de espacios")
+    mem.set_defaults(funcion=bench_memoria)
+
+    tip = sub.add_parser("tooltip", help="Tooltip completo frente a acotado")
+    tip.add_argument("--tareas", type=int, default=20000)
+    tip.add_argument("--profundidad", type=int, default=4)
+    tip.add_argument("--completadas", type=float, default=0.2)
+    tip.add_argument("--repeticiones", type=int, default=10)
+    tip.set_defaults(funcion=bench_tooltip)
+
+    ren = sub.add_parser("render", help="Render directo frente a memoizado")
+    ren.add_argument("--tareas", type=int, default=20000)
+    ren.add_argument("--profundidad", type=int, default=4)
+    ren.add_argument("--repeticiones", type=int, default=50)
+    ren.set_defaults(funcion=bench_render)
+
+    son = sub.add_parser("sondeo", help="Índice y sondeo de checkbox sobre un home sintético")
+    son.add_argument("--archivos", type=int, default=50000)
+    son.add_argument("--hilos", type=int, default=8)
+    son.set_defaults(funcion=bench_sondeo)
+
+    lat = sub.add_parser("latencia", help="Clic a barra: current.py frente a todolistctl.py")
+    lat.add_argument("--tareas", type=int, default=2000)
+    lat.add_argument("--repeticiones", type=int, default=20)
+    lat.set_defaults(funcion=bench_latencia)
+
+    arr = sub.add_parser("arranque", help="Arranque: script suelto frente a lanzador precompilado")
+    arr.add_argument("--tareas", type=int, default=200)
+    arr.add_argument("--repeticiones", type=int, default=30)
+    arr.add_argument("--umbral-ms", type=float, default=0,
+                     help="Fallar si la mediana de un lanzador supera estos ms (0 = no comprobar)")
+    arr.set_defaults(funcion=bench_arranque)
+
+    def parametros_suite(sub_parser):
+        sub_parser.add_argument("--profundidad", type=int, default=4)
+        sub_parser.add_argument("--ramas", type=int, default=5, help="Hijos máximos por tarea")
+        sub_parser.add_argument("--completadas", type=float, default=0.3)
+        sub_parser.add_argument("--tabs", action="store_true", help="Indentar con tabs en lugar de espacios")
+        sub_parser.add_argument("--semilla", type=int, default=0)
+        sub_parser.add_argument("--repeticiones", type=int, default=5)
+
+    sui = sub.add_parser("suite", help="Parseo, búsqueda, render y marcado de 100 a 1M checkbox")
+    sui.add_argument("--tamanos", help="Números de checkbox separados por comas "
+                     f"(por defecto {','.join(map(str, TAMANOS_SUITE))})")
+    sui.add_argument("--salida", help="Escribir los resultados en este JSON")
+    parametros_suite(sui)
+    sui.set_defaults(funcion=bench_suite)
+
+    com = sub.add_parser("comparar", help="Comparar dos JSON de la suite")
+    com.add_argument("base")
+    com.add_argument("nuevo")
+    com.add_argument("--umbral", type=float, default=10, help="Empeoramiento máximo en %%")
+    com.add_argument("--minimo-ms", type=float, default=0.05,
+                     help="Ignorar diferencias menores que estos ms")
+    com.set_defaults(funcion=bench_comparar)
+
+    hijo_suite = sub.add_parser("_suite")
+    hijo_suite.add_argument("--tareas", type=int, required=True)
+    parametros_suite(hijo_suite)
+    hijo_suite.set_defaults(funcion=bench_suite_hijo)
+
+    hijo = sub.add_parser("_rss")
+    hijo.add_argument("representacion", choices=("nodo", "compacto"))
+    hijo.add_argument("--tareas", type=int, required=True)
+    hijo.add_argument("--profundidad", type=int, required=True)
+    hijo.add_argument("--tabs", action="store_true")
+    hijo.set_defaults(funcion=bench_rss_hijo)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+if __name__ == "__main__":
+    main()
@@ -3,264 +3,216 @@
 Interfaz rofi para seleccionar y marcar tareas del todolist-tree
 """
 
-import re
+import json
+import shlex
 import sys
-import subprocess
 import os
 from pathlib import Path
 
-# Archivo de configuración para almacenar la ruta del markdown actual
-config_dir = Path.home() / ".local" / "share" / "todolist"
-config_file = config_dir / "config.txt"
-default_archivo = Path.home() / ".local" / "share" / "todolist" / "todolist.md"
-
-def get_current_file():
-    """Obtener el archivo markdown actual desde la configuración"""
-    if config_file.exists():
+from todolist_core import (
+    ConfiguracionMultiple, comando_propio, get_current_file, get_current_files, set_current_file
+)
+from todolist_cache import ids_menu, obtener_snapshot
+from todolist_escritura import editar_documento
+from todolist_frecencia import (
+    leer_frecencia, olvidar, ordenar_por_frecencia, registrar_visita, top_frecencia
+)
+from todolist_indice import actualizar_indice, archivos_con_tareas, cargar_indice
+
+OPCIONES_SELECCION_ARCHIVO = [
+    "🔍 Buscar en archivos encontrados",
+    "⏰ Archivos recientes",
+    "📝 Escribir ruta manualmente"
+]
+
+# Sugerencias del modo manual
+DIRECTORIOS_COMUNES = [
+    f"~/{Path.home().name}",
+    "~/proyectos/",
+    "~/Documentos/", 
+    "~/Documents/",
+    "~/Desktop/",
+    "~/Escritorio/"
+]
+
+PLACEHOLDER_RUTA = "Ej: ~/proyectos/mi-proyecto.md"
+
+# Tareas que se listan en la notificación de un lote (el resto se resume)
+MAX_TAREAS_NOTIFICACION = 10
+
+# Tecla que añade una tarea a la selección sin cerrar rofi (la misma que usa
+# -multi-select en el modo --dmenu); Enter completa la selección de una vez
+TECLA_SELECCIONAR = "Shift+Return"
+
+# subprocess se importa solo donde se lanza otro programa: cada paso del modo
+# script es un proceso nuevo y la mayoría solo lee el snapshot e imprime
+
+def notificar(titulo, mensaje):
+    """Notificación de escritorio con notify-send"""
+    import subprocess
+    subprocess.run(["notify-send", titulo, mensaje])
+
+def rofi_en_flujo(argumentos, lotes):
+    """
+    Abrir `rofi -dmenu` y escribirle las entradas según el generador `lotes`
+    las produce (listas de pares (línea, valor)), sin esperar a tenerlas todas.
+    rofi muestra la ventana en cuanto lee el primer lote (-async-pre-read con
+    su tamaño), que debe ser el inmediato: las opciones del sistema o lo que
+    ya sabe el índice. Pedir más filas le haría esperar al siguiente lote, o
+    al final de la lista si no llega ninguno.
+
+    rofi devuelve el número de fila elegida (-format i), no el texto: cada
+    fila se resuelve con el array paralelo de valores, en O(1) y sin
+    ambigüedad con líneas repetidas. Devuelve (código de salida, valores
+    elegidos); las filas con valor None (separadores) no se pueden elegir.
+    """
+    import itertools
+    import subprocess
+
+    lotes = iter(lotes)
+    primero = next(lotes, [])
+    proceso = subprocess.Popen(
+        ["rofi", "-dmenu", "-format", "i", "-async-pre-read", str(max(1, len(primero))),
+         *argumentos],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    valores = []
+    try:
+        for lote in itertools.chain([primero], lotes):
+            if lote:
+                proceso.stdin.write("".join(f"{linea}\n" for linea, _ in lote))
+                proceso.stdin.flush()
+                valores.extend(valor for _, valor in lote)
+    except BrokenPipeError:
+        # El usuario eligió o cerró rofi antes de terminar la lista
+        pass
+    except BaseException:
+        proceso.kill()
+        proceso.wait()
+        raise
+    finally:
         try:
-            with open(config_file, "r", encoding="utf-8") as f:
-                archivo_path = f.read().strip()
-                if archivo_path and Path(archivo_path).exists():
-                    return Path(archivo_path)
-        except:
+            proceso.stdin.close()
+        except BrokenPipeError:
             pass
-    return default_archivo
-
-def set_current_file(nuevo_archivo):
-    """Establecer un nuevo archivo markdown como actual"""
-    config_dir.mkdir(parents=True, exist_ok=True)
-    with open(config_file, "w", encoding="utf-8") as f:
-        f.write(str(nuevo_archivo))
-
-# Obtener el archivo actual
-archivo = get_current_file()
-
-class Nodo:
-    def __init__(self, texto, nivel, checked, linea_idx):
-        self.texto = texto
-        self.nivel = nivel
-        self.checked = checked
-        self.linea_idx = linea_idx
-        self.hijos = []
-        self.padre = None
-
-def parsear_tareas(lineas):
-    nodos = []
-    stack = []
-
-    for idx, linea in enumerate(lineas):
-        # Detectar checkbox con niveles según indentación (espacios o tabs)
-        m = re.match(r"^(\s*)[-*]\s+\[( |x)\]\s+(.*)", linea)
-        if not m:
-            continue
+    salida = proceso.stdout.read()
+    codigo = proceso.wait()
 
-        indent, check, texto = m.groups()
-        # Calcular nivel basado en espacios o tabs
-        if '\t' in indent:
-            nivel = len(indent)  # 1 tab = 1 nivel
-        else:
-            nivel = len(indent) // 4  # 4 espacios = 1 nivel
-
-        nodo = Nodo(texto.strip(), nivel, check == "x", idx)
-
-        # Insertar en el árbol
-        while stack and stack[-1].nivel >= nivel:
-            stack.pop()
-
-        if stack:
-            nodo.padre = stack[-1]
-            stack[-1].hijos.append(nodo)
-
-        stack.append(nodo)
-        nodos.append(nodo)
-
-    return nodos
-
-def listar_tareas_pendientes(nodos):
-    """Obtener lista de todas las tareas pendientes con formato jerárquico usando tabs por nivel"""
-    tareas = []
-
-    def agregar_tareas(nodo):
-        if not nodo.checked:
-            # Indentación por nivel usando tabs, similar al tooltip (1 tab por nivel)
-            indent = "  " * nodo.nivel
-            indicador = ""
-            tareas.append(f"{indent}{indicador} {nodo.texto}")
-
-        # Agregar hijos (aunque el padre esté marcado, los hijos pueden estar desmarcados)
-        for hijo in nodo.hijos:
-            agregar_tareas(hijo)
-
-    for nodo in nodos:
-        if nodo.padre is None:  # raíz
-            agregar_tareas(nodo)
-
-    return tareas
-
-def buscar_archivos_markdown():
-    """Buscar archivos markdown en ubicaciones comunes"""
-    archivos = []
-    ubicaciones = [
-        Path.home(),
-        Path.home() / "proyectos", 
-        Path.home() / "Documentos",
-        Path.home() / "Documents",
-        Path.home() / "Desktop",
-        Path.home() / "Escritorio"
-    ]
-    
-    for ubicacion in ubicaciones:
-        if ubicacion.exists():
-            try:
-                # Buscar archivos .md hasta 3 niveles de profundidad
-                for archivo in ubicacion.rglob("*.md"):
-                    if archivo.is_file() and ".local" not in str(archivo):
-                        archivos.append(archivo)
-                for archivo in ubicacion.rglob("*.markdown"):
-                    if archivo.is_file() and ".local" not in str(archivo):
-                        archivos.append(archivo)
-            except:
-                continue
-    
-    # Limitar a 50 archivos más recientes
-    archivos = sorted(archivos, key=lambda x: x.stat().st_mtime, reverse=True)[:50]
-    return archivos
+    # Una fila por línea (varias con -multi-select); -1 es texto escrito a mano
+    elegidos = []
+    for linea in salida.splitlines():
+        try:
+            fila = int(linea)
+        except ValueError:
+            continue
+        if 0 <= fila < len(valores) and valores[fila] is not None:
+            elegidos.append(valores[fila])
+    return codigo, elegidos
+
+def buscar_archivos_markdown(limite=50):
+    """
+    Generador de lotes [(ruta, pendientes)] de listas de tareas, para rofi.
+    Primero lo que ya sabe el índice guardado (una lectura, sin recorrer el
+    disco); después, tras el refresco incremental, los archivos nuevos.
+    Los markdown sin checkbox no aparecen.
+    """
+    entradas = leer_frecencia()
+    vistos = set()
+
+    def lote(con_tareas):
+        pendientes = {ruta: p for ruta, p, _ in con_tareas if ruta not in vistos}
+        # Los usados con frecuencia primero, el resto por tareas pendientes
+        rutas = ordenar_por_frecencia(list(pendientes), entradas)[:limite - len(vistos)]
+        vistos.update(rutas)
+        return [(ruta, pendientes[ruta]) for ruta in rutas]
+
+    yield lote(archivos_con_tareas(cargar_indice()))
+    # Refresco incremental: solo se reescanean y sondean los que cambiaron
+    if len(vistos) < limite:
+        yield lote(archivos_con_tareas(actualizar_indice()))
 
 def obtener_archivos_recientes():
-    """Obtener historial de archivos utilizados recientemente"""
-    historial_file = config_dir / "historial.txt"
-    if historial_file.exists():
-        try:
-            with open(historial_file, "r", encoding="utf-8") as f:
-                rutas = [line.strip() for line in f.readlines() if line.strip()]
-                return [Path(ruta) for ruta in rutas if Path(ruta).exists()][:10]
-        except:
-            pass
-    return []
+    """Archivos más usados recientemente (frecencia), en una sola lectura"""
+    return top_frecencia(10)
 
 def agregar_a_historial(archivo):
-    """Agregar archivo al historial de archivos recientes"""
-    historial_file = config_dir / "historial.txt"
-    config_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Leer historial existente
-    historial = []
-    if historial_file.exists():
-        try:
-            with open(historial_file, "r", encoding="utf-8") as f:
-                historial = [line.strip() for line in f.readlines() if line.strip()]
-        except:
-            pass
-    
-    # Agregar nuevo archivo al inicio (si no existe ya)
-    ruta_str = str(archivo)
-    if ruta_str in historial:
-        historial.remove(ruta_str)
-    historial.insert(0, ruta_str)
-    
-    # Mantener solo los últimos 10
-    historial = historial[:10]
-    
-    # Guardar historial actualizado
-    try:
-        with open(historial_file, "w", encoding="utf-8") as f:
-            f.write("\n".join(historial))
-    except:
-        pass
+    """Registrar una visita al archivo en el almacén de frecencia"""
+    registrar_visita(archivo)
 
 def mostrar_menu_seleccion_archivo():
     """Mostrar menú con diferentes opciones para seleccionar archivo"""
-    opciones = [
-        "🔍 Buscar en archivos encontrados",
-        "⏰ Archivos recientes",
-        "📝 Escribir ruta manualmente"
-    ]
-    
-    entrada = "\n".join(opciones)
+    opciones = OPCIONES_SELECCION_ARCHIVO
     
     try:
-        result = subprocess.run([
-            "rofi", 
-            "-dmenu", 
+        codigo, elegidos = rofi_en_flujo([
             "-i",
             "-p", "¿Cómo seleccionar archivo?:",
             "-theme-str", "window { width: 50%; }",
             "-theme-str", "listview { lines: 4; }"
-        ], 
-        input=entrada, 
-        text=True, 
-        capture_output=True
-        )
+        ], [[(opcion, opcion) for opcion in opciones]])
         
-        if result.returncode == 0 and result.stdout.strip():
-            return result.stdout.strip()
+        if codigo == 0 and elegidos:
+            return elegidos[0]
     except:
         pass
     
     return None
 
-def seleccionar_de_lista(archivos, titulo):
-    """Mostrar lista de archivos para selección"""
-    if not archivos:
-        subprocess.run([
-            "notify-send", 
-            "Sin archivos", 
-            "No se encontraron archivos markdown"
-        ])
-        return None
-    
-    # Preparar lista con información útil
-    opciones = []
-    for archivo in archivos:
+def formatear_archivo(archivo, pendientes=None):
+    """Línea de rofi para un archivo: icono, nombre, ruta y tareas pendientes"""
+    try:
+        # Mostrar ruta relativa si es posible
         try:
-            # Mostrar ruta relativa si es posible
-            try:
-                ruta_rel = archivo.relative_to(Path.home())
-                display_path = f"~/{ruta_rel}"
-            except:
-                display_path = str(archivo)
-            
-            # Agregar icono según ubicación
-            if "proyecto" in str(archivo).lower():
-                icono = "💻"
-            elif "documento" in str(archivo).lower():
-                icono = "📄"
-            elif str(archivo.parent) == str(Path.home()):
-                icono = "🏠"
-            else:
-                icono = "📝"
-            
-            opciones.append(f"{icono} {archivo.name} ({display_path})")
+            ruta_rel = archivo.relative_to(Path.home())
+            display_path = f"~/{ruta_rel}"
         except:
-            opciones.append(f"📝 {archivo.name}")
-    
-    entrada = "\n".join(opciones)
+            display_path = str(archivo)
+        
+        # Agregar icono según ubicación
+        if "proyecto" in str(archivo).lower():
+            icono = "💻"
+        elif "documento" in str(archivo).lower():
+            icono = "📄"
+        elif str(archivo.parent) == str(Path.home()):
+            icono = "🏠"
+        else:
+            icono = "📝"
+        
+        if pendientes is not None:
+            return f"{icono} {archivo.name} ({display_path}) · 🔲 {pendientes}"
+        return f"{icono} {archivo.name} ({display_path})"
+    except:
+        return f"📝 {archivo.name}"
+
+def seleccionar_de_lista(lotes, titulo):
+    """
+    Mostrar lista de archivos para selección. `lotes` produce listas de
+    (ruta, pendientes o None) que se envían a rofi según van llegando.
+    """
+    encontrados = 0
+
+    def filas():
+        nonlocal encontrados
+        for lote in lotes:
+            encontrados += len(lote)
+            yield [(formatear_archivo(ruta, pendientes), ruta) for ruta, pendientes in lote]
     
     try:
-        result = subprocess.run([
-            "rofi", 
-            "-dmenu", 
+        codigo, elegidos = rofi_en_flujo([
             "-i",
             "-p", titulo,
             "-theme-str", "window { width: 70%; }",
             "-theme-str", "listview { lines: 12; }"
-        ], 
-        input=entrada, 
-        text=True, 
-        capture_output=True
-        )
+        ], filas())
         
-        if result.returncode == 0 and result.stdout.strip():
-            seleccion = result.stdout.strip()
-            # Extraer índice de la selección
-            try:
-                indice = opciones.index(seleccion)
-                return archivos[indice]
-            except:
-                return None
+        if codigo == 0 and elegidos:
+            return elegidos[0]
     except:
         pass
     
+    if not encontrados:
+        notificar("Sin archivos", "No se encontraron archivos markdown")
+    
     return None
 
 def cambiar_archivo():
@@ -273,255 +225,465 @@ def cambiar_archivo():
     nuevo_archivo = None
     
     if opcion == "🔍 Buscar en archivos encontrados":
-        archivos = buscar_archivos_markdown()
-        nuevo_archivo = seleccionar_de_lista(archivos, "Seleccionar archivo markdown:")
+        nuevo_archivo = seleccionar_de_lista(buscar_archivos_markdown(), "Seleccionar archivo markdown:")
         
     elif opcion == "⏰ Archivos recientes":
-        archivos_recientes = obtener_archivos_recientes()
-        nuevo_archivo = seleccionar_de_lista(archivos_recientes, "Archivos recientes:")
+        archivos_recientes = [(ruta, None) for ruta in obtener_archivos_recientes()]
+        nuevo_archivo = seleccionar_de_lista([archivos_recientes], "Archivos recientes:")
         
     elif opcion == "📝 Escribir ruta manualmente":
         # Modo manual mejorado con autocompletado de directorios comunes
-        directorios_comunes = [
-            f"~/{Path.home().name}",
-            "~/proyectos/",
-            "~/Documentos/", 
-            "~/Documents/",
-            "~/Desktop/",
-            "~/Escritorio/"
-        ]
-        
-        placeholder = "Ej: ~/proyectos/mi-proyecto.md"
-        
         try:
+            import subprocess
             result = subprocess.run([
                 "rofi", 
                 "-dmenu",
                 "-i",
                 "-p", "Ruta del archivo markdown:",
                 "-theme-str", "window { width: 60%; }",
-                "-theme-str", f'entry {{ placeholder: "{placeholder}"; }}'
+                "-theme-str", f'entry {{ placeholder: "{PLACEHOLDER_RUTA}"; }}'
             ], 
-            input="\n".join(directorios_comunes), 
+            input="\n".join(DIRECTORIOS_COMUNES), 
             text=True, 
             capture_output=True
             )
             
             if result.returncode == 0 and result.stdout.strip():
-                ruta = result.stdout.strip()
                 # Expandir ~ si existe
-                if ruta.startswith("~/"):
-                    ruta = str(Path.home() / ruta[2:])
-                nuevo_archivo = Path(ruta)
+                nuevo_archivo = expandir_ruta(result.stdout)
         except:
             pass
-        return False
     
-    # Validar y aplicar el archivo seleccionado
+    return aplicar_archivo(nuevo_archivo)
+
+def expandir_ruta(ruta):
+    """Ruta escrita a mano como Path, expandiendo ~"""
+    ruta = ruta.strip()
+    if ruta.startswith("~/"):
+        ruta = str(Path.home() / ruta[2:])
+    return Path(ruta)
+
+def aplicar_archivo(nuevo_archivo):
+    """Validar el archivo elegido y hacerlo el actual; True si se cambió"""
     if nuevo_archivo:
         # Verificar que el archivo existe
         if nuevo_archivo.exists():
             # Verificar que es un archivo markdown
             if nuevo_archivo.suffix.lower() in ['.md', '.markdown']:
-                set_current_file(nuevo_archivo)
+                try:
+                    set_current_file(nuevo_archivo)
+                except ConfiguracionMultiple as e:
+                    notificar("Error", str(e))
+                    return False
                 agregar_a_historial(nuevo_archivo)
-                subprocess.run([
-                    "notify-send", 
-                    "Archivo Cambiado", 
-                    f"📄 {nuevo_archivo.name}\n📁 {nuevo_archivo.parent}"
-                ])
+                notificar("Archivo Cambiado", f"📄 {nuevo_archivo.name}\n📁 {nuevo_archivo.parent}")
                 return True
             else:
-                subprocess.run([
-                    "notify-send", 
-                    "Error", 
-                    "El archivo debe ser markdown (.md o .markdown)"
-                ])
+                notificar("Error", "El archivo debe ser markdown (.md o .markdown)")
         else:
-            subprocess.run([
-                "notify-send", 
-                "Error", 
-                f"El archivo no existe: {nuevo_archivo}"
-            ])
+            # Sacarlo del ranking de recientes para no volver a ofrecerlo
+            olvidar(nuevo_archivo)
+            notificar("Error", f"El archivo no existe: {nuevo_archivo}")
     
     return False
 
-def marcar_tarea(lineas, nodos, texto_seleccionado):
-    """Marcar la tarea seleccionada y propagar hacia arriba"""
-    # Limpiar el texto seleccionado (quitar iconos y espacios)
-    texto_limpio = re.sub(r'^[\s]*[🔲📁]\s*', '', texto_seleccionado).strip()
-    
-    # Buscar nodo por texto exacto
-    nodo_obj = None
-    for n in nodos:
-        if n.texto == texto_limpio:
-            nodo_obj = n
-            break
-    
-    if not nodo_obj:
-        return False
-
-    # Marcar nodo como hecho (en el archivo)
-    linea = lineas[nodo_obj.linea_idx]
-    nueva_linea = re.sub(r"\[ \]", "[x]", linea, count=1)
-    lineas[nodo_obj.linea_idx] = nueva_linea
-
-    # Actualizar estado en memoria
-    nodo_obj.checked = True
-
-    # Subir recursivamente y marcar padres si todos sus hijos están marcados
-    padre = nodo_obj.padre
-    while padre:
-        if all(h.checked for h in padre.hijos):
-            # Marcar padre en archivo y memoria
-            linea_padre = lineas[padre.linea_idx]
-            nueva_linea_padre = re.sub(r"\[ \]", "[x]", linea_padre, count=1)
-            lineas[padre.linea_idx] = nueva_linea_padre
-            padre.checked = True
-            padre = padre.padre
-        else:
-            break
-
-    return True
-
-def mostrar_rofi(opciones):
-    """Mostrar menú rofi con las opciones disponibles"""
+def tareas_del_menu(archivos, estado):
+    """
+    Lotes de (línea, (archivo, ID estable)) para mostrar_rofi, un lote por
+    archivo según se carga su snapshot (con rofi ya abierto). Con varios
+    archivos cada lote empieza con una cabecera (valor None) con su nombre.
+    Los snapshots cargados quedan en estado["snapshots"], y estado["completo"]
+    indica si se llegó a mirar todos los archivos (rofi puede cerrarse antes).
+    """
+    estado["snapshots"] = {}
+    estado["completo"] = False
+    for archivo_actual in archivos:
+        try:
+            # Las líneas del menú salen del snapshot en caché (un stat si no cambió)
+            snapshot = obtener_snapshot(archivo_actual)
+        except FileNotFoundError:
+            continue
+        estado["snapshots"][archivo_actual] = snapshot
+        lote = [
+            (linea, (archivo_actual, id_tarea))
+            for linea, id_tarea in zip(snapshot["menu"], ids_menu(snapshot))
+        ]
+        if len(archivos) > 1 and lote:
+            lote.insert(0, (f"📄 {archivo_actual.name}", None))
+        yield lote
+    estado["completo"] = True
+
+def mostrar_rofi(lotes):
+    """
+    Mostrar menú rofi: las opciones del sistema primero y las tareas según
+    `lotes` las va produciendo. Con -multi-select se pueden elegir varias
+    tareas (Shift+Enter) y completarlas juntas. Devuelve ("CAMBIAR_ARCHIVO",
+    None), ("EDITAR_ARCHIVO", None), ("TAREAS", [(archivo, id_tarea)]) o None.
+    """
     # Agregar opciones del sistema al menú
     opciones_sistema = [
-        "📁 Cambiar archivo markdown...",
-        "📄 Editar archivo actual...",
-        "─" * 30  # Separador visual
+        ("📁 Cambiar archivo markdown...", ("CAMBIAR_ARCHIVO", None)),
+        ("📄 Editar archivo actual...", ("EDITAR_ARCHIVO", None))
     ]
-    
-    if not opciones:
-        # Si no hay tareas, solo mostrar opciones del sistema
-        opciones_finales = opciones_sistema[:2]  # Solo cambiar y ver archivo
-        mensaje_extra = "¡Todas las tareas están completadas! 🎉"
-    else:
-        # Combinar opciones del sistema con tareas
-        opciones_finales = opciones_sistema + opciones
-        mensaje_extra = None
-    
-    # Preparar entrada para rofi
-    entrada = "\n".join(opciones_finales)
+    separador = ("─" * 30, None)  # Separador visual, no seleccionable
+    recibidas = hay_tareas = False
+
+    def lineas():
+        nonlocal recibidas, hay_tareas
+        yield opciones_sistema
+        for lote in lotes:
+            recibidas = True
+            # Las cabeceras de archivo (valor None) no se pueden elegir
+            filas = [(linea, ("TAREAS", tarea) if tarea else None) for linea, tarea in lote]
+            if filas and not hay_tareas:
+                # El separador solo aparece si hay tareas
+                hay_tareas = True
+                filas.insert(0, separador)
+            yield filas
     
     try:
-        result = subprocess.run([
-            "rofi", 
-            "-dmenu", 
+        codigo, elegidos = rofi_en_flujo([
             "-i",
+            "-multi-select",
             "-p", "Seleccionar acción:",
             "-theme-str", "window { width: 60%; }",
             "-theme-str", "listview { lines: 12; }"
-        ], 
-        input=entrada, 
-        text=True, 
-        capture_output=True
-        )
+        ], lineas())
         
-        if result.returncode == 0 and result.stdout.strip():
-            seleccion = result.stdout.strip()
-            
-            # Manejar opciones del sistema
-            if seleccion == "📁 Cambiar archivo markdown...":
-                return "CAMBIAR_ARCHIVO"
-            elif seleccion == "📄 Editar archivo actual...":
-                return "EDITAR_ARCHIVO"
-            elif seleccion.startswith("─"):
-                return None  # Separador seleccionado, ignorar
-            else:
-                return seleccion  # Tarea seleccionada
+        if codigo == 0 and elegidos:
+            # Si hay tareas entre lo elegido se completan todas juntas; si
+            # no, la acción del sistema elegida
+            tareas = [tarea for accion, tarea in elegidos if accion == "TAREAS"]
+            if tareas:
+                return "TAREAS", tareas
+            return elegidos[0]
         
     except FileNotFoundError:
         # Si rofi no está disponible, mostrar notificación
-        subprocess.run([
-            "notify-send", 
-            "Error", 
-            "Rofi no está instalado"
-        ])
+        notificar("Error", "Rofi no está instalado")
     
-    if mensaje_extra:
-        subprocess.run([
-            "notify-send", 
-            "Todolist", 
-            mensaje_extra
-        ])
+    if recibidas and not hay_tareas:
+        notificar("Todolist", "¡Todas las tareas están completadas! 🎉")
     
     return None
 
+def completar_tareas(tareas):
+    """
+    Marcar varias tareas [(archivo, id_tarea)] por su ID estable en una sola
+    transacción por archivo: un bloqueo, una lectura, una pasada de
+    propagación a los padres, una escritura y un snapshot. Al final, una
+    única notificación con el resumen. Devuelve cuántas se marcaron.
+    """
+    por_archivo = {}
+    for archivo_tarea, id_tarea in tareas:
+        ids = por_archivo.setdefault(Path(archivo_tarea), [])
+        if id_tarea not in ids:
+            ids.append(id_tarea)
+
+    completadas = []
+    fallidas = 0
+    for archivo_tarea, ids in por_archivo.items():
+        try:
+            with editar_documento(archivo_tarea) as documento:
+                nodos = [documento.ids.get(id_tarea) for id_tarea in ids]
+                fallidas += nodos.count(None)
+                nodos = [nodo for nodo in nodos if nodo is not None]
+                documento.marcar_varios(nodos)
+        except FileNotFoundError:
+            fallidas += len(ids)
+            continue
+        # El snapshot ya se rehízo dentro del bloqueo (editar_documento)
+        completadas.extend(nodo.texto for nodo in nodos)
+
+    # Una sola notificación para todo el lote
+    if len(completadas) == 1 and not fallidas:
+        notificar("Tarea Completada", f"✅ {completadas[0]}")
+    elif completadas:
+        resumen = "\n".join(f"✅ {texto}" for texto in completadas[:MAX_TAREAS_NOTIFICACION])
+        if len(completadas) > MAX_TAREAS_NOTIFICACION:
+            resumen += f"\n… y {len(completadas) - MAX_TAREAS_NOTIFICACION} más"
+        if fallidas:
+            resumen += f"\n⚠️ {fallidas} no se pudieron marcar"
+        notificar(f"{len(completadas)} Tareas Completadas", resumen)
+    else:
+        notificar("Error", "No se pudo marcar la tarea" if fallidas <= 1 else "No se pudieron marcar las tareas")
+    return len(completadas)
+
+def completar_tarea(archivo_actual, id_tarea):
+    """Marcar una sola tarea por su ID estable (ver completar_tareas)"""
+    return completar_tareas([(archivo_actual, id_tarea)]) == 1
+
 def editar_archivo_actual():
     """Editar archivo actual en VSCode"""
+    import subprocess
+
     archivo_actual = get_current_file()
     try:
-        subprocess.run([
+        # Desacoplado y sin heredar stdout: en modo script rofi la está leyendo
+        subprocess.Popen([
             "code", 
             archivo_actual
-        ])
+        ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+           stderr=subprocess.DEVNULL, start_new_session=True)
     except Exception as e:
-        subprocess.run([
-            "notify-send", 
-            "Error", 
-            f"No se pudo leer el archivo: {e}"
-        ])
+        notificar("Error", f"No se pudo leer el archivo: {e}")
 
-def main():
+def main_dmenu():
+    """Modo clásico (--dmenu): un rofi -dmenu por paso, en bucle"""
     while True:  # Loop para permitir múltiples acciones
-        archivo_actual = get_current_file()
+        archivos = get_current_files()
         
-        try:
-            with open(archivo_actual, "r", encoding="utf-8") as f:
-                lineas = f.readlines()
-        except FileNotFoundError:
-            subprocess.run([
-                "notify-send", 
-                "Error", 
-                f"No se encontró el archivo {archivo_actual}"
-            ])
-            sys.exit(1)
-
-        nodos = parsear_tareas(lineas)
-        tareas_pendientes = listar_tareas_pendientes(nodos)
+        # Mostrar rofi y obtener selección (las tareas llegan con rofi abierto)
+        estado = {}
+        seleccion = mostrar_rofi(tareas_del_menu(archivos, estado))
+        accion, tareas = seleccion if seleccion else (None, None)
         
-        # Mostrar rofi y obtener selección
-        seleccion = mostrar_rofi(tareas_pendientes)
+        # Si rofi se cerró antes de que se cargaran los archivos, no sabemos si
+        # faltan: solo es un error si se miraron todos y no había ninguno
+        falta_archivo = estado.get("completo") and not estado["snapshots"]
+        if falta_archivo and accion not in ("CAMBIAR_ARCHIVO", "EDITAR_ARCHIVO"):
+            notificar("Error", f"No se encontró el archivo {archivos[0]}")
+            sys.exit(1)
         
         if not seleccion:
             break  # Usuario canceló o cerró rofi
             
         # Manejar acciones especiales
-        if seleccion == "CAMBIAR_ARCHIVO":
+        if accion == "CAMBIAR_ARCHIVO":
             if cambiar_archivo():
                 # Archivo cambiado exitosamente, recargar
                 continue
             else:
                 break
-        elif seleccion == "EDITAR_ARCHIVO":
+        elif accion == "EDITAR_ARCHIVO":
             editar_archivo_actual()
             continue
         else:
-            # Es una tarea normal, marcarla
-            exito = marcar_tarea(lineas, nodos, seleccion)
-            
-            if exito:
-                # Guardar cambios
-                with open(archivo_actual, "w", encoding="utf-8") as f:
-                    f.writelines(lineas)
-                
-                # Mostrar notificación de éxito
-                texto_limpio = re.sub(r'^[\s]*[🔲📁]\s*', '', seleccion).strip()
-                subprocess.run([
-                    "notify-send", 
-                    "Tarea Completada", 
-                    f"✅ {texto_limpio}"
-                ])
-                break  # Salir después de marcar una tarea
-            else:
-                subprocess.run([
-                    "notify-send", 
-                    "Error", 
-                    "No se pudo marcar la tarea"
-                ])
-                break
+            # Tareas elegidas (una o varias con -multi-select): se marcan por
+            # su ID estable, en su archivo, en una sola transacción
+            completar_tareas(tareas)
+            break  # Salir después de marcar las tareas
+
+# Modo script de rofi (-modi): una sola ventana para todo el recorrido.
+# rofi ejecuta este script en cada paso con ROFI_RETV (0 al abrir, 1 fila
+# elegida, 2 texto escrito), ROFI_INFO (el "info" de la fila elegida) y
+# ROFI_DATA (la pantalla actual, devuelta en el paso anterior). Cada paso se
+# responde desde el snapshot en caché y el índice de archivos, sin relanzar
+# rofi ni reparsear el markdown.
+# El modo script no admite -multi-select: TECLA_SELECCIONAR (kb-custom-1,
+# ROFI_RETV 10) añade o quita la tarea de una selección que viaja en ROFI_DATA
+# ("menu <json>") y se resalta con "active"; Enter la completa de una vez.
+
+def opcion_modo(clave, valor):
+    """Línea de opción de modo del protocolo script de rofi"""
+    return f"\0{clave}\x1f{valor}"
+
+def fila_rofi(texto, info=None, seleccionable=True):
+    """Fila del protocolo script: texto y, opcionalmente, su info"""
+    opciones = []
+    if info is not None:
+        opciones += ["info", info]
+    if not seleccionable:
+        opciones += ["nonselectable", "true"]
+    return f"{texto}\0" + "\x1f".join(opciones) if opciones else texto
+
+def pantalla_menu(archivos, seleccion=()):
+    """
+    Menú principal: acciones del sistema y tareas pendientes de cada snapshot.
+    `seleccion` son las tareas [(archivo, id)] elegidas con TECLA_SELECCIONAR.
+    """
+    seleccion = [tuple(tarea) for tarea in seleccion]
+    salida = [
+        opcion_modo("prompt", "Seleccionar acción"),
+        opcion_modo("data", f"menu {json.dumps(seleccion)}" if seleccion else "menu"),
+        opcion_modo("no-custom", "true")
+    ]
+    filas = []
+    if seleccion:
+        filas.append(fila_rofi(f"✅ Completar {len(seleccion)} seleccionadas", "completar"))
+    filas += [
+        fila_rofi("📁 Cambiar archivo markdown...", "cambiar"),
+        fila_rofi("📄 Editar archivo actual...", "editar")
+    ]
+    estado = {}
+    tareas = [fila for lote in tareas_del_menu(archivos, estado) for fila in lote]
+    if not estado["snapshots"]:
+        salida.append(opcion_modo("message", f"⚠️ No se encontró el archivo {archivos[0]}"))
+        return salida + filas
+    if not tareas:
+        salida.append(opcion_modo("message", "¡Todas las tareas están completadas! 🎉"))
+        return salida + filas
+    filas.append(fila_rofi("─" * 30, seleccionable=False))
+    activas = []
+    for linea, tarea in tareas:
+        if tarea is None:
+            # Cabecera de archivo
+            filas.append(fila_rofi(linea, seleccionable=False))
+        else:
+            archivo_tarea, id_tarea = tarea
+            if (str(archivo_tarea), id_tarea) in seleccion:
+                activas.append(str(len(filas)))
+            filas.append(fila_rofi(linea, f"tarea:{id_tarea}:{archivo_tarea}"))
+    if activas:
+        salida.append(opcion_modo("active", ",".join(activas)))
+    salida.append(opcion_modo(
+        "message",
+        f"{len(seleccion)} seleccionadas · Enter completa · {TECLA_SELECCIONAR} añade o quita"
+        if seleccion else f"{TECLA_SELECCIONAR}: seleccionar varias"
+    ))
+    return salida + filas
+
+def pantalla_metodo():
+    """¿Cómo seleccionar archivo?"""
+    return [
+        opcion_modo("prompt", "¿Cómo seleccionar archivo?"),
+        opcion_modo("data", "metodo"),
+        opcion_modo("no-custom", "true"),
+        fila_rofi(OPCIONES_SELECCION_ARCHIVO[0], "buscar"),
+        fila_rofi(OPCIONES_SELECCION_ARCHIVO[1], "recientes"),
+        fila_rofi(OPCIONES_SELECCION_ARCHIVO[2], "manual")
+    ]
+
+def pantalla_archivos(titulo, pantalla, archivos):
+    """Lista de archivos [(ruta, pendientes o None)] para elegir"""
+    salida = [
+        opcion_modo("prompt", titulo),
+        opcion_modo("data", pantalla),
+        opcion_modo("no-custom", "true")
+    ]
+    if not archivos:
+        salida.append(opcion_modo("message", "No se encontraron archivos markdown"))
+    salida.extend(
+        fila_rofi(formatear_archivo(ruta, pendientes), f"archivo:{ruta}")
+        for ruta, pendientes in archivos
+    )
+    return salida
+
+def pantalla_manual():
+    """Ruta escrita a mano, con directorios comunes como sugerencia"""
+    return [
+        opcion_modo("prompt", "Ruta del archivo markdown"),
+        opcion_modo("data", "manual"),
+        opcion_modo("message", PLACEHOLDER_RUTA),
+        *(fila_rofi(directorio, f"ruta:{directorio}") for directorio in DIRECTORIOS_COMUNES)
+    ]
+
+def leer_seleccion(pantalla):
+    """Pantalla y tareas seleccionadas de ROFI_DATA ("menu" o "menu <json>")"""
+    pantalla, _, datos = pantalla.partition(" ")
+    try:
+        seleccion = [(archivo, id_tarea) for archivo, id_tarea in json.loads(datos)]
+    except (ValueError, TypeError):
+        seleccion = []
+    return pantalla, seleccion
+
+def paso_script(retv, argumento, info, pantalla, despues=None):
+    """
+    Responder a un paso de rofi en modo script. Devuelve las líneas a
+    imprimir; una lista vacía cierra rofi. El trabajo que no hace falta para
+    responder se añade a `despues` (funciones sin argumentos), que quien
+    llama ejecuta tras entregar la respuesta.
+    """
+    archivos = get_current_files()
+    pantalla, seleccion = leer_seleccion(pantalla)
+    
+    if retv == 10 and info.startswith("tarea:"):
+        # TECLA_SELECCIONAR: añadir o quitar la tarea sin cerrar rofi
+        id_tarea, _, archivo_tarea = info[len("tarea:"):].partition(":")
+        tarea = (archivo_tarea, id_tarea)
+        if tarea in seleccion:
+            seleccion.remove(tarea)
+        else:
+            seleccion.append(tarea)
+        return pantalla_menu(archivos, seleccion)
+    
+    if retv == 1 and info:
+        tipo, _, valor = info.partition(":")
+        if tipo == "tarea":
+            # "tarea:<id>:<archivo>": la tarea (y las seleccionadas) se marcan
+            # en su propio archivo, en una sola transacción por archivo
+            id_tarea, _, archivo_tarea = valor.partition(":")
+            tarea = (archivo_tarea, id_tarea)
+            completar_tareas(seleccion + [tarea] if tarea not in seleccion else seleccion)
+            return []  # Salir después de marcar las tareas
+        if tipo == "completar":
+            completar_tareas(seleccion)
+            return []
+        if tipo == "cambiar":
+            return pantalla_metodo()
+        if tipo == "editar":
+            editar_archivo_actual()
+            return pantalla_menu(archivos)
+        if tipo == "buscar":
+            # Responder con el índice guardado y refrescarlo después; solo si
+            # aún no hay nada indexado se espera al recorrido
+            lotes = buscar_archivos_markdown()
+            archivos = next(lotes, [])
+            if not archivos:
+                archivos = next(lotes, [])
+            elif despues is not None:
+                despues.append(actualizar_indice)
+            return pantalla_archivos("Seleccionar archivo markdown", "buscar", archivos)
+        if tipo == "recientes":
+            archivos = [(ruta, None) for ruta in obtener_archivos_recientes()]
+            return pantalla_archivos("Archivos recientes", "recientes", archivos)
+        if tipo == "manual":
+            return pantalla_manual()
+        if tipo in ("archivo", "ruta"):
+            nuevo_archivo = Path(valor) if tipo == "archivo" else expandir_ruta(valor)
+            # Archivo cambiado: seguir en la misma ventana con sus tareas
+            return pantalla_menu(get_current_files()) if aplicar_archivo(nuevo_archivo) else []
+    
+    if retv == 2 and pantalla == "manual" and argumento.strip():
+        return pantalla_menu(get_current_files()) if aplicar_archivo(expandir_ruta(argumento)) else []
+    
+    return pantalla_menu(archivos, seleccion if pantalla == "menu" else ())
+
+def lanzar_modo_script():
+    """Abrir una única ventana de rofi con este script como modo"""
+    import subprocess
+
+    comando = shlex.join(comando_propio())
+    try:
+        subprocess.run([
+            "rofi",
+            "-show", "todolist",
+            "-modi", f"todolist:{comando}",
+            "-i",
+            # Liberar Shift+Return (kb-accept-alt) para la selección múltiple
+            "-kb-accept-alt", "",
+            "-kb-custom-1", TECLA_SELECCIONAR,
+            "-theme-str", "window { width: 60%; }",
+            "-theme-str", "listview { lines: 12; }"
+        ])
+    except FileNotFoundError:
+        notificar("Error", "Rofi no está instalado")
+
+def main():
+    if "ROFI_RETV" in os.environ:
+        # Llamado por rofi en modo script
+        try:
+            retv = int(os.environ["ROFI_RETV"])
+        except ValueError:
+            retv = 0
+        argumento = sys.argv[1] if len(sys.argv) > 1 else ""
+        despues = []
+        salida = paso_script(retv, argumento, os.environ.get("ROFI_INFO", ""),
+                             os.environ.get("ROFI_DATA", ""), despues)
+        if salida:
+            print("\n".join(salida))
+        if despues:
+            # rofi lee hasta EOF: soltar stdout antes del trabajo diferido
+            sys.stdout.flush()
+            nulo = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(nulo, sys.stdout.fileno())
+            os.close(nulo)
+            for tarea in despues:
+                tarea()
+    elif "--dmenu" in sys.argv[1:]:
+        main_dmenu()
+    else:
+        lanzar_modo_script()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
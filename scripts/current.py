@@ -1,180 +1,87 @@
 #!/usr/bin/env python3
-import re
 import sys
 import json
 import os
 from pathlib import Path
 
-# Sistema de configuración para archivo markdown dinámico
-config_dir = Path.home() / ".local" / "share" / "todolist"
-config_file = config_dir / "config.txt"
-default_archivo = Path.home() / ".local" / "share" / "todolist" / "todolist.md"
+from todolist_core import (
+    ConfiguracionMultiple, PRESUPUESTO_TOOLTIP, buscar_por_texto,
+    buscar_primera_tarea_pendiente, buscar_primera_tarea_pendiente_lazy, calcular_ids,
+    comando_propio, config_file, default_archivo, frecencia_file, get_current_files,
+    parsear_tareas, set_current_file
+)
+from todolist_cache import (
+    cargar_snapshot, construir_snapshot, guardar_snapshot,
+    obtener_snapshot, texto_primera, tooltip_con_presupuesto
+)
 
-def get_current_file():
-    """Obtener el archivo markdown actual desde la configuración"""
-    if config_file.exists():
-        try:
-            with open(config_file, "r", encoding="utf-8") as f:
-                archivo_path = f.read().strip()
-                if archivo_path and Path(archivo_path).exists():
-                    return Path(archivo_path)
-        except:
-            pass
-    return default_archivo
-
-# Obtener el archivo actual
-archivo = get_current_file()
-
-class Nodo:
-    def __init__(self, texto, nivel, checked, linea_idx):
-        self.texto = texto
-        self.nivel = nivel
-        self.checked = checked
-        self.linea_idx = linea_idx
-        self.hijos = []
-        self.padre = None
-
-def parsear_tareas(lineas):
-    nodos = []
-    stack = []
-
-    for idx, linea in enumerate(lineas):
-        # Detectar checkbox con niveles según indentación (espacios o tabs)
-        m = re.match(r"^(\s*)[-*]\s+\[( |x)\]\s+(.*)", linea)
-        if not m:
-            continue
-
-        indent, check, texto = m.groups()
-        # Calcular nivel basado en espacios o tabs
-        if '\t' in indent:
-            nivel = len(indent)  # 1 tab = 1 nivel
-        else:
-            nivel = len(indent) // 4  # 4 espacios = 1 nivel
-
-        nodo = Nodo(texto.strip(), nivel, check == "x", idx)
-
-        # Insertar en el árbol
-        while stack and stack[-1].nivel >= nivel:
-            stack.pop()
-
-        if stack:
-            nodo.padre = stack[-1]
-            stack[-1].hijos.append(nodo)
-
-        stack.append(nodo)
-        nodos.append(nodo)
+# Segundos entre sondeos en modo --follow cuando no hay inotify
+INTERVALO_FOLLOW = 1.0
 
-    return nodos
+# Opciones reconocidas en la línea de comandos (el resto es el texto de una tarea)
+OPCIONES = {"--follow", "--no-tooltip", "--ids", "--stats", "--local", "--servidor"}
+# Opciones que no cambian la salida (no forman parte de la clave del servidor)
+OPCIONES_DE_MODO = {"--follow", "--local", "--servidor"}
+# Opciones que toman el siguiente argumento como valor
+OPCIONES_CON_VALOR = {
+    "--mark-id", "--tooltip-lineas", "--tooltip-bytes", "--tooltip-profundidad", "--orden",
+    "--batch"
+}
+# Opciones con valor que se pueden repetir (se acumulan en una lista)
+OPCIONES_REPETIBLES = {"--archivo"}
 
-def buscar_primera_tarea_pendiente(nodos):
+def leer_opciones(argv):
     """
-    Buscar la primera tarea pendiente siguiendo orden secuencial:
-    1. Procesar tareas de nivel 0 en orden
-    2. Para cada tarea de nivel 0:
-       - Si no tiene hijos y no está completada: es la primera
-       - Si tiene hijos: buscar primera subtarea no completada (DFS)
-       - Si todos los hijos están completados pero ella no: es la tarea
-    3. Continuar con siguiente tarea de nivel 0
+    Separar las opciones conocidas de los argumentos posicionales.
+    Devuelve ({opción: valor, lista de valores o True}, posicionales).
     """
-    
-    def buscar_en_subtareas(nodo):
-        """Buscar primera tarea pendiente en este nodo y sus hijos (DFS)"""
-        if not nodo.checked:
-            # Si este nodo no está completado
-            if not nodo.hijos:
-                # Es una hoja, es trabajable
-                return nodo
+    opciones = {}
+    posicionales = []
+    args = iter(argv)
+    for arg in args:
+        if arg in OPCIONES:
+            opciones[arg] = True
+        elif arg in OPCIONES_CON_VALOR or arg in OPCIONES_REPETIBLES:
+            valor = next(args, None)
+            if valor is None:
+                print(f"Falta el valor de {arg}.", file=sys.stderr)
+                sys.exit(2)
+            if arg in OPCIONES_REPETIBLES:
+                opciones.setdefault(arg, []).append(valor)
             else:
-                # Tiene hijos, buscar en sus hijos primero
-                for hijo in nodo.hijos:
-                    resultado = buscar_en_subtareas(hijo)
-                    if resultado:
-                        return resultado
-                
-                # Si todos los hijos están completos pero este nodo no,
-                # este nodo debe completarse automáticamente o ser trabajable
-                return nodo
+                opciones[arg] = valor
         else:
-            # El nodo está marcado como completado
-            # Pero verificar si tiene hijos sin completar (caso de inconsistencia)
-            if nodo.hijos:
-                for hijo in nodo.hijos:
-                    resultado = buscar_en_subtareas(hijo)
-                    if resultado:
-                        return resultado
-        
-        return None
-    
-    # Buscar en tareas principales (nivel 0) en orden secuencial
-    for nodo in nodos:
-        if nodo.padre is None:  # tarea principal (nivel 0)
-            resultado = buscar_en_subtareas(nodo)
-            if resultado:
-                return resultado
-                
-    return None
+            posicionales.append(arg)
+    return opciones, posicionales
 
-def marcar_tarea(lineas, nodos, texto_seleccionado):
-    # Marcar la tarea seleccionada y sus padres si corresponde
-    # Buscar nodo por texto exacto
-    nodo_obj = None
-    for n in nodos:
-        if n.texto == texto_seleccionado:
-            nodo_obj = n
-            break
-    if not nodo_obj:
-        print("No se encontró la tarea seleccionada.", file=sys.stderr)
-        return False
-
-    # Marcar nodo como hecho (en el archivo)
-    linea = lineas[nodo_obj.linea_idx]
-    nueva_linea = re.sub(r"\[ \]", "[x]", linea, count=1)
-    lineas[nodo_obj.linea_idx] = nueva_linea
-
-    # Actualizar estado en memoria
-    nodo_obj.checked = True
-
-    # Subir recursivamente y marcar padres si todos sus hijos están marcados
-    padre = nodo_obj.padre
-    while padre:
-        if all(h.checked for h in padre.hijos):
-            # Marcar padre en archivo y memoria
-            linea_padre = lineas[padre.linea_idx]
-            nueva_linea_padre = re.sub(r"\[ \]", "[x]", linea_padre, count=1)
-            lineas[padre.linea_idx] = nueva_linea_padre
-            padre.checked = True
-            padre = padre.padre
-        else:
-            break
+def leer_presupuesto(opciones):
+    """Presupuesto del tooltip (líneas, bytes, profundidad) con los valores por defecto"""
+    presupuesto = list(PRESUPUESTO_TOOLTIP)
+    for i, opcion in enumerate(("--tooltip-lineas", "--tooltip-bytes", "--tooltip-profundidad")):
+        if opcion in opciones:
+            try:
+                presupuesto[i] = int(opciones[opcion])
+            except ValueError:
+                print(f"{opcion} espera un número entero.", file=sys.stderr)
+                sys.exit(2)
+    return tuple(presupuesto)
 
-    return True
+def leer_orden(opciones):
+    """Política de orden de la vista agregada (--orden)"""
+    from todolist_agregado import POLITICAS_ORDEN
 
-def generar_tooltip(nodos):
-    """Generar tooltip con todas las tareas pendientes mostrando jerarquía visualmente"""
-    pendientes = []
-    
-    def agregar_pendientes(nodo, nivel=0):
-        if not nodo.checked:
-            # Agregar espacios según el nivel de anidación (4 espacios por nivel)
-            espacios = "    " * nivel
-            pendientes.append(f"{espacios}[ ] {nodo.texto}")
-        
-        for hijo in nodo.hijos:
-            agregar_pendientes(hijo, nivel + 1)
-    
-    for nodo in nodos:
-        if nodo.padre is None:  # raíz
-            agregar_pendientes(nodo, 0)
-    
-    return "\n".join(pendientes) if pendientes else "✅ Todas las tareas completadas"
+    orden = opciones.get("--orden", "config")
+    if orden not in POLITICAS_ORDEN:
+        print(f"--orden espera uno de: {', '.join(POLITICAS_ORDEN)}.", file=sys.stderr)
+        sys.exit(2)
+    return orden
 
-def main():
-    try:
-        with open(archivo, "r", encoding="utf-8") as f:
-            lineas = f.readlines()
-    except FileNotFoundError:
-        # Si no existe el archivo, crear uno básico
-        contenido_inicial = """# Lista de tareas con estructura
+def crear_archivo_inicial(archivo):
+    """
+    Crear un archivo de tareas básico si no existe.
+    Nunca pisa un archivo existente (aunque aparezca mientras tanto).
+    """
+    contenido_inicial = """# Lista de tareas con estructura
 
 - [ ] Tarea principal 1
     - [ ] Subtarea 1.1
@@ -183,30 +90,34 @@ def main():
     - [ ] Subtarea 2.1
         - [ ] Sub-subtarea 2.1.1
 """
-        with open(archivo, "w", encoding="utf-8") as f:
+    Path(archivo).parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(archivo, "x", encoding="utf-8") as f:
             f.write(contenido_inicial)
-        lineas = contenido_inicial.splitlines(True)
+    except FileExistsError:
+        with open(archivo, "r", encoding="utf-8") as f:
+            return f.readlines()
+    return contenido_inicial.splitlines(True)
 
-    nodos = parsear_tareas(lineas)
+def es_archivo_por_defecto(archivo):
+    """Solo el todolist.md por defecto se crea solo; uno elegido por el usuario no"""
+    return Path(archivo) == default_archivo
 
-    # Si se llamó con argumento, es para marcar esa tarea
-    if len(sys.argv) > 1:
-        tarea_a_marcar = sys.argv[1]
-        exito = marcar_tarea(lineas, nodos, tarea_a_marcar)
-        if exito:
-            with open(archivo, "w", encoding="utf-8") as f:
-                f.writelines(lineas)
-        else:
-            sys.exit(1)
-        sys.exit(0)
+def leer_lineas(archivo):
+    """Leer las líneas del archivo de tareas, creándolo si es el de por defecto"""
+    try:
+        with open(archivo, "r", encoding="utf-8") as f:
+            return f.readlines()
+    except FileNotFoundError:
+        if not es_archivo_por_defecto(archivo):
+            raise
+        return crear_archivo_inicial(archivo)
 
-    # Si no, generar salida JSON para waybar
-    primera = buscar_primera_tarea_pendiente(nodos)
-    tooltip = generar_tooltip(nodos)
-    
-    if primera:
+def generar_salida(texto, tooltip):
+    """Construir el diccionario JSON que espera waybar (tooltip None = sin tooltip)"""
+    if texto is not None:
         salida = {
-            "text": primera.texto,
+            "text": texto,
             "tooltip": tooltip,
             "class": "todolist-tree"
         }
@@ -216,7 +127,517 @@ def main():
             "tooltip": tooltip,
             "class": "todolist-tree-complete"
         }
-    
+    if tooltip is None:
+        del salida["tooltip"]
+    return salida
+
+def salida_sin_archivo(archivo):
+    """Salida para waybar cuando el markdown elegido no existe (no se recrea)"""
+    return {
+        "text": "⚠️ Sin archivo",
+        "tooltip": f"No se encontró {archivo}",
+        "class": "todolist-tree-missing"
+    }
+
+def obtener_texto_barra(archivo):
+    """
+    Solo el texto de la barra: desde el snapshot si sigue siendo válido y,
+    si no, con el parser perezoso que deja de leer tras la primera tarea.
+    """
+    snapshot = cargar_snapshot(archivo)
+    if snapshot is not None:
+        return texto_primera(snapshot)
+    with open(archivo, "r", encoding="utf-8") as f:
+        primera = buscar_primera_tarea_pendiente_lazy(f)
+    return primera.texto if primera else None
+
+def obtener_salida(archivo, con_tooltip=True, presupuesto=PRESUPUESTO_TOOLTIP):
+    """Salida para waybar, respondida desde el snapshot en caché si es posible"""
+    try:
+        if not con_tooltip:
+            return generar_salida(obtener_texto_barra(archivo), None)
+        snapshot = obtener_snapshot(archivo)
+    except FileNotFoundError:
+        # Un archivo del usuario que falta (borrado o movido) no se sustituye
+        # por la plantilla: eso destruiría su contenido si vuelve a aparecer
+        if not es_archivo_por_defecto(archivo):
+            return salida_sin_archivo(archivo)
+        crear_archivo_inicial(archivo)
+        return obtener_salida(archivo, con_tooltip, presupuesto)
+    tooltip = tooltip_con_presupuesto(archivo, snapshot, presupuesto)
+    return generar_salida(texto_primera(snapshot), tooltip)
+
+def obtener_salida_incremental(archivo, arbol, con_tooltip=True,
+                               presupuesto=PRESUPUESTO_TOOLTIP, render=None):
+    """
+    Variante de obtener_salida para procesos de larga duración: mantiene un
+    ArbolIncremental y solo reenlaza la parte editada del archivo. Con un
+    RenderizadorMemo solo se vuelven a renderizar los subárboles cambiados.
+    Devuelve (salida, arbol).
+    """
+    try:
+        snapshot, arbol = snapshot_incremental(archivo, arbol, render)
+    except FileNotFoundError:
+        if not es_archivo_por_defecto(archivo):
+            return salida_sin_archivo(archivo), None
+        crear_archivo_inicial(archivo)
+        return obtener_salida_incremental(archivo, None, con_tooltip, presupuesto, render)
+
+    tooltip = None
+    if con_tooltip:
+        tooltip = tooltip_con_presupuesto(archivo, snapshot, presupuesto, arbol.nodos)
+    return generar_salida(texto_primera(snapshot), tooltip), arbol
+
+def snapshot_incremental(archivo, arbol, render=None):
+    """
+    Releer `archivo` y actualizar su ArbolIncremental (reenlazando solo la
+    región editada) y su snapshot. Devuelve (snapshot, arbol).
+    Lanza FileNotFoundError si el archivo no existe.
+    """
+    from todolist_incremental import ArbolIncremental
+
+    with open(archivo, "r", encoding="utf-8") as f:
+        st = os.fstat(f.fileno())
+        lineas = f.readlines()
+
+    if arbol is None or arbol.archivo != archivo:
+        arbol = ArbolIncremental(lineas, archivo)
+        if render is not None:
+            render.olvidar()
+    else:
+        afectados = arbol.actualizar(lineas)
+        if render is not None:
+            render.invalidar(afectados)
+
+    snapshot = cargar_snapshot(archivo, st)
+    if snapshot is None:
+        snapshot = construir_snapshot(archivo, st, arbol.nodos, render)
+        guardar_snapshot(archivo, snapshot)
+    return snapshot, arbol
+
+def obtener_salida_agregada(archivos, con_tooltip=True, presupuesto=PRESUPUESTO_TOOLTIP,
+                            orden="config"):
+    """Salida para waybar de varios archivos: texto y tooltip agrupado por archivo"""
+    from todolist_agregado import cargar_resumenes, componer_agregado, ordenar_resumenes
+
+    resumenes = ordenar_resumenes(cargar_resumenes(archivos, presupuesto), orden)
+    return generar_salida(*componer_agregado(resumenes, con_tooltip))
+
+def localizar_tarea(archivos, arboles, referencia):
+    """
+    Buscar una tarea por ID estable o por texto en los árboles en memoria
+    (el mapa de IDs de cada árbol se reutiliza hasta que su archivo cambia).
+    Devuelve (archivo, id, nodo) o None.
+    """
+    for archivo in archivos:
+        arbol = arboles.get(archivo)
+        if arbol is None:
+            continue
+        nodo = arbol.ids.get(referencia)
+        if nodo is not None:
+            return archivo, referencia, nodo
+        nodo = buscar_por_texto(arbol.nodos, referencia)
+        if nodo is not None:
+            return archivo, arbol.id_de(nodo), nodo
+    return None
+
+def tarea_de_la_barra(archivos, arboles):
+    """
+    La tarea que muestra la barra (primera pendiente en el orden de
+    `archivos`), desde el IndicePendientes de cada árbol: O(profundidad)
+    tras una edición en lugar de recorrer el árbol entero
+    """
+    for archivo in archivos:
+        arbol = arboles.get(archivo)
+        if arbol is None:
+            continue
+        primera = arbol.indice.primera()
+        if primera is not None:
+            return archivo, arbol.id_de(primera), primera
+    return None
+
+def fijar_tarea(archivo, id_tarea, hecho):
+    """
+    Marcar (hecho=True) o desmarcar una tarea por ID con el bloqueo de
+    escritura. Devuelve False si la tarea ya no está en el archivo.
+    """
+    from todolist_escritura import editar_documento
+
+    with editar_documento(archivo) as documento:
+        nodo = documento.ids.get(id_tarea)
+        if nodo is None:
+            return False
+        if nodo.checked != hecho:
+            if hecho:
+                documento.marcar(nodo)
+            else:
+                documento.desmarcar(nodo)
+    return True
+
+def aplicar_orden(orden, argumento, archivos, arboles):
+    """
+    Ejecutar mark, unmark o next sobre los árboles que ya están en memoria
+    (`archivos` en el orden de la barra). Devuelve (ok, detalle, archivo tocado).
+    """
+    if orden == "next":
+        encontrada = tarea_de_la_barra(archivos, arboles)
+        if encontrada is None:
+            return False, "no quedan tareas pendientes", None
+    else:
+        if not argumento:
+            return False, f"{orden} necesita un ID o el texto de una tarea", None
+        encontrada = localizar_tarea(archivos, arboles, argumento)
+        if encontrada is None:
+            return False, f"no se encontró la tarea {argumento}", None
+
+    archivo, id_tarea, nodo = encontrada
+    try:
+        if not fijar_tarea(archivo, id_tarea, orden != "unmark"):
+            return False, f"la tarea {argumento or nodo.texto} cambió en el archivo", archivo
+    except OSError as e:
+        return False, str(e), archivo
+    return True, nodo.texto, archivo
+
+def seguir(intervalo=INTERVALO_FOLLOW, con_tooltip=True, presupuesto=PRESUPUESTO_TOOLTIP,
+           estadisticas=False, patrones=None, orden="config", publicar=None, comandos=None):
+    """
+    Modo continuo para waybar (exec sin "interval"):
+    imprime una línea JSON solo cuando cambia el estado renderizado.
+    Entre renders se bloquea en inotify (o sondeo por lotes si no hay inotify)
+    y solo relee el markdown tras un cambio real, reparseando únicamente la
+    región editada. Tras un cambio se publica primero el texto de la barra
+    (parser perezoso) y después el tooltip.
+    Con varios archivos cada uno tiene su árbol y su render memoizado, y solo
+    se vuelven a leer los que cambiaron.
+    Con `publicar` cada línea se entrega a esa función en lugar de a stdout.
+    Con `comandos` (una ColaComandos) atiende además las órdenes del socket de
+    comandos: las ejecuta con los árboles en memoria, publica la línea nueva
+    sin esperar a inotify y después responde a quien la envió.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from todolist_agregado import (
+        HILOS_CARGA, componer_agregado, ordenar_resumenes, presupuesto_por_archivo,
+        resumen_archivo, resumen_faltante
+    )
+    from todolist_render import RenderizadorMemo
+    from todolist_watcher import VigilanteArchivos
+
+    archivos = get_current_files(patrones)
+    vigilante = VigilanteArchivos(
+        [*archivos, config_file, frecencia_file],
+        intervalo_polling=intervalo
+    )
+    ultima = {"linea": None, "tooltip": None}
+    # Estado por archivo: árbol incremental, render memoizado y resumen
+    arboles = {}
+    renders = {}
+    resumenes = {}
+    cambios = None
+    # Archivos en el orden en que los muestra la barra (para "next")
+    orden_barra = archivos
+    # Respuestas a órdenes que esperan a que se publique su efecto
+    respuestas = []
+
+    def emitir(salida):
+        linea = json.dumps(salida, ensure_ascii=False)
+        if linea != ultima["linea"]:
+            if publicar is not None:
+                publicar(linea)
+            else:
+                print(linea, flush=True)
+            ultima["linea"] = linea
+        ultima["tooltip"] = salida.get("tooltip")
+
+    def recargar():
+        # Olvidar todo el estado y volver a expandir config.txt
+        nonlocal archivos
+        if patrones is None:
+            archivos = get_current_files()
+        for estado in (arboles, renders, resumenes):
+            estado.clear()
+        vigilante.actualizar_rutas([*archivos, config_file, frecencia_file])
+
+    def atender(orden_recibida, argumento):
+        # Devuelve (ok, detalle, archivos a releer o None para todos)
+        if orden_recibida == "reload":
+            recargar()
+            return True, f"{len(archivos)} archivo(s)", None
+        if orden_recibida == "switch-file":
+            ruta = Path(os.path.expanduser(argumento)).absolute() if argumento else None
+            if patrones is not None:
+                # Con --archivo config.txt no se usa: cambiarlo no tendría efecto
+                return False, "los archivos vienen de --archivo, no de config.txt", set()
+            if ruta is None or not ruta.is_file():
+                return False, f"no existe el archivo {argumento}", set()
+            try:
+                set_current_file(ruta)
+            except (ConfiguracionMultiple, OSError) as e:
+                return False, str(e), set()
+            recargar()
+            return True, str(ruta), None
+        ok, detalle, archivo = aplicar_orden(orden_recibida, argumento, orden_barra, arboles)
+        return ok, detalle, {archivo} if archivo is not None else set()
+
+    def actualizar(archivo, parte):
+        render = renders.setdefault(archivo, RenderizadorMemo())
+        try:
+            snapshot, arboles[archivo] = snapshot_incremental(archivo, arboles.get(archivo), render)
+        except FileNotFoundError:
+            arboles.pop(archivo, None)
+            return resumen_faltante(archivo)
+        return resumen_archivo(archivo, snapshot, parte, arboles[archivo].nodos)
+
+    try:
+        with ThreadPoolExecutor(max_workers=HILOS_CARGA) as pool:
+            while True:
+                if len(archivos) == 1:
+                    archivo_actual = archivos[0]
+                    orden_barra = archivos
+                    # Releer solo ante un cambio del markdown o de config.txt (o
+                    # en el sondeo, que no sabe qué cambió): frecencia.log se
+                    # escribe en cada visita del selector y no afecta a la barra
+                    if (cambios is None or archivo_actual in cambios
+                            or config_file in cambios or archivo_actual not in arboles):
+                        if (con_tooltip and ultima["linea"] is not None
+                                and cargar_snapshot(archivo_actual) is None):
+                            # Tooltip diferido: texto nuevo ya, tooltip anterior hasta tenerlo
+                            rapida = obtener_salida(archivo_actual, con_tooltip=False)
+                            emitir({
+                                "text": rapida["text"],
+                                "tooltip": ultima["tooltip"],
+                                "class": rapida["class"]
+                            })
+
+                        render = renders.setdefault(archivo_actual, RenderizadorMemo())
+                        salida, arboles[archivo_actual] = obtener_salida_incremental(
+                            archivo_actual, arboles.get(archivo_actual), con_tooltip,
+                            presupuesto, render
+                        )
+                        emitir(salida)
+                else:
+                    # Solo se releen los archivos que cambiaron, en paralelo
+                    parte = presupuesto_por_archivo(presupuesto, len(archivos))
+                    pendientes = [
+                        a for a in archivos
+                        if cambios is None or a in cambios or a not in resumenes
+                    ]
+                    nuevos = pool.map(lambda a: actualizar(a, parte), pendientes)
+                    resumenes.update(zip(pendientes, nuevos))
+                    ordenados = ordenar_resumenes([resumenes[a] for a in archivos], orden)
+                    orden_barra = [r["archivo"] for r in ordenados]
+                    emitir(generar_salida(*componer_agregado(ordenados, con_tooltip)))
+
+                # El efecto de las órdenes ya está publicado: responder
+                for responder, ok, detalle in respuestas:
+                    responder(ok, detalle)
+                respuestas.clear()
+
+                if estadisticas:
+                    # stderr acaba en el log de waybar sin interferir con el JSON
+                    # (con el servidor compartido, en "backend-<h>.log")
+                    datos = {a.name: renders[a].estadisticas() for a in archivos if a in renders}
+                    if len(datos) == 1:
+                        datos = next(iter(datos.values()))
+                    print(f"todolist render: {json.dumps(datos, ensure_ascii=False)}",
+                          file=sys.stderr, flush=True)
+
+                cambios = vigilante.esperar(despertador=comandos)
+                if comandos is not None:
+                    # Una orden por vuelta: la siguiente ve el árbol ya releído
+                    for orden_recibida, argumento, responder in comandos.tomar(1):
+                        ok, detalle, tocados = atender(orden_recibida, argumento)
+                        respuestas.append((responder, ok, detalle))
+                        if tocados is None:
+                            # Recarga completa: releer todos los archivos
+                            cambios = None
+                            continue
+                        cambios |= tocados
+                    if cambios is None:
+                        continue
+                if config_file in cambios and patrones is None:
+                    # config.txt apunta a otros markdown: vigilar los nuevos
+                    nuevos = get_current_files()
+                    if nuevos != archivos:
+                        archivos = nuevos
+                        for estado in (arboles, renders, resumenes):
+                            for archivo in set(estado) - set(archivos):
+                                del estado[archivo]
+                        # El reparto del tooltip depende de cuántos archivos hay
+                        resumenes.clear()
+                        vigilante.actualizar_rutas([*archivos, config_file, frecencia_file])
+    except BrokenPipeError:
+        # waybar cerró la tubería: terminar sin traza
+        pass
+    finally:
+        vigilante.cerrar()
+
+def seguir_compartido(argv, **opciones_seguir):
+    """
+    --follow como cliente del servidor compartido: todas las barras con las
+    mismas opciones reciben las líneas de un único proceso. Si no se puede
+    arrancar el servidor, seguir en este proceso.
+    """
+    from todolist_servidor import ServidorNoDisponible, ruta_socket, seguir_cliente
+
+    argumentos = [arg for arg in argv if arg not in OPCIONES_DE_MODO]
+    comando = comando_propio("--servidor", *argumentos)
+    try:
+        ruta = ruta_socket(argumentos)
+    except OSError:
+        # Sin directorio para el socket
+        ruta = None
+    try:
+        if ruta is not None:
+            seguir_cliente(ruta, comando)
+            return
+    except ServidorNoDisponible:
+        pass
+    seguir(**opciones_seguir)
+
+def servir_barras(argv, **opciones_seguir):
+    """
+    --servidor: dueño del estado parseado, publica a todos los clientes y
+    atiende el socket de comandos (todolistctl.py)
+    """
+    from todolist_servidor import ServidorDifusion, ruta_socket
+
+    argumentos = [arg for arg in argv if arg not in OPCIONES_DE_MODO]
+    servidor = ServidorDifusion(ruta_socket(argumentos), comandos=True)
+    servidor.servir(lambda publicar: seguir(
+        publicar=publicar, comandos=servidor.comandos, **opciones_seguir
+    ))
+
+def marcar_en_archivos(archivos, id_tarea=None, texto=None):
+    """
+    Marcar la tarea (por ID estable o por texto) en el primer archivo que la
+    contenga. Devuelve True si se marcó; sale con error si no existe ninguno.
+    """
+    from todolist_escritura import editar_documento
+
+    encontrado_alguno = False
+    for archivo in archivos:
+        if not os.path.exists(archivo) and es_archivo_por_defecto(archivo):
+            crear_archivo_inicial(archivo)
+        try:
+            # Bloqueo entre escritores; solo se escriben los bytes que cambian
+            with editar_documento(archivo) as documento:
+                if id_tarea is not None:
+                    nodo = documento.ids.get(id_tarea)
+                else:
+                    nodo = buscar_por_texto(documento.nodos, texto)
+                if nodo is not None:
+                    documento.marcar(nodo)
+        except FileNotFoundError:
+            continue
+        encontrado_alguno = True
+        if nodo is not None:
+            # editar_documento ya dejó el snapshot listo para la barra
+            return True
+    if not encontrado_alguno:
+        print(f"No se encontró el archivo {archivos[0]}.", file=sys.stderr)
+        sys.exit(1)
+    return False
+
+def ejecutar_lote(archivos, origen, estadisticas=False):
+    """
+    --batch: aplicar las órdenes de `origen` (un archivo o "-" para stdin) en
+    una sola transacción e informar del resultado de cada una, una línea
+    "ok|error\t<orden>\t<detalle>" por orden (o una lista JSON si la entrada
+    era JSON). Devuelve el código de salida: 1 si alguna orden falló.
+    """
+    from todolist_lote import aplicar_lote, leer_comandos
+
+    try:
+        if origen == "-":
+            texto = sys.stdin.read()
+        else:
+            with open(origen, "r", encoding="utf-8") as f:
+                texto = f.read()
+    except OSError as e:
+        print(f"No se pudo leer el lote: {e}", file=sys.stderr)
+        return 2
+
+    comandos, es_json = leer_comandos(texto)
+    for archivo in archivos:
+        if not os.path.exists(archivo) and es_archivo_por_defecto(archivo):
+            crear_archivo_inicial(archivo)
+    try:
+        resultados, datos = aplicar_lote(archivos, comandos)
+    except FileNotFoundError:
+        print(f"No se encontró el archivo {archivos[0]}.", file=sys.stderr)
+        return 1
+
+    if es_json:
+        print(json.dumps(resultados, ensure_ascii=False))
+    else:
+        for resultado in resultados:
+            estado = "ok" if resultado["ok"] else "error"
+            print(f"{estado}\t{resultado['op']}\t{resultado['detalle']}")
+    if estadisticas:
+        datos["ordenes"] = len(resultados)
+        print(f"todolist lote: {json.dumps(datos, ensure_ascii=False)}", file=sys.stderr)
+    return 0 if all(r["ok"] for r in resultados) else 1
+
+def main():
+    opciones, posicionales = leer_opciones(sys.argv[1:])
+    con_tooltip = "--no-tooltip" not in opciones
+    presupuesto = leer_presupuesto(opciones)
+    orden = leer_orden(opciones)
+    # --archivo (repetible) sustituye a las rutas o globs de config.txt
+    patrones = opciones.get("--archivo")
+    archivos = get_current_files(patrones)
+
+    opciones_seguir = {
+        "con_tooltip": con_tooltip, "presupuesto": presupuesto,
+        "estadisticas": "--stats" in opciones, "patrones": patrones, "orden": orden
+    }
+    if "--servidor" in opciones:
+        servir_barras(sys.argv[1:], **opciones_seguir)
+        return
+
+    if "--follow" in opciones:
+        try:
+            if "--local" in opciones:
+                seguir(**opciones_seguir)
+            else:
+                seguir_compartido(sys.argv[1:], **opciones_seguir)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        return
+
+    if "--ids" in opciones:
+        # Tareas pendientes con su ID estable (para --mark-id); con varios
+        # archivos, cada grupo va precedido de una línea "# <archivo>"
+        for archivo in archivos:
+            try:
+                nodos = parsear_tareas(leer_lineas(archivo))
+            except FileNotFoundError:
+                print(f"No se encontró el archivo {archivo}.", file=sys.stderr)
+                sys.exit(1)
+            if len(archivos) > 1:
+                print(f"# {archivo}")
+            for id_tarea, nodo in zip(calcular_ids(nodos), nodos):
+                if not nodo.checked:
+                    print(f"{id_tarea}\t{'  ' * nodo.nivel}{nodo.texto}")
+        sys.exit(0)
+
+    if "--batch" in opciones:
+        sys.exit(ejecutar_lote(archivos, opciones["--batch"], "--stats" in opciones))
+
+    # Si se llamó con argumento (o con --mark-id), es para marcar esa tarea
+    if posicionales or "--mark-id" in opciones:
+        if not marcar_en_archivos(archivos, opciones.get("--mark-id"),
+                                  posicionales[0] if posicionales else None):
+            print("No se encontró la tarea seleccionada.", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    # Si no, generar salida JSON para waybar
+    if len(archivos) == 1:
+        salida = obtener_salida(archivos[0], con_tooltip, presupuesto)
+    else:
+        salida = obtener_salida_agregada(archivos, con_tooltip, presupuesto, orden)
     print(json.dumps(salida, ensure_ascii=False))
 
 if __name__ == "__main__":
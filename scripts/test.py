@@ -111,6 +111,1716 @@ def test_auto_completion():
         print(f"   ❌ Error en test de propagación: {e}")
         return False
 
+def test_file_watcher():
+    """Probar que el vigilante detecta el guardado por renombrado (VS Code, vim)"""
+    print("👀 Probando vigilancia de archivos...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from todolist_watcher import VigilanteArchivos
+
+    all_ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        objetivo = Path(tmp) / "tareas.md"
+        objetivo.write_text("- [ ] A\n", encoding="utf-8")
+
+        for usar_inotify in (True, False):
+            modo = "inotify" if usar_inotify else "sondeo"
+            vigilante = VigilanteArchivos([objetivo], intervalo_polling=0.1,
+                                          usar_inotify=usar_inotify)
+            try:
+                # Escribir en un temporal y renombrarlo encima del original
+                temporal = Path(tmp) / ".tareas.md.swp"
+                temporal.write_text(f"- [x] A {modo}\n", encoding="utf-8")
+                os.replace(temporal, objetivo)
+
+                cambios = vigilante.esperar(timeout=3)
+                if objetivo in cambios:
+                    print(f"   ✅ Cambio detectado ({modo})")
+                else:
+                    print(f"   ❌ Cambio no detectado ({modo})")
+                    all_ok = False
+
+                # Sin cambios reales no debe informar nada
+                if vigilante.esperar(timeout=0.3):
+                    print(f"   ❌ Cambio fantasma informado ({modo})")
+                    all_ok = False
+            finally:
+                vigilante.cerrar()
+
+        # --follow con un archivo: frecencia.log no obliga a releer el markdown
+        import current
+        import todolist_watcher
+
+        class VigilanteGuionado:
+            # Devuelve una secuencia fija de cambios y luego interrumpe el bucle
+            def __init__(self, rutas, intervalo_polling=None):
+                self.pasos = [{current.frecencia_file}, {current.frecencia_file}, {objetivo}]
+
+            def esperar(self, despertador=None):
+                if not self.pasos:
+                    raise KeyboardInterrupt
+                return self.pasos.pop(0)
+
+            def actualizar_rutas(self, rutas):
+                pass
+
+            def cerrar(self):
+                pass
+
+        lecturas = []
+        original_incremental = current.obtener_salida_incremental
+        original_vigilante = todolist_watcher.VigilanteArchivos
+
+        def contar(archivo, *argumentos):
+            lecturas.append(archivo)
+            return original_incremental(archivo, *argumentos)
+
+        current.obtener_salida_incremental = contar
+        todolist_watcher.VigilanteArchivos = VigilanteGuionado
+        try:
+            current.seguir(patrones=[str(objetivo)], publicar=lambda linea: None)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            current.obtener_salida_incremental = original_incremental
+            todolist_watcher.VigilanteArchivos = original_vigilante
+        if len(lecturas) != 2:
+            print(f"   ❌ --follow releyó el markdown {len(lecturas)} veces (esperadas 2)")
+            all_ok = False
+        else:
+            print("   ✅ --follow solo relee el markdown cuando cambia")
+
+    return all_ok
+
+def test_snapshot_cache():
+    """Probar que el snapshot en caché se reutiliza y se invalida correctamente"""
+    print("💾 Probando caché de snapshots...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    import todolist_cache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        original = todolist_cache.cache_dir
+        todolist_cache.cache_dir = Path(tmp) / "cache"
+        try:
+            tareas = Path(tmp) / "tareas.md"
+            tareas.write_text("- [ ] A\n    - [ ] A.1\n- [ ] B\n", encoding="utf-8")
+
+            snapshot = todolist_cache.obtener_snapshot(tareas)
+            if todolist_cache.texto_primera(snapshot) != "A.1":
+                print(f"   ❌ Primera tarea incorrecta: {todolist_cache.texto_primera(snapshot)}")
+                return False
+
+            if todolist_cache.cargar_snapshot(tareas) is None:
+                print("   ❌ El snapshot no se reutiliza con el archivo sin cambios")
+                return False
+            print("   ✅ Snapshot reutilizado sin reparsear")
+
+            # El sondeo solo lee el registro; el árbol y el menú, bajo demanda
+            registro = json.loads(todolist_cache.ruta_snapshot(tareas).read_text(encoding="utf-8"))
+            if "nodos" in registro or "menu" in registro or registro["pendientes"] != 3:
+                print(f"   ❌ El registro incluye el árbol o le faltan campos: {sorted(registro)}")
+                return False
+            cargado = todolist_cache.cargar_snapshot(tareas)
+            if "menu" in cargado or cargado["menu"] != snapshot["menu"] \
+                    or todolist_cache.ids_menu(cargado) != todolist_cache.ids_menu(snapshot):
+                print("   ❌ El menú no se carga bajo demanda")
+                return False
+            todolist_cache.ruta_arbol(tareas).unlink()
+            cargado = todolist_cache.cargar_snapshot(tareas)
+            if cargado["menu"] != snapshot["menu"] or not todolist_cache.ruta_arbol(tareas).exists():
+                print("   ❌ El árbol no se reconstruye si falta")
+                return False
+            # Árbol de otro estado del archivo: se rehace el snapshot entero
+            cargado = todolist_cache.cargar_snapshot(tareas)
+            todolist_cache.ruta_arbol(tareas).unlink()
+            tareas.write_text("- [ ] C\n- [ ] D\n", encoding="utf-8")
+            nuevo = todolist_cache.parsear_snapshot(tareas)
+            if cargado["menu"] != nuevo["menu"] or todolist_cache.texto_primera(cargado) != "C" \
+                    or cargado["tooltip"] != nuevo["tooltip"] or cargado["clave"] != nuevo["clave"]:
+                print(f"   ❌ Snapshot con registro y árbol de versiones distintas: {dict(cargado)}")
+                return False
+            tareas.write_text("- [ ] A\n    - [ ] A.1\n- [ ] B\n", encoding="utf-8")
+            print("   ✅ Registro ligero; árbol y menú se leen al pedirlos")
+
+            # Un cambio en el archivo invalida la clave
+            tareas.write_text("- [x] A\n    - [x] A.1\n- [ ] B\n", encoding="utf-8")
+            if todolist_cache.cargar_snapshot(tareas) is not None:
+                print("   ❌ Snapshot obsoleto aceptado")
+                return False
+            if todolist_cache.texto_primera(todolist_cache.obtener_snapshot(tareas)) != "B":
+                print("   ❌ El snapshot no se regeneró tras el cambio")
+                return False
+            print("   ✅ Snapshot invalidado tras modificar el archivo")
+
+            # Un snapshot corrupto se ignora
+            todolist_cache.ruta_snapshot(tareas).write_text("{corrupto", encoding="utf-8")
+            if todolist_cache.cargar_snapshot(tareas) is not None:
+                print("   ❌ Snapshot corrupto aceptado")
+                return False
+            print("   ✅ Snapshot corrupto ignorado")
+        finally:
+            todolist_cache.cache_dir = original
+
+    return True
+
+def test_lazy_parser():
+    """Probar que el parser perezoso da la misma tarea y deja de leer antes"""
+    print("⚡ Probando parser perezoso...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from todolist_core import (
+        buscar_primera_tarea_pendiente, buscar_primera_tarea_pendiente_lazy, parsear_tareas
+    )
+
+    lineas = [
+        "- [x] Hecha\n",
+        "    - [x] Hecha 1\n",
+        "- [ ] Pendiente\n",
+        "    - [x] Sub hecha\n",
+        "    - [ ] Sub pendiente\n",
+        "- [ ] Siguiente\n",
+    ] + [f"- [ ] Relleno {i}\n" for i in range(1000)]
+
+    esperada = buscar_primera_tarea_pendiente(parsear_tareas(lineas)).texto
+
+    leidas = []
+    def lector():
+        for linea in lineas:
+            leidas.append(linea)
+            yield linea
+
+    obtenida = buscar_primera_tarea_pendiente_lazy(lector()).texto
+    if obtenida != esperada:
+        print(f"   ❌ Resultado distinto: {obtenida!r} != {esperada!r}")
+        return False
+    print(f"   ✅ Misma tarea: {obtenida}")
+
+    if len(leidas) > 6:
+        print(f"   ❌ Leyó {len(leidas)} líneas, debía parar en la siguiente raíz")
+        return False
+    print(f"   ✅ Solo leyó {len(leidas)} de {len(lineas)} líneas")
+    return True
+
+def test_incremental_parser():
+    """Probar que el reparseo incremental coincide con un parseo completo"""
+    print("🧩 Probando reparseo incremental...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    import random
+    from todolist_core import parsear_tareas
+    from todolist_incremental import ArbolIncremental
+
+    def forma(nodos):
+        indices = {id(n): i for i, n in enumerate(nodos)}
+        return [
+            (n.texto, n.nivel, n.checked, n.linea_idx,
+             indices.get(id(n.padre), -1), [indices[id(h)] for h in n.hijos])
+            for n in nodos
+        ]
+
+    rnd = random.Random(7)
+    def linea():
+        if rnd.random() < 0.1:
+            return "## Sección\n"
+        return f"{'    ' * rnd.randint(0, 3)}- [{rnd.choice(' x')}] T{rnd.randint(0, 20)}\n"
+
+    for caso in range(300):
+        arbol = ArbolIncremental([linea() for _ in range(rnd.randint(0, 30))])
+        for paso in range(5):
+            nuevas = list(arbol.lineas)
+            i = rnd.randint(0, len(nuevas))
+            operacion = rnd.choice(("alternar", "insertar", "borrar", "mover"))
+            if operacion == "alternar" and i < len(nuevas):
+                nuevas[i] = linea()
+            elif operacion == "insertar":
+                nuevas[i:i] = [linea() for _ in range(rnd.randint(1, 3))]
+            elif operacion == "borrar":
+                del nuevas[i:i + rnd.randint(1, 3)]
+            else:
+                bloque = nuevas[i:i + 4]
+                del nuevas[i:i + 4]
+                j = rnd.randint(0, len(nuevas))
+                nuevas[j:j] = bloque
+
+            arbol.actualizar(nuevas)
+            if forma(arbol.nodos) != forma(parsear_tareas(nuevas)):
+                print(f"   ❌ Árbol distinto tras '{operacion}' (caso {caso}, paso {paso})")
+                return False
+
+    print("   ✅ 1500 ediciones aleatorias idénticas al parseo completo")
+    return True
+
+def test_compact_tree():
+    """Probar que el árbol compacto da los mismos recorridos que la lista de Nodo"""
+    print("🗜️  Probando árbol compacto...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from todolist_compacto import ArbolCompacto
+    from todolist_core import (
+        buscar_primera_tarea_pendiente, generar_tooltip, listar_tareas_pendientes,
+        marcar_tarea, parsear_tareas
+    )
+
+    contenido = """# Mezcla
+- [x] Hecha
+    - [ ] Pendiente bajo hecha
+- [ ] Proyecto  
+\t- [ ] Con tab
+\t\t- [x] Más hondo
+    - [ ]
+* [ ] Asterisco
+"""
+    lineas = contenido.splitlines(True)
+    nodos = parsear_tareas(lineas)
+    vistas = ArbolCompacto(contenido).nodos()
+
+    def forma(lista):
+        return [(n.texto, n.nivel, n.checked, n.linea_idx,
+                 n.padre.linea_idx if n.padre else None) for n in lista]
+
+    if forma(nodos) != forma(vistas):
+        print("   ❌ Estructura distinta")
+        return False
+    if (generar_tooltip(nodos) != generar_tooltip(vistas)
+            or listar_tareas_pendientes(nodos) != listar_tareas_pendientes(vistas)
+            or buscar_primera_tarea_pendiente(nodos).linea_idx
+            != buscar_primera_tarea_pendiente(vistas).linea_idx):
+        print("   ❌ Recorridos distintos")
+        return False
+    print("   ✅ Estructura y recorridos idénticos")
+
+    lineas_compacto = list(lineas)
+    marcar_tarea(lineas, nodos, "Pendiente bajo hecha")
+    marcar_tarea(lineas_compacto, vistas, "Pendiente bajo hecha")
+    if lineas != lineas_compacto:
+        print("   ❌ Marcado distinto sobre el árbol compacto")
+        return False
+    print("   ✅ marcar_tarea funciona sobre las vistas")
+    return True
+
+def test_pending_counters():
+    """Probar que los contadores por subárbol coinciden con recorrer el árbol"""
+    print("🔢 Probando contadores de pendientes...")
+
+    import random
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from bench import generar_lineas
+    from todolist_core import (
+        IndicePendientes, buscar_primera_tarea_pendiente, marcar_tarea, parsear_tareas
+    )
+    from todolist_incremental import ArbolIncremental
+
+    def comprobar(indice, nodos):
+        for n in nodos:
+            hijos = sum(1 for h in n.hijos if not h.checked)
+            pila, desc = list(n.hijos), 0
+            while pila:
+                h = pila.pop()
+                desc += not h.checked
+                pila.extend(h.hijos)
+            if indice.pendientes_hijos[n] != hijos or indice.pendientes_desc[n] != desc:
+                return False
+        return indice.primera() is buscar_primera_tarea_pendiente(nodos)
+
+    # Marcar con índice produce las mismas líneas que el recorrido clásico
+    lineas = generar_lineas(300, profundidad=4, semilla=7)
+    nodos_a, nodos_b = parsear_tareas(lineas), parsear_tareas(lineas)
+    lineas_a, lineas_b = list(lineas), list(lineas)
+    indice = IndicePendientes(nodos_b)
+    for n in nodos_a:
+        if not n.checked and not n.hijos:
+            marcar_tarea(lineas_a, nodos_a, n.texto)
+            marcar_tarea(lineas_b, nodos_b, n.texto, indice=indice)
+    if lineas_a != lineas_b or not comprobar(indice, nodos_b):
+        print("   ❌ Marcado con índice distinto del clásico")
+        return False
+    print("   ✅ Propagación con contadores idéntica")
+
+    rnd = random.Random(3)
+    nodos = parsear_tareas(lineas)
+    indice = IndicePendientes(nodos)
+    for paso in range(400):
+        nodo = rnd.choice(nodos)
+        if rnd.random() < 0.7:
+            indice.marcar(None, nodo)
+        else:
+            indice.desmarcar(None, nodo)
+        if paso % 20 == 0 or rnd.random() < 0.1:
+            if not comprobar(indice, nodos):
+                print(f"   ❌ Contadores incoherentes en el paso {paso}")
+                return False
+    print("   ✅ Contadores y primera pendiente coherentes al marcar/desmarcar")
+
+    # Tras un reparseo incremental se recalcula solo la zona afectada
+    arbol = ArbolIncremental(lineas)
+    indice = IndicePendientes(arbol.nodos)
+    for _ in range(30):
+        nuevas = list(arbol.lineas)
+        i = rnd.randrange(2, len(nuevas))
+        if rnd.random() < 0.5:
+            nuevas.insert(i, "    " * rnd.randrange(3) + "- [ ] Insertada\n")
+        else:
+            del nuevas[i]
+        indice.recalcular(arbol.nodos, arbol.actualizar(nuevas))
+        if not comprobar(indice, arbol.nodos):
+            print("   ❌ Contadores incoherentes tras reparseo incremental")
+            return False
+    print("   ✅ recalcular() mantiene el índice tras ediciones")
+
+    # Borrar una raíz sin ancestros ni zona no devuelve afectados: el índice
+    # del árbol tiene que rehacer igualmente sus raíces
+    arbol = ArbolIncremental("\n\t- [ ] t0\n\t- [ ] t5\n        - [ ] t2\n".splitlines(True))
+    arbol.indice.primera()
+    arbol.actualizar(["\n", "\t- [ ] t5\n", "        - [ ] t2\n"])
+    if arbol.indice.primera() is None or arbol.indice.primera().texto != "t2":
+        print("   ❌ La primera pendiente sigue apuntando a una raíz borrada")
+        return False
+
+    # Ediciones al principio del archivo (índices 0 y 1) con el índice del árbol
+    plantillas = ["- [ ] r{}\n", "    - [ ] a{}\n", "\t- [ ] t{}\n", "- [x] h{}\n", "\n"]
+    for caso in range(300):
+        arbol = ArbolIncremental([rnd.choice(plantillas).format(i) for i in range(rnd.randrange(1, 8))])
+        arbol.indice.primera()
+        for paso in range(4):
+            nuevas = list(arbol.lineas)
+            if rnd.random() < 0.5 or not nuevas:
+                i = rnd.randrange(min(2, len(nuevas) + 1))
+                nuevas.insert(i, rnd.choice(plantillas).format(f"{caso}.{paso}"))
+            else:
+                i = rnd.randrange(min(2, len(nuevas)))
+                del nuevas[i]
+            arbol.actualizar(nuevas)
+            if not comprobar(arbol.indice, arbol.nodos):
+                print(f"   ❌ Índice incoherente tras editar la línea {i}: {nuevas!r}")
+                return False
+    print("   ✅ Borrados e inserciones en las líneas 0 y 1 (raíces que cambian)")
+
+    # Un proceso residente edita sin parar: los nodos borrados no se acumulan
+    arbol = ArbolIncremental(lineas)
+    arbol.indice.primera()
+    for paso in range(3000):
+        nuevas = list(arbol.lineas)
+        i = rnd.randrange(2, len(nuevas))
+        if paso % 2 == 0:
+            nuevas.insert(i, "    " * rnd.randrange(3) + f"- [ ] Edición {paso}\n")
+        else:
+            del nuevas[i]
+        arbol.actualizar(nuevas)
+        arbol.indice.primera()
+    limite = 2 * len(arbol.nodos) + 1024
+    tamanos = [len(d) for d in (arbol.indice.pendientes_hijos, arbol.indice.pendientes_desc,
+                                arbol.indice._primera, arbol.indice._desde)]
+    if max(tamanos) > limite or not comprobar(arbol.indice, arbol.nodos):
+        print(f"   ❌ El índice retiene nodos borrados: {tamanos} entradas para {len(arbol.nodos)} nodos")
+        return False
+    print("   ✅ El índice no retiene los nodos borrados por ediciones")
+    return True
+
+def test_stable_ids():
+    """Probar los IDs estables y el marcado exacto con --mark-id"""
+    print("🆔 Probando IDs estables de tareas...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from todolist_core import calcular_ids, indexar_ids, marcar_tarea_por_id, parsear_tareas
+
+    contenido = """# Duplicadas
+- [ ] Backend
+    - [ ] Escribir tests
+- [ ] Frontend
+    - [ ] Escribir tests
+    - [ ] Escribir tests
+"""
+    lineas = contenido.splitlines(True)
+    ids = calcular_ids(parsear_tareas(lineas))
+    if len(set(ids)) != len(ids):
+        print("   ❌ Tareas repetidas comparten ID")
+        return False
+
+    # Marcar una tarea o insertar otras no cambia los IDs existentes
+    nodos = parsear_tareas(lineas)
+    marcar_tarea_por_id(lineas, indexar_ids(nodos), ids[2])
+    editadas = ["- [ ] Nueva al principio\n"] + lineas
+    if calcular_ids(parsear_tareas(editadas))[1:] != ids:
+        print("   ❌ Los IDs cambian al marcar o insertar tareas")
+        return False
+    print("   ✅ IDs únicos y estables ante marcado y ediciones")
+
+    # Extremo a extremo: marcar la segunda "Escribir tests" por ID
+    with tempfile.TemporaryDirectory() as tmp:
+        datos = Path(tmp) / ".local" / "share" / "todolist"
+        datos.mkdir(parents=True)
+        markdown = Path(tmp) / "tareas.md"
+        markdown.write_text(contenido, encoding="utf-8")
+        (datos / "config.txt").write_text(str(markdown), encoding="utf-8")
+        env = dict(os.environ, HOME=tmp)
+        current_script = str(script_dir / "current.py")
+
+        listado = subprocess.run([sys.executable, current_script, "--ids"],
+                                 capture_output=True, text=True, env=env)
+        id_segunda = listado.stdout.splitlines()[3].split("\t")[0]
+        marcado = subprocess.run([sys.executable, current_script, "--mark-id", id_segunda],
+                                 capture_output=True, text=True, env=env)
+        esperado = contenido.replace("- [ ] Frontend\n    - [ ] Escribir tests",
+                                     "- [ ] Frontend\n    - [x] Escribir tests")
+        if marcado.returncode != 0 or markdown.read_text(encoding="utf-8") != esperado:
+            print(f"   ❌ --mark-id no marcó la tarea exacta: {marcado.stderr}")
+            return False
+
+        desconocido = subprocess.run([sys.executable, current_script, "--mark-id", "nope"],
+                                     capture_output=True, text=True, env=env)
+        if desconocido.returncode != 1:
+            print("   ❌ Un ID desconocido debería terminar con código 1")
+            return False
+    print("   ✅ --mark-id marca exactamente la tarea elegida")
+    return True
+
+def test_in_place_patch():
+    """Probar el marcado por parche de bytes y la reescritura si el archivo cambió"""
+    print("🩹 Probando marcado en el sitio...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from todolist_core import marcar_tarea, parsear_tareas
+    from todolist_escritura import DocumentoTareas
+
+    # Acentos y emojis (varios bytes por carácter) y finales de línea mixtos
+    contenido = ("# Compras ñandú 🛒\r\n"
+                 "- [ ] Mercado 🥕\r\n"
+                 "    - [ ] Café ☕\n"
+                 "    - [x] Pan\n"
+                 "- [ ] Después\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        markdown = Path(tmp) / "tareas.md"
+        markdown.write_bytes(contenido.encode("utf-8"))
+        inode = markdown.stat().st_ino
+
+        documento = DocumentoTareas(markdown)
+        documento.marcar(documento.nodos[1])
+        modo = documento.guardar()
+
+        esperado = contenido.replace("- [ ] Mercado", "- [x] Mercado").replace("[ ] Café", "[x] Café")
+        if modo != "parche" or markdown.read_bytes() != esperado.encode("utf-8"):
+            print(f"   ❌ Parche incorrecto (modo {modo})")
+            return False
+        if markdown.stat().st_ino != inode:
+            print("   ❌ El parche reemplazó el archivo")
+            return False
+        print("   ✅ Solo se escriben los bytes del checkbox (y del padre propagado)")
+
+        # Otro proceso edita entre la lectura y el guardado
+        documento = DocumentoTareas(markdown)
+        markdown.write_bytes(b"- [ ] Nueva del editor\n" + markdown.read_bytes())
+        documento.marcar(documento.nodos[3])
+        modo = documento.guardar()
+
+        final = markdown.read_text(encoding="utf-8")
+        lineas = (b"- [ ] Nueva del editor\n" + esperado.encode("utf-8")).decode("utf-8").splitlines(True)
+        marcar_tarea(lineas, parsear_tareas(lineas), "Después")
+        if modo != "reescritura" or markdown.read_bytes() != "".join(lineas).encode("utf-8"):
+            print(f"   ❌ La reescritura perdió cambios (modo {modo}): {final!r}")
+            return False
+    print("   ✅ Archivo cambiado por debajo: se reaplica por ID y se reescribe")
+    return True
+
+def test_concurrent_writes():
+    """Estrés: cientos de marcados concurrentes frente a un lector que sondea sin parar"""
+    print("🏋️  Probando escrituras concurrentes...")
+
+    import random
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from todolist_core import calcular_ids, parsear_tareas
+    from todolist_escritura import bloqueo_escritura, escribir_atomico
+
+    padres, hijos = 20, 10
+    lineas = []
+    for p in range(padres):
+        lineas.append(f"- [ ] Proyecto {p}\n")
+        lineas.extend(f"    - [ ] Tarea {p}.{h}\n" for h in range(hijos))
+    total = len(lineas)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datos = Path(tmp) / ".local" / "share" / "todolist"
+        datos.mkdir(parents=True)
+        markdown = Path(tmp) / "tareas.md"
+        markdown.write_text("".join(lineas), encoding="utf-8")
+        (datos / "config.txt").write_text(str(markdown), encoding="utf-8")
+        env = dict(os.environ, HOME=tmp)
+        current_script = str(script_dir / "current.py")
+
+        nodos = parsear_tareas(lineas)
+        hojas = [i for i, n in zip(calcular_ids(nodos), nodos) if not n.hijos]
+        # Cada hoja una vez más un centenar de repeticiones en orden aleatorio
+        rnd = random.Random(5)
+        trabajos = hojas + rnd.sample(hojas, 100)
+        rnd.shuffle(trabajos)
+
+        fin = threading.Event()
+        errores = []
+
+        def reescritor():
+            # Otro escritor que reemplaza el archivo completo (cambia el inode)
+            while not fin.is_set():
+                with bloqueo_escritura(markdown):
+                    escribir_atomico(markdown, markdown.read_bytes())
+                fin.wait(0.01)
+
+        def marcar(id_tarea):
+            r = subprocess.run([sys.executable, current_script, "--mark-id", id_tarea],
+                               capture_output=True, text=True, env=env)
+            if r.returncode != 0:
+                errores.append(r.stderr)
+
+        hilo = threading.Thread(target=reescritor)
+        hilo.start()
+        lecturas, hechas = 0, 0
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            futuros = [pool.submit(marcar, t) for t in trabajos]
+            while not all(f.done() for f in futuros):
+                with open(markdown, "r", encoding="utf-8") as f:
+                    leidas = parsear_tareas(f.readlines())
+                lecturas += 1
+                marcadas = sum(n.checked for n in leidas)
+                if len(leidas) != total or marcadas < hechas:
+                    fin.set()
+                    hilo.join()
+                    print(f"   ❌ Lectura rota: {len(leidas)} tareas, {marcadas} marcadas")
+                    return False
+                hechas = marcadas
+        fin.set()
+        hilo.join()
+
+        final = parsear_tareas(markdown.read_text(encoding="utf-8").splitlines(True))
+        sobrantes = [p.name for p in Path(tmp).iterdir() if p.name.endswith(".tmp")]
+        if errores or not all(n.checked for n in final) or len(final) != total or sobrantes:
+            print(f"   ❌ Estado final incorrecto ({len(errores)} errores, temporales {sobrantes})")
+            return False
+
+        # El snapshot en caché (escrito dentro del bloqueo) coincide con el archivo
+        barra = subprocess.run([sys.executable, current_script], capture_output=True, text=True, env=env)
+        for snapshot in (datos / "cache").glob("*.json"):
+            snapshot.unlink()
+        limpia = subprocess.run([sys.executable, current_script], capture_output=True, text=True, env=env)
+        if barra.stdout != limpia.stdout:
+            print(f"   ❌ Snapshot obsoleto tras las escrituras: {barra.stdout!r}")
+            return False
+    print(f"   ✅ {len(trabajos)} marcados concurrentes, {lecturas} lecturas, ninguna a medias")
+    return True
+
+def test_budgeted_tooltip():
+    """Probar que el tooltip acotado respeta el presupuesto y no pierde tareas"""
+    print("✂️  Probando tooltip acotado...")
+
+    import re
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from bench import generar_lineas
+    from todolist_core import generar_tooltip, generar_tooltip_acotado, parsear_tareas
+
+    pequeno = parsear_tareas(generar_lineas(60, profundidad=4, semilla=2))
+    if generar_tooltip_acotado(pequeno, 1000, 10 ** 6, 99) != generar_tooltip(pequeno):
+        print("   ❌ Con presupuesto holgado debería coincidir con generar_tooltip")
+        return False
+
+    nodos = parsear_tareas(generar_lineas(12000, profundidad=5, completadas=0.15, semilla=4))
+    pendientes = sum(1 for n in nodos if not n.checked)
+    for lineas, bytes_max, profundidad in ((40, 4096, 5), (25, 1500, 2), (12, 900, 0)):
+        tooltip = generar_tooltip_acotado(nodos, lineas, bytes_max, profundidad)
+        filas = tooltip.split("\n")
+        if len(filas) > lineas or len(tooltip.encode("utf-8")) > bytes_max:
+            print(f"   ❌ Se pasa del presupuesto {(lineas, bytes_max, profundidad)}")
+            return False
+        # Cada pendiente aparece como línea o contada en exactamente un resumen
+        mostradas = sum(1 for f in filas if f.lstrip().startswith("[ ]"))
+        resumidas = sum(int(m.group(1)) for m in re.finditer(r"… (\d+) más", tooltip))
+        if mostradas + resumidas != pendientes:
+            print(f"   ❌ {mostradas} + {resumidas} != {pendientes} pendientes")
+            return False
+        if tooltip != generar_tooltip_acotado(nodos, lineas, bytes_max, profundidad):
+            print("   ❌ El render no es determinista")
+            return False
+    print(f"   ✅ {pendientes} pendientes resumidas dentro del presupuesto, sin perder ninguna")
+    return True
+
+def test_memo_render():
+    """Probar que el render memoizado coincide y solo rehace el camino cambiado"""
+    print("🧮 Probando render memoizado...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    from bench import generar_lineas
+    from todolist_core import generar_tooltip, generar_tooltip_acotado, listar_tareas_pendientes
+    from todolist_incremental import ArbolIncremental
+    from todolist_render import RenderizadorMemo
+
+    arbol = ArbolIncremental(generar_lineas(3000, profundidad=5, semilla=9))
+    render = RenderizadorMemo()
+
+    def coincide():
+        nodos = arbol.nodos
+        return (render.tooltip(nodos) == generar_tooltip(nodos)
+                and render.menu(nodos) == listar_tareas_pendientes(nodos)
+                and render.tooltip_acotado(nodos) == generar_tooltip_acotado(nodos))
+
+    if not coincide():
+        print("   ❌ El render memoizado no coincide con el directo")
+        return False
+
+    # Alternar una hoja profunda: solo su camino hasta la raíz se renderiza
+    hoja = max((n for n in arbol.nodos if not n.hijos), key=lambda n: n.nivel)
+    profundidad = hoja.nivel + 1
+    nuevas = list(arbol.lineas)
+    linea = nuevas[hoja.linea_idx]
+    nuevas[hoja.linea_idx] = linea.replace("[ ]", "[x]", 1) if "[ ]" in linea else linea.replace("[x]", "[ ]", 1)
+    render.invalidar(arbol.actualizar(nuevas))
+
+    fallos = render.fragmentos.fallos
+    render.tooltip(arbol.nodos)
+    render.menu(arbol.nodos)
+    nuevos = render.fragmentos.fallos - fallos
+    if nuevos > 2 * profundidad:
+        print(f"   ❌ {nuevos} fragmentos renderizados para un camino de {profundidad} nodos")
+        return False
+    if not coincide():
+        print("   ❌ El render memoizado no coincide tras la edición")
+        return False
+    stats = render.estadisticas()
+    print(f"   ✅ Tras alternar una hoja: {nuevos} fragmentos nuevos, tasa de acierto {stats['tasa_acierto']:.0%}")
+    return True
+
+def test_file_index():
+    """Probar el índice de markdown: poda, profundidad y refresco incremental"""
+    print("🗂️  Probando índice de archivos...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    import todolist_indice
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        original = todolist_indice.indice_file
+        todolist_indice.indice_file = base / "indice.json"
+        try:
+            home = base / "home"
+            for relativa in ["notas.md", "a/b/c/profundo.md", "a/b/c/d/demasiado.md",
+                             "proyecto/.git/x.md", "proyecto/node_modules/y.md",
+                             ".cache/z.md", "proyecto/LEEME.markdown", "proyecto/datos.txt"]:
+                ruta = home / relativa
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                ruta.write_text("- [ ] algo\n", encoding="utf-8")
+
+            def nombres(indice):
+                return sorted(r.name for r, _, _ in todolist_indice.archivos_indexados(indice))
+
+            indice = todolist_indice.actualizar_indice([home], profundidad=3)
+            if nombres(indice) != ["LEEME.markdown", "notas.md", "profundo.md"]:
+                print(f"   ❌ Archivos indexados incorrectos: {nombres(indice)}")
+                return False
+            print("   ✅ Poda de .git/node_modules/.cache y límite de profundidad")
+
+            # Sin cambios: todo se reutiliza desde el índice guardado
+            indice = todolist_indice.actualizar_indice([home], profundidad=3)
+            if indice["estadisticas"]["escaneados"] != 0:
+                print(f"   ❌ Refresco sin cambios reescaneó: {indice['estadisticas']}")
+                return False
+
+            # Un archivo nuevo solo reescanea su directorio
+            (home / "a" / "b" / "nuevo.md").write_text("- [ ] x\n", encoding="utf-8")
+            (home / "notas.md").unlink()
+            indice = todolist_indice.actualizar_indice([home], profundidad=3)
+            if (indice["estadisticas"]["escaneados"] != 2
+                    or nombres(indice) != ["LEEME.markdown", "nuevo.md", "profundo.md"]):
+                print(f"   ❌ Refresco incremental incorrecto: {indice['estadisticas']} {nombres(indice)}")
+                return False
+            print("   ✅ Refresco incremental por mtime de directorio")
+        finally:
+            todolist_indice.indice_file = original
+    return True
+
+def test_checkbox_sniffing():
+    """Probar el sondeo de checkbox: recuentos, orden, ocultación y caché por mtime"""
+    print("🔎 Probando sondeo de checkbox...")
+
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    import todolist_indice
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        original = todolist_indice.indice_file
+        todolist_indice.indice_file = base / "indice.json"
+        try:
+            home = base / "home"
+            (home / "docs").mkdir(parents=True)
+            contenidos = {
+                "tareas.md": "# T\n- [ ] a\n    * [ ] b\n- [x] c\n- [ ] d\n",
+                "pocas.md": "- [ ] uno\r\n- [x] dos\r\n",
+                "hechas.md": "- [x] todo hecho\n",
+                "LEEME.md": "# Proyecto\n\nTexto con [ ] corchetes y - [x]sin espacio\n",
+                "docs/lejos.md": "x" * (todolist_indice.BYTES_SONDEO + 10) + "\n- [ ] tarde\n"
+            }
+            for relativa, texto in contenidos.items():
+                (home / relativa).write_bytes(texto.encode("utf-8"))
+
+            def listado(indice):
+                return [(r.name, p, c) for r, p, c in todolist_indice.archivos_con_tareas(indice)]
+
+            indice = todolist_indice.actualizar_indice([home], hilos=4)
+            esperado = [("tareas.md", 3, 1), ("pocas.md", 1, 1), ("hechas.md", 0, 1)]
+            if listado(indice) != esperado:
+                print(f"   ❌ Recuentos u orden incorrectos: {listado(indice)}")
+                return False
+            print("   ✅ Orden por pendientes; sin checkbox (o fuera del sondeo) se ocultan")
+
+            indice = todolist_indice.actualizar_indice([home])
+            if indice["estadisticas"]["sondeados"] != 0:
+                print(f"   ❌ Se volvieron a sondear archivos sin cambios: {indice['estadisticas']}")
+                return False
+
+            # Guardado como los editores (temporal + rename): solo ese archivo se sondea
+            temporal = home / ".pocas.tmp"
+            temporal.write_text("- [ ] uno\n- [ ] dos\n- [ ] tres\n- [ ] cuatro\n", encoding="utf-8")
+            os.replace(temporal, home / "pocas.md")
+            indice = todolist_indice.actualizar_indice([home])
+            if indice["estadisticas"]["sondeados"] != 1 or listado(indice)[0] != ("pocas.md", 4, 0):
+                print(f"   ❌ Recuento no actualizado: {indice['estadisticas']} {listado(indice)}")
+                return False
+            print("   ✅ Recuentos en caché por (ruta, mtime)")
+
+            # Edición en el sitio: el mtime del directorio no cambia, el del archivo sí
+            directorio = os.stat(home).st_mtime_ns
+            with open(home / "hechas.md", "a", encoding="utf-8") as f:
+                f.write("- [ ] nueva\n- [ ] otra\n")
+            os.utime(home, ns=(directorio, directorio))
+            indice = todolist_indice.actualizar_indice([home])
+            estadisticas = indice["estadisticas"]
+            if (estadisticas["escaneados"], estadisticas["sondeados"]) != (0, 1) or \
+                    ("hechas.md", 2, 1) not in listado(indice):
+                print(f"   ❌ Edición en el sitio no detectada: {estadisticas} {listado(indice)}")
+                return False
+            print("   ✅ Un archivo editado en el sitio se vuelve a sondear")
+        finally:
+            todolist_indice.indice_file = original
+    return True
+
+def test_rofi_streaming():
+    """Probar que rofi recibe las entradas según se producen, sin esperar a la lista completa"""
+    print("🌊 Probando menú rofi en flujo...")
+
+    import time
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    import choose_and_check
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        # rofi de prueba: elige la primera línea en cuanto llega y sale
+        falso = base / "rofi"
+        falso.write_text(
+            "#!/bin/sh\n"
+            f'echo "$@" > "{base}/args"\n'
+            "head -n 1 > /dev/null\n"
+            "echo 0\n"
+            f'touch "{base}/listo"\n',
+            encoding="utf-8"
+        )
+        falso.chmod(0o755)
+        producidos = []
+
+        def lotes():
+            producidos.append("sistema")
+            yield [("📁 Cambiar archivo markdown...", "cambiar"), ("📄 Editar archivo actual...", "editar")]
+            # Lo que sigue tarda: rofi ya tiene que haber respondido
+            limite = time.time() + 5
+            while not (base / "listo").exists() and time.time() < limite:
+                time.sleep(0.01)
+            producidos.append("tareas")
+            yield [(f" Tarea {i}", i) for i in range(100000)]
+
+        path_original = os.environ["PATH"]
+        os.environ["PATH"] = f"{base}{os.pathsep}{path_original}"
+        try:
+            codigo, seleccion = choose_and_check.rofi_en_flujo(["-p", "x"], lotes())
+        finally:
+            os.environ["PATH"] = path_original
+
+        if (codigo, seleccion) != (0, ["cambiar"]):
+            print(f"   ❌ Selección incorrecta: {codigo} {seleccion!r}")
+            return False
+        if not (base / "listo").exists() or producidos != ["sistema", "tareas"]:
+            print("   ❌ rofi no recibió las primeras entradas antes de terminar la lista")
+            return False
+        if "-async-pre-read 2 " not in (base / "args").read_text(encoding="utf-8"):
+            print("   ❌ -async-pre-read no coincide con las entradas del sistema")
+            return False
+        print("   ✅ Entradas del sistema primero; rofi responde antes de acabar la lista")
+
+        # Cerrar rofi antes de que se carguen las tareas no es "archivo no encontrado"
+        avisos = []
+        originales = (choose_and_check.mostrar_rofi, choose_and_check.notificar,
+                      choose_and_check.get_current_files)
+        choose_and_check.notificar = lambda titulo, mensaje: avisos.append(titulo)
+        choose_and_check.get_current_files = lambda: [base / "no-existe.md"]
+        try:
+            choose_and_check.mostrar_rofi = lambda lotes: None
+            choose_and_check.main_dmenu()
+            if avisos:
+                print(f"   ❌ Error al cancelar rofi antes de tiempo: {avisos}")
+                return False
+            choose_and_check.mostrar_rofi = lambda lotes: list(lotes) and None
+            try:
+                choose_and_check.main_dmenu()
+            except SystemExit:
+                pass
+            if avisos != ["Error"]:
+                print(f"   ❌ No se avisó del archivo inexistente: {avisos}")
+                return False
+        finally:
+            (choose_and_check.mostrar_rofi, choose_and_check.notificar,
+             choose_and_check.get_current_files) = originales
+        print("   ✅ Cancelar antes de tiempo no informa de un archivo inexistente")
+    return True
+
+def test_rofi_index_selection():
+    """Probar que la fila elegida en rofi (-format i) marca exactamente esa tarea"""
+    print("🎯 Probando selección por índice en rofi...")
+
+    script_dir = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        config = base / ".local" / "share" / "todolist"
+        config.mkdir(parents=True)
+        tareas = base / "tareas.md"
+        tareas.write_text(
+            "- [ ] Frontend\n"
+            "    - [ ] Escribir tests\n"
+            "- [ ] Backend\n"
+            "    - [ ] Escribir tests\n"
+            "- [ ] 📁 Carpeta compartida\n",
+            encoding="utf-8"
+        )
+        (config / "config.txt").write_text(str(tareas), encoding="utf-8")
+
+        # rofi de prueba: elige la última fila que contiene el texto buscado
+        bin_dir = base / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "rofi").write_text(
+            "#!/bin/sh\n"
+            "echo \"$@\" | grep -q -- '-format i' || exit 1\n"
+            "grep -n -- \"$BUSCAR\" | tail -n 1 | cut -d: -f1 | awk '{print $1 - 1}'\n",
+            encoding="utf-8"
+        )
+        (bin_dir / "notify-send").write_text("#!/bin/sh\nexit 0\n", encoding="utf-8")
+        for programa in bin_dir.iterdir():
+            programa.chmod(0o755)
+
+        def elegir(buscar):
+            entorno = {**os.environ, "HOME": str(base), "BUSCAR": buscar,
+                       "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"}
+            subprocess.run([sys.executable, str(script_dir / "choose_and_check.py"), "--dmenu"],
+                           env=entorno, capture_output=True, text=True, timeout=30)
+            return tareas.read_text(encoding="utf-8").splitlines()
+
+        lineas = elegir("Escribir tests")
+        if lineas[1] != "    - [ ] Escribir tests" or lineas[3] != "    - [x] Escribir tests":
+            print(f"   ❌ Se marcó la tarea duplicada equivocada: {lineas}")
+            return False
+        print("   ✅ Tareas con el mismo texto se distinguen por la fila")
+
+        lineas = elegir("Carpeta compartida")
+        if lineas[4] != "- [x] 📁 Carpeta compartida":
+            print(f"   ❌ Tarea que empieza por un icono no marcada: {lineas}")
+            return False
+        print("   ✅ Tareas cuyo texto empieza por un icono")
+    return True
+
+def test_rofi_script_mode():
+    """Probar el protocolo del modo script de rofi (ROFI_RETV/ROFI_INFO/ROFI_DATA)"""
+    print("🪟 Probando modo script de rofi...")
+
+    script_dir = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        config = base / ".local" / "share" / "todolist"
+        config.mkdir(parents=True)
+        tareas = base / "tareas.md"
+        tareas.write_text(
+            "- [ ] Frontend\n"
+            "    - [ ] Escribir tests\n"
+            "- [ ] Backend\n"
+            "    - [ ] Escribir tests\n",
+            encoding="utf-8"
+        )
+        otro = base / "otro.md"
+        otro.write_text("- [ ] Tarea del otro archivo\n", encoding="utf-8")
+        (config / "config.txt").write_text(str(tareas), encoding="utf-8")
+        bin_dir = base / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "notify-send").write_text("#!/bin/sh\nexit 0\n", encoding="utf-8")
+        (bin_dir / "notify-send").chmod(0o755)
+
+        def paso(retv, info="", data="", argumento=None):
+            entorno = {**os.environ, "HOME": str(base), "ROFI_RETV": str(retv),
+                       "ROFI_INFO": info, "ROFI_DATA": data,
+                       "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"}
+            cmd = [sys.executable, str(script_dir / "choose_and_check.py")]
+            if argumento is not None:
+                cmd.append(argumento)
+            salida = subprocess.run(cmd, env=entorno, capture_output=True, text=True, timeout=30)
+            # Cada fila: (texto, {opción: valor})
+            filas = []
+            for linea in salida.stdout.splitlines():
+                texto, _, opciones = linea.partition("\0")
+                partes = opciones.split("\x1f") if opciones else []
+                filas.append((texto, dict(zip(partes[::2], partes[1::2]))))
+            return filas
+
+        filas = paso(0)
+        infos = [o.get("info") for t, o in filas if "Escribir tests" in t]
+        modo = {k: v for texto, o in filas if texto == "" for k, v in o.items()}
+        if len(infos) != 2 or modo.get("data") != "menu":
+            print(f"   ❌ Menú inicial incorrecto: {filas}")
+            return False
+
+        # "buscar": sin índice se recorre; con índice se responde con el
+        # guardado y se refresca después de responder
+        nombres = lambda filas: {t.split()[1] for t, o in filas if o.get("info", "").startswith("archivo:")}
+        if "otro.md" not in nombres(paso(1, info="buscar", data="metodo")):
+            print("   ❌ La búsqueda sin índice no encontró los markdown")
+            return False
+        (base / "nuevo.md").write_text("- [ ] Tarea nueva\n", encoding="utf-8")
+        if "nuevo.md" in nombres(paso(1, info="buscar", data="metodo")):
+            print("   ❌ La búsqueda esperó al refresco del índice antes de responder")
+            return False
+        if "nuevo.md" not in nombres(paso(1, info="buscar", data="metodo")):
+            print("   ❌ El índice no se refrescó tras responder")
+            return False
+        (base / "nuevo.md").unlink()
+        print("   ✅ Búsqueda respondida desde el índice guardado y refrescada después")
+
+        # Elegir la segunda "Escribir tests": se marca y rofi se cierra
+        if paso(1, info=infos[1], data="menu") != []:
+            print("   ❌ Tras marcar, el script debería cerrar rofi (sin filas)")
+            return False
+        lineas = tareas.read_text(encoding="utf-8").splitlines()
+        if lineas[1] != "    - [ ] Escribir tests" or lineas[3] != "    - [x] Escribir tests":
+            print(f"   ❌ Tarea marcada incorrecta: {lineas}")
+            return False
+        print("   ✅ Tareas resueltas por ROFI_INFO (ID estable)")
+
+        filas = paso(1, info="cambiar", data="menu")
+        if ("", {"data": "metodo"}) not in filas or len([t for t, o in filas if "info" in o]) != 3:
+            print(f"   ❌ Pantalla de método incorrecta: {filas}")
+            return False
+
+        # Ruta escrita a mano: cambia de archivo y sigue en la misma ventana
+        filas = paso(2, data="manual", argumento=str(otro))
+        if (config / "config.txt").read_text(encoding="utf-8").strip() != str(otro) \
+                or not any("Tarea del otro archivo" in t for t, _ in filas):
+            print(f"   ❌ Cambio de archivo manual incorrecto: {filas}")
+            return False
+        print("   ✅ Transiciones de pantalla dentro de una sola ventana")
+    return True
+
+def test_aggregated_view():
+    """Probar la vista agregada: varios archivos y globs, orden, marcado y --follow"""
+    print("🗃️  Probando vista agregada de varios archivos...")
+
+    import select
+    script_dir = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        config = base / ".local" / "share" / "todolist"
+        config.mkdir(parents=True)
+        casa = base / "casa.md"
+        casa.write_text("- [ ] Comprar pan\n- [x] Barrer\n", encoding="utf-8")
+        (base / "listas").mkdir()
+        trabajo = base / "listas" / "trabajo.md"
+        trabajo.write_text("- [ ] Comprar pan\n- [ ] Informe\n- [ ] Reunión\n", encoding="utf-8")
+        (base / "listas" / "notas.txt").write_text("no es markdown\n", encoding="utf-8")
+        (config / "config.txt").write_text(f"{casa}\n# comentario\n{base}/listas/*.md\n",
+                                           encoding="utf-8")
+        bin_dir = base / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "notify-send").write_text("#!/bin/sh\nexit 0\n", encoding="utf-8")
+        (bin_dir / "notify-send").chmod(0o755)
+        entorno = {**os.environ, "HOME": str(base),
+                   "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"}
+
+        def current(*args):
+            salida = subprocess.run([sys.executable, str(script_dir / "current.py"), *args],
+                                    env=entorno, capture_output=True, text=True, timeout=30)
+            return json.loads(salida.stdout)
+
+        datos = current()
+        if datos["text"] != "Comprar pan · casa" or "📄 casa.md (1 pendientes)" not in datos["tooltip"] \
+                or "📄 trabajo.md (3 pendientes)" not in datos["tooltip"] or "notas" in datos["tooltip"]:
+            print(f"   ❌ Salida agregada incorrecta: {datos}")
+            return False
+        datos = current("--orden", "pendientes")
+        if not datos["tooltip"].startswith("📄 trabajo.md"):
+            print(f"   ❌ --orden pendientes no ordena los grupos: {datos['tooltip']}")
+            return False
+        print("   ✅ config.txt con rutas y globs; tooltip agrupado y ordenado")
+
+        # La misma tarea en dos archivos tiene el mismo ID: rofi debe marcar la
+        # del archivo elegido
+        entorno_rofi = {**entorno, "ROFI_RETV": "0", "ROFI_INFO": "", "ROFI_DATA": ""}
+        salida = subprocess.run([sys.executable, str(script_dir / "choose_and_check.py")],
+                                env=entorno_rofi, capture_output=True, text=True, timeout=30)
+        infos = [linea.split("info\x1f")[1] for linea in salida.stdout.splitlines()
+                 if linea.startswith(" Comprar pan\0")]
+        del_trabajo = [info for info in infos if info.endswith(str(trabajo))]
+        if len(infos) != 2 or len(del_trabajo) != 1:
+            print(f"   ❌ Menú rofi agregado incorrecto: {infos}")
+            return False
+        subprocess.run([sys.executable, str(script_dir / "choose_and_check.py")],
+                       env={**entorno_rofi, "ROFI_RETV": "1", "ROFI_INFO": del_trabajo[0]},
+                       capture_output=True, text=True, timeout=30)
+        if "- [ ] Comprar pan" not in casa.read_text(encoding="utf-8") \
+                or "- [x] Comprar pan" not in trabajo.read_text(encoding="utf-8"):
+            print("   ❌ La tarea se marcó en el archivo equivocado")
+            return False
+        print("   ✅ El menú rofi marca en el archivo de la fila elegida")
+
+        # --follow: un cambio en un archivo actualiza la salida agregada
+        proceso = subprocess.Popen([sys.executable, str(script_dir / "current.py"), "--follow"],
+                                   env=entorno, stdout=subprocess.PIPE, text=True)
+        try:
+            def siguiente():
+                if not select.select([proceso.stdout], [], [], 10)[0]:
+                    return None
+                return json.loads(proceso.stdout.readline())
+
+            primera = siguiente()
+            casa.write_text("- [x] Comprar pan\n- [x] Barrer\n", encoding="utf-8")
+            nueva = siguiente()
+            if primera is None or nueva is None or nueva["text"] != "Informe · trabajo" \
+                    or "📄 casa.md ✅" not in nueva["tooltip"]:
+                print(f"   ❌ --follow agregado no se actualizó: {primera} -> {nueva}")
+                return False
+        finally:
+            proceso.terminate()
+            proceso.wait()
+        print("   ✅ --follow vigila todos los archivos")
+    return True
+
+def test_shared_backend():
+    """Probar el servidor compartido: un solo proceso para varias barras"""
+    print("🛰️  Probando servidor compartido para varias barras...")
+
+    import select
+    import time
+    script_dir = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        runtime = base / "run"
+        runtime.mkdir()
+        config = base / ".local" / "share" / "todolist"
+        config.mkdir(parents=True)
+        tareas = config / "todolist.md"
+        tareas.write_text("- [ ] uno\n- [ ] dos\n", encoding="utf-8")
+        entorno = {**os.environ, "HOME": str(base), "XDG_RUNTIME_DIR": str(runtime)}
+
+        def servidores():
+            # Procesos --servidor lanzados para este runtime
+            encontrados = 0
+            for pid in filter(str.isdigit, os.listdir("/proc")):
+                try:
+                    cmdline = Path(f"/proc/{pid}/cmdline").read_bytes()
+                    environ = Path(f"/proc/{pid}/environ").read_bytes()
+                except OSError:
+                    continue
+                if b"--servidor" in cmdline and f"XDG_RUNTIME_DIR={runtime}".encode() in environ:
+                    encontrados += 1
+            return encontrados
+
+        def siguiente(proceso):
+            if not select.select([proceso.stdout], [], [], 10)[0]:
+                return None
+            return json.loads(proceso.stdout.readline())
+
+        clientes = [
+            subprocess.Popen([sys.executable, str(script_dir / "current.py"), "--follow"],
+                             env=entorno, stdout=subprocess.PIPE, text=True)
+            for _ in range(3)
+        ]
+        try:
+            primeras = [siguiente(c) for c in clientes]
+            if any(p is None or p["text"] != "uno" for p in primeras) or servidores() != 1:
+                print(f"   ❌ Arranque compartido incorrecto: {primeras}, {servidores()} servidores")
+                return False
+            print("   ✅ Tres barras, un único servidor")
+
+            tareas.write_text("- [x] uno\n- [ ] dos\n", encoding="utf-8")
+            nuevas = [siguiente(c) for c in clientes]
+            if any(n is None or n["text"] != "dos" for n in nuevas):
+                print(f"   ❌ No se difundió el cambio: {nuevas}")
+                return False
+            print("   ✅ Cada cambio se difunde a todos los clientes")
+        finally:
+            for cliente in clientes:
+                cliente.terminate()
+                cliente.wait()
+
+        # --stats: el stderr del servidor va a su log, no a DEVNULL
+        cliente = subprocess.Popen(
+            [sys.executable, str(script_dir / "current.py"), "--follow", "--stats"],
+            env=entorno, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            primera = siguiente(cliente)
+            limite = time.time() + 10
+            registro = ""
+            while "todolist render:" not in registro and time.time() < limite:
+                time.sleep(0.1)
+                registro = "".join(
+                    p.read_text(encoding="utf-8") for p in (runtime / "todolist").glob("*.log")
+                )
+            if primera is None or "todolist render:" not in registro:
+                print(f"   ❌ Las estadísticas del servidor se pierden: {registro!r}")
+                return False
+            print("   ✅ --stats del servidor queda en backend-<h>.log")
+        finally:
+            cliente.terminate()
+            cliente.wait()
+
+        limite = time.time() + 10
+        while servidores() and time.time() < limite:
+            time.sleep(0.1)
+        restos = [*(runtime / "todolist").glob("*.sock"), *(runtime / "todolist").glob("*.lock")]
+        if servidores() or restos:
+            print(f"   ❌ El servidor no terminó tras irse el último cliente: {restos}")
+            return False
+        print("   ✅ El servidor termina cuando se va el último cliente (sin sockets ni candados)")
+
+        # Sin XDG_RUNTIME_DIR, un todolist-<uid> ajeno o abierto a otros se rechaza
+        temporal = base / "tmp"
+        ajeno = temporal / f"todolist-{os.getuid()}"
+        ajeno.mkdir(parents=True)
+        ajeno.chmod(0o777)
+        sin_runtime = {k: v for k, v in entorno.items() if k != "XDG_RUNTIME_DIR"}
+        sin_runtime["TMPDIR"] = str(temporal)
+        r = subprocess.run(
+            [sys.executable, "-c",
+             "import todolist_runtime\n"
+             "try:\n    todolist_runtime.directorio_runtime()\n"
+             "except PermissionError:\n    print('rechazado')"],
+            cwd=script_dir, env=sin_runtime, capture_output=True, text=True, timeout=15
+        )
+        if r.stdout.strip() != "rechazado":
+            print(f"   ❌ Se aceptó un directorio de sockets accesible a otros: {r.stdout!r} {r.stderr!r}")
+            return False
+        print("   ✅ Un directorio de sockets accesible a otros se rechaza")
+    return True
+
+def test_command_socket():
+    """Probar el socket de comandos del servidor residente con todolistctl.py"""
+    print("🎛️  Probando socket de comandos (todolistctl.py)...")
+
+    import select
+    script_dir = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        (base / "run").mkdir()
+        config = base / ".local" / "share" / "todolist"
+        config.mkdir(parents=True)
+        tareas = config / "todolist.md"
+        tareas.write_text("- [ ] uno\n    - [ ] uno.a\n- [ ] dos\n", encoding="utf-8")
+        otro = base / "otro.md"
+        otro.write_text("- [ ] de otro archivo\n", encoding="utf-8")
+        entorno = {**os.environ, "HOME": str(base), "XDG_RUNTIME_DIR": str(base / "run")}
+
+        def ctl(*argumentos):
+            return subprocess.run(
+                [sys.executable, str(script_dir / "todolistctl.py"), *argumentos],
+                env=entorno, capture_output=True, text=True, timeout=15
+            )
+
+        def texto_barra():
+            # Última línea disponible de la barra
+            texto = None
+            while select.select([barra.stdout], [], [], 0.5 if texto else 10)[0]:
+                texto = json.loads(barra.stdout.readline())["text"]
+            return texto
+
+        barra = subprocess.Popen([sys.executable, str(script_dir / "current.py"), "--follow"],
+                                 env=entorno, stdout=subprocess.PIPE, text=True)
+        try:
+            if texto_barra() != "uno.a":
+                print("   ❌ La barra no arrancó")
+                return False
+
+            r = ctl("next")
+            if r.returncode != 0 or r.stdout.strip() != "uno.a" or texto_barra() != "dos":
+                print(f"   ❌ next no marcó la tarea de la barra: {r.stdout!r} {r.stderr!r}")
+                return False
+            if "- [x] uno\n    - [x] uno.a" not in tareas.read_text(encoding="utf-8"):
+                print("   ❌ next no propagó la marca al padre")
+                return False
+            print("   ✅ next marca la tarea de la barra y la barra se actualiza")
+
+            r = ctl("unmark", "uno.a")
+            if r.returncode != 0 or tareas.read_text(encoding="utf-8") != "- [ ] uno\n    - [ ] uno.a\n- [ ] dos\n":
+                print(f"   ❌ unmark no desmarcó la tarea y su padre: {r.stderr!r}")
+                return False
+            if texto_barra() != "uno.a":
+                print("   ❌ La barra no se actualizó tras unmark")
+                return False
+            print("   ✅ unmark desmarca la tarea y sus padres")
+
+            r = ctl("mark", "no existe")
+            if r.returncode == 0 or "no se encontró" not in r.stderr:
+                print("   ❌ Una tarea inexistente debería devolver error")
+                return False
+            if ctl("volar").returncode != 2:
+                print("   ❌ Una orden desconocida debería devolver código 2")
+                return False
+            print("   ✅ Errores informados con código de salida")
+
+            r = ctl("switch-file", str(otro))
+            if r.returncode != 0 or texto_barra() != "de otro archivo":
+                print(f"   ❌ switch-file no cambió el archivo: {r.stderr!r}")
+                return False
+            if ctl("reload").returncode != 0:
+                print("   ❌ reload falló")
+                return False
+            print("   ✅ switch-file y reload")
+
+            # Con varias rutas o globs en config.txt, switch-file no la pisa
+            varias = f"{tareas}\n{base}/*.md\n"
+            (config / "config.txt").write_text(varias, encoding="utf-8")
+            r = ctl("switch-file", str(otro))
+            if r.returncode == 0 or (config / "config.txt").read_text(encoding="utf-8") != varias:
+                print(f"   ❌ switch-file sobrescribió una configuración múltiple: {r.stderr!r}")
+                return False
+            print("   ✅ switch-file no sustituye una configuración con varias rutas")
+        finally:
+            barra.terminate()
+            barra.wait()
+
+        # Con --archivo, config.txt no se usa: switch-file es un error
+        barra = subprocess.Popen(
+            [sys.executable, str(script_dir / "current.py"), "--follow", "--archivo", str(tareas)],
+            env=entorno, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            if texto_barra() is None:
+                print("   ❌ La barra con --archivo no arrancó")
+                return False
+            r = ctl("switch-file", str(otro))
+            if r.returncode == 0 or "--archivo" not in r.stderr:
+                print(f"   ❌ switch-file con --archivo debería fallar: {r.stdout!r} {r.stderr!r}")
+                return False
+            print("   ✅ switch-file informa de un error con --archivo")
+        finally:
+            barra.terminate()
+            barra.wait()
+
+        # Sin XDG_RUNTIME_DIR, cliente y servidor usan el mismo directorio de TMPDIR
+        temporal = base / "tmp"
+        temporal.mkdir()
+        sin_runtime = {k: v for k, v in entorno.items() if k != "XDG_RUNTIME_DIR"}
+        sin_runtime["TMPDIR"] = str(temporal)
+        r = subprocess.run(
+            [sys.executable, "-c",
+             "import todolist_servidor as s, todolistctl as c; "
+             "r = s.ruta_comandos(s.ruta_socket([])); open(r, 'w').close(); "
+             "print(c.sockets_comandos() == [str(r)])"],
+            cwd=script_dir, env=sin_runtime, capture_output=True, text=True, timeout=15
+        )
+        if r.stdout.strip() != "True" or not list(temporal.glob("todolist-*")):
+            print(f"   ❌ todolistctl no encuentra los sockets bajo TMPDIR: {r.stdout!r} {r.stderr!r}")
+            return False
+        print("   ✅ todolistctl busca los sockets donde los crea el servidor")
+
+        # Un clic no debe cargar el servidor ni tempfile, threading, etc.
+        r = subprocess.run(
+            [sys.executable, "-S", "-c",
+             "import sys, todolistctl; todolistctl.sockets_comandos(); print(' '.join(sorted("
+             "{'todolist_servidor', 'todolist_core', 'tempfile', 'threading', 'hashlib',"
+             " 'fcntl', 'pathlib', 'shutil', 'random', 'subprocess'} & set(sys.modules))))"],
+            cwd=script_dir, env=entorno, capture_output=True, text=True, timeout=15
+        )
+        if r.returncode != 0 or r.stdout.strip():
+            print(f"   ❌ todolistctl importa módulos de más: {r.stdout!r} {r.stderr!r}")
+            return False
+        print("   ✅ todolistctl solo importa os, socket, sys y todolist_runtime")
+    return True
+
+def test_batch_completion():
+    """Probar el completado por lotes: una propagación, una escritura y una notificación"""
+    print("🧺 Probando completado de varias tareas a la vez...")
+
+    import random
+    from todolist_core import marcar_nodo, marcar_nodos, parsear_tareas
+
+    # marcar_nodos (una pasada) equivale a marcar las tareas una a una
+    rnd = random.Random(7)
+    for _ in range(50):
+        lineas = []
+        for i in range(40):
+            nivel = rnd.randint(0, min(3, lineas[-1][0] + 1)) if lineas else 0
+            lineas.append((nivel, f"{'    ' * nivel}- [{'x' if rnd.random() < 0.3 else ' '}] t{i}\n"))
+        lineas = [linea for _, linea in lineas]
+        elegidas = rnd.sample(range(len(parsear_tareas(lineas))), 8)
+
+        uno_a_uno = list(lineas)
+        nodos = parsear_tareas(uno_a_uno)
+        for i in elegidas:
+            marcar_nodo(uno_a_uno, nodos[i])
+        en_lote = list(lineas)
+        nodos = parsear_tareas(en_lote)
+        marcar_nodos(en_lote, [nodos[i] for i in elegidas])
+        if en_lote != uno_a_uno:
+            print("   ❌ marcar_nodos no coincide con marcar una a una")
+            return False
+    print("   ✅ Una sola pasada de propagación da el mismo resultado")
+
+    script_dir = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        config = base / ".local" / "share" / "todolist"
+        config.mkdir(parents=True)
+        tareas = base / "tareas.md"
+        contenido = "- [ ] Padre\n    - [ ] Hija 1\n    - [ ] Hija 2\n- [ ] Suelta\n- [ ] Otra\n"
+        (config / "config.txt").write_text(str(tareas), encoding="utf-8")
+        bin_dir = base / "bin"
+        bin_dir.mkdir()
+        notificaciones = base / "notificaciones.log"
+        # rofi de prueba: exige -multi-select y elige las filas de $FILAS
+        (bin_dir / "rofi").write_text(
+            "#!/bin/sh\n"
+            "echo \"$@\" | grep -q -- '-multi-select' || exit 1\n"
+            "cat > /dev/null\n"
+            "for fila in $FILAS; do echo $fila; done\n",
+            encoding="utf-8"
+        )
+        (bin_dir / "notify-send").write_text(
+            f"#!/bin/sh\necho \"$1\" >> {notificaciones}\n", encoding="utf-8"
+        )
+        for programa in bin_dir.iterdir():
+            programa.chmod(0o755)
+        entorno = {**os.environ, "HOME": str(base),
+                   "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"}
+
+        # Filas: 0-1 acciones, 2 separador, 3 Padre, 4 Hija 1, 5 Hija 2, 6 Suelta
+        tareas.write_text(contenido, encoding="utf-8")
+        inodo = tareas.stat().st_ino
+        subprocess.run([sys.executable, str(script_dir / "choose_and_check.py"), "--dmenu"],
+                       env={**entorno, "FILAS": "4 5 6"}, capture_output=True, timeout=30)
+        esperado = "- [x] Padre\n    - [x] Hija 1\n    - [x] Hija 2\n- [x] Suelta\n- [ ] Otra\n"
+        if tareas.read_text(encoding="utf-8") != esperado:
+            print(f"   ❌ Selección múltiple mal aplicada: {tareas.read_text(encoding='utf-8')!r}")
+            return False
+        if tareas.stat().st_ino != inodo:
+            print("   ❌ El lote debería parchear el archivo en su sitio")
+            return False
+        if notificaciones.read_text(encoding="utf-8").splitlines() != ["3 Tareas Completadas"]:
+            print(f"   ❌ Se esperaba una sola notificación: {notificaciones.read_text(encoding='utf-8')!r}")
+            return False
+        print("   ✅ -multi-select completa todas las filas con una notificación")
+
+        # Modo script: TECLA_SELECCIONAR (ROFI_RETV 10) acumula y Enter completa
+        tareas.write_text(contenido, encoding="utf-8")
+        notificaciones.unlink()
+
+        def paso(retv, info="", data=""):
+            salida = subprocess.run(
+                [sys.executable, str(script_dir / "choose_and_check.py")],
+                env={**entorno, "ROFI_RETV": str(retv), "ROFI_INFO": info, "ROFI_DATA": data},
+                capture_output=True, text=True, timeout=30
+            )
+            filas = []
+            for linea in salida.stdout.splitlines():
+                texto, _, opciones = linea.partition("\0")
+                partes = opciones.split("\x1f") if opciones else []
+                filas.append((texto, dict(zip(partes[::2], partes[1::2]))))
+            return filas
+
+        def info_de(filas, texto):
+            return next(o["info"] for t, o in filas if t.strip().endswith(texto) and "info" in o)
+
+        filas = paso(0)
+        filas = paso(10, info_de(filas, "Suelta"), "menu")
+        modo = {k: v for texto, o in filas if texto == "" for k, v in o.items()}
+        if not modo.get("data", "").startswith("menu [") or "active" not in modo:
+            print(f"   ❌ La selección no se conserva ni se resalta: {modo}")
+            return False
+        if paso(1, info_de(filas, "Otra"), modo["data"]) != []:
+            print("   ❌ Tras completar la selección el script debería cerrar rofi")
+            return False
+        esperado = "- [ ] Padre\n    - [ ] Hija 1\n    - [ ] Hija 2\n- [x] Suelta\n- [x] Otra\n"
+        if tareas.read_text(encoding="utf-8") != esperado \
+                or notificaciones.read_text(encoding="utf-8").splitlines() != ["2 Tareas Completadas"]:
+            print(f"   ❌ Selección del modo script mal aplicada: {tareas.read_text(encoding='utf-8')!r}")
+            return False
+        print("   ✅ Modo script: selección acumulada y completada de una vez")
+    return True
+
+def test_batch_mutations():
+    """Probar current.py --batch: varias órdenes, una escritura y un informe por orden"""
+    print("📦 Probando lotes de órdenes (current.py --batch)...")
+
+    script_dir = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        config = base / ".local" / "share" / "todolist"
+        config.mkdir(parents=True)
+        tareas = config / "todolist.md"
+        tareas.write_text(
+            "# Lista\n"
+            "- [ ] Frontend\n"
+            "    - [ ] Escribir tests\n"
+            "    - [ ] Maquetar\n"
+            "- [ ] Backend\n"
+            "    - [ ] Escribir tests\n"
+            "- [x] Hecha\n",
+            encoding="utf-8"
+        )
+        entorno = {**os.environ, "HOME": str(base)}
+
+        def lote(entrada):
+            return subprocess.run(
+                [sys.executable, str(script_dir / "current.py"), "--batch", "-"],
+                input=entrada, env=entorno, capture_output=True, text=True, timeout=30
+            )
+
+        r = lote(
+            "# cerrar desde los commits\n"
+            "mark Escribir tests\n"
+            "mark Escribir tests\n"
+            "mark Maquetar\n"
+            "add\tRevisar\tHecha\n"
+            "move\tBackend\tFrontend\n"
+            "mark No existe\n"
+        )
+        esperado = (
+            "# Lista\n"
+            "- [x] Frontend\n"
+            "    - [x] Escribir tests\n"
+            "    - [x] Maquetar\n"
+            "    - [x] Backend\n"
+            "        - [x] Escribir tests\n"
+            "- [ ] Hecha\n"
+            "    - [ ] Revisar\n"
+        )
+        if tareas.read_text(encoding="utf-8") != esperado:
+            print(f"   ❌ Lote mal aplicado: {tareas.read_text(encoding='utf-8')!r}")
+            return False
+        informe = [linea.split("\t")[0] for linea in r.stdout.splitlines()]
+        if informe != ["ok"] * 5 + ["error"] or r.returncode != 1:
+            print(f"   ❌ Informe por orden incorrecto: {r.stdout!r} (código {r.returncode})")
+            return False
+        print("   ✅ Marcas con texto repetido, add y move en un solo árbol")
+        print("   ✅ Una orden fallida se informa sin detener el resto")
+
+        r = lote('[{"op": "unmark", "tarea": "Maquetar"}, {"op": "move", "tarea": "Frontend", "destino": "Maquetar"}]')
+        try:
+            resultados = json.loads(r.stdout)
+        except ValueError:
+            resultados = None
+        if resultados is None or [x["ok"] for x in resultados] != [True, False]:
+            print(f"   ❌ Entrada JSON mal procesada: {r.stdout!r}")
+            return False
+        if not tareas.read_text(encoding="utf-8").startswith("# Lista\n- [ ] Frontend\n"):
+            print("   ❌ unmark no desmarcó al padre")
+            return False
+        print("   ✅ Entrada JSON con informe JSON")
+
+        # Sacar el único hijo pendiente deja al padre de origen hecho
+        r = lote("move\tMaquetar\t\n")
+        esperado = (
+            "# Lista\n"
+            "- [x] Frontend\n"
+            "    - [x] Escribir tests\n"
+            "    - [x] Backend\n"
+            "        - [x] Escribir tests\n"
+            "- [ ] Hecha\n"
+            "    - [ ] Revisar\n"
+            "- [ ] Maquetar\n"
+        )
+        if r.returncode != 0 or tareas.read_text(encoding="utf-8") != esperado:
+            print(f"   ❌ move no propagó al padre de origen: {tareas.read_text(encoding='utf-8')!r}")
+            return False
+        print("   ✅ move propaga la marca al padre que deja atrás")
+    return True
+
+def test_precompiled_launchers():
+    """Probar la instalación precompilada: lanzadores -IS y lógica en ~/.local/lib/todolist"""
+    print("🚀 Probando lanzadores precompilados (install.py)...")
+    import io
+    from contextlib import redirect_stdout
+
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from install import HyDETodolistInstaller
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        datos = base / ".local" / "share" / "todolist"
+        datos.mkdir(parents=True)
+        (datos / "todolist.md").write_text("- [ ] Padre\n    - [ ] Hija\n", encoding="utf-8")
+        instalador = HyDETodolistInstaller()
+        instalador.local_bin = base / ".local" / "bin"
+        instalador.local_lib = base / ".local" / "lib" / "todolist"
+        instalador.local_bin.mkdir(parents=True)
+        # Copia suelta de una instalación anterior: no debe quedar a la sombra
+        (instalador.local_bin / "todolist_core.py").write_text("raise SystemExit(3)\n")
+        with redirect_stdout(io.StringIO()):
+            if not instalador.install_scripts():
+                print("   ❌ install_scripts() falló")
+                return False
+
+        for script in instalador.scripts:
+            lanzador = instalador.local_bin / Path(script).name
+            if not os.access(lanzador, os.X_OK) or not lanzador.read_text().split("\n")[0].endswith(" -IS"):
+                print(f"   ❌ Lanzador no ejecutable o sin -IS: {lanzador}")
+                return False
+        compilados = {p.name.split(".")[0] for p in (instalador.local_lib / "__pycache__").glob("*.pyc")}
+        faltan = {Path(m).stem for m in instalador.scripts + instalador.modules} - compilados
+        if faltan:
+            print(f"   ❌ Módulos sin .pyc: {sorted(faltan)}")
+            return False
+        if (instalador.local_bin / "todolist_core.py").exists():
+            print("   ❌ Quedó la copia suelta de todolist_core.py en ~/.local/bin")
+            return False
+        print("   ✅ Lanzadores -IS en ~/.local/bin y un .pyc por módulo")
+
+        entorno = {**os.environ, "HOME": str(base)}
+        r = subprocess.run([str(instalador.local_bin / "current.py")], env=entorno,
+                           capture_output=True, text=True, timeout=30)
+        if r.returncode != 0 or json.loads(r.stdout or "{}").get("text") != "Hija":
+            print(f"   ❌ El lanzador de current.py no funciona: {r.stdout!r} {r.stderr!r}")
+            return False
+
+        # El sondeo de waybar no debe pagar lo que solo usan las escrituras
+        r = subprocess.run(
+            [sys.executable, "-IS", "-X", "importtime", str(instalador.local_bin / "current.py")],
+            env=entorno, capture_output=True, text=True, timeout=30
+        )
+        importados = {linea.split("|")[-1].strip() for linea in r.stderr.splitlines()}
+        pesados = importados & {"subprocess", "tempfile", "concurrent.futures", "fcntl", "site"}
+        if pesados:
+            print(f"   ❌ El sondeo importa módulos de caminos fríos: {sorted(pesados)}")
+            return False
+        r = subprocess.run(
+            [sys.executable, "-X", "importtime", str(Path(__file__).parent / "choose_and_check.py")],
+            env={**entorno, "ROFI_RETV": "0"}, capture_output=True, text=True, timeout=30
+        )
+        if "subprocess" in {linea.split("|")[-1].strip() for linea in r.stderr.splitlines()}:
+            print("   ❌ choose_and_check.py importa subprocess solo para pintar el menú")
+            return False
+        print("   ✅ Sin subprocess, tempfile ni concurrent.futures en los caminos de lectura")
+    return True
+
+def test_benchmark_suite():
+    """Probar bench.py suite y comparar: JSON por tamaño y etapa, y detección de regresiones"""
+    print("📊 Probando la suite de benchmarks...")
+
+    bench = Path(__file__).parent / "bench.py"
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp) / "base.json"
+        r = subprocess.run(
+            [sys.executable, str(bench), "suite", "--tamanos", "100,1000", "--repeticiones", "1",
+             "--profundidad", "3", "--tabs", "--salida", str(base)],
+            capture_output=True, text=True, timeout=120
+        )
+        if r.returncode != 0:
+            print(f"   ❌ La suite falló: {r.stderr}")
+            return False
+        datos = json.loads(base.read_text(encoding="utf-8"))
+        etapas = {"parsear", "buscar_primera", "tooltip", "listar_pendientes", "marcar"}
+        for resultado in datos["resultados"]:
+            if not etapas <= set(resultado["etapas"]) or resultado["rss_max_kb"] <= 0:
+                print(f"   ❌ Resultado incompleto: {sorted(resultado['etapas'])}")
+                return False
+        if [r["nodos"] for r in datos["resultados"]] != [100, 1000] or not datos["parametros"]["tabs"]:
+            print("   ❌ El generador no respetó los tamaños o la indentación con tabs")
+            return False
+        print("   ✅ Tiempo y pico de memoria por etapa en JSON")
+
+        # Misma base: sin regresiones; con el parseo el triple de lento, regresión
+        comparar = [sys.executable, str(bench), "comparar", str(base)]
+        if subprocess.run(comparar + [str(base)], capture_output=True, timeout=30).returncode != 0:
+            print("   ❌ Comparar un resultado consigo mismo da regresión")
+            return False
+        lento = Path(tmp) / "lento.json"
+        datos["resultados"][1]["etapas"]["parsear"]["ms_mediana"] *= 3
+        lento.write_text(json.dumps(datos), encoding="utf-8")
+        r = subprocess.run(comparar + [str(lento)], capture_output=True, text=True, timeout=30)
+        if r.returncode != 1 or "1000 tareas, parsear" not in r.stdout:
+            print(f"   ❌ No se detectó la regresión: {r.stdout}")
+            return False
+        print("   ✅ comparar detecta una etapa más lenta que el umbral")
+    return True
+
+def test_frecency_store():
+    """Probar el ranking por frecencia, la compactación y la migración del historial"""
+    print("⏰ Probando archivos recientes por frecencia...")
+
+    import time
+    script_dir = Path(__file__).parent
+    sys.path.insert(0, str(script_dir))
+    import todolist_frecencia as frecencia
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        originales = (frecencia.config_dir, frecencia.frecencia_file, frecencia.historial_file)
+        frecencia.config_dir = base
+        frecencia.frecencia_file = base / "frecencia.log"
+        frecencia.historial_file = base / "historial.txt"
+        try:
+            rutas = {nombre: base / f"{nombre}.md" for nombre in ("viejo", "nuevo", "antiguo", "borrado")}
+            for ruta in rutas.values():
+                ruta.write_text("- [ ] x\n", encoding="utf-8")
+
+            # El historial antiguo se migra conservando el orden
+            frecencia.historial_file.write_text(f"{rutas['nuevo']}\n{rutas['viejo']}\n", encoding="utf-8")
+            if frecencia.top_frecencia(2) != [rutas["nuevo"], rutas["viejo"]]:
+                print("   ❌ La migración de historial.txt no conserva el orden")
+                return False
+
+            ahora = time.time()
+            dia = 24 * 3600
+            for _ in range(5):
+                frecencia.registrar_visita(rutas["viejo"], ahora - 10 * dia)
+                frecencia.registrar_visita(rutas["antiguo"], ahora - 60 * dia)
+            frecencia.registrar_visita(rutas["borrado"], ahora - 30 * dia)
+            frecencia.registrar_visita(rutas["nuevo"], ahora)
+
+            esperado = [rutas["viejo"], rutas["nuevo"], rutas["borrado"], rutas["antiguo"]]
+            if frecencia.top_frecencia(4) != esperado:
+                print(f"   ❌ Ranking inesperado: {[r.name for r in frecencia.top_frecencia(4)]}")
+                return False
+            print("   ✅ Visitas frecuentes pesan más que una sola reciente, y decaen")
+
+            rutas["borrado"].unlink()
+            frecencia.compactar()
+            lineas = frecencia.frecencia_file.read_text(encoding="utf-8").splitlines()
+            if frecencia.top_frecencia(4) != [rutas["viejo"], rutas["nuevo"], rutas["antiguo"]] or len(lineas) != 3:
+                print("   ❌ La compactación cambió el ranking o conservó entradas muertas")
+                return False
+            frecencia.olvidar(rutas["viejo"])
+            mezcla = frecencia.ordenar_por_frecencia([base / "otro.md", rutas["antiguo"], rutas["nuevo"]])
+            if mezcla != [rutas["nuevo"], rutas["antiguo"], base / "otro.md"]:
+                print("   ❌ La mezcla con resultados de búsqueda es incorrecta")
+                return False
+            print("   ✅ Compactación, olvido y mezcla con la búsqueda")
+        finally:
+            frecencia.config_dir, frecencia.frecencia_file, frecencia.historial_file = originales
+    return True
+
 def test_file_structure():
     """Verificar que todos los archivos necesarios existen"""
     print("📁 Verificando estructura de archivos...")
@@ -119,6 +1829,20 @@ def test_file_structure():
     required_files = [
         "current.py",
         "choose_and_check.py",
+        "todolist_core.py",
+        "todolist_cache.py",
+        "todolist_watcher.py",
+        "todolist_incremental.py",
+        "todolist_compacto.py",
+        "todolist_escritura.py",
+        "todolist_render.py",
+        "todolist_indice.py",
+        "todolist_frecencia.py",
+        "todolist_agregado.py",
+        "todolist_servidor.py",
+        "todolist_runtime.py",
+        "todolistctl.py",
+        "todolist_lote.py",
         "todolist.md",
         "install.py",
         "uninstall.py",
@@ -169,7 +1893,31 @@ def main():
         ("Estructura de archivos", test_file_structure),
         ("Dependencias del sistema", test_dependencies),
         ("Parsing de árbol", test_tree_parsing),
-        ("Propagación automática", test_auto_completion)
+        ("Propagación automática", test_auto_completion),
+        ("Vigilancia de archivos", test_file_watcher),
+        ("Caché de snapshots", test_snapshot_cache),
+        ("Parser perezoso", test_lazy_parser),
+        ("Reparseo incremental", test_incremental_parser),
+        ("Árbol compacto", test_compact_tree),
+        ("Contadores de pendientes", test_pending_counters),
+        ("IDs estables", test_stable_ids),
+        ("Marcado en el sitio", test_in_place_patch),
+        ("Escrituras concurrentes", test_concurrent_writes),
+        ("Tooltip acotado", test_budgeted_tooltip),
+        ("Render memoizado", test_memo_render),
+        ("Índice de archivos", test_file_index),
+        ("Frecencia de archivos", test_frecency_store),
+        ("Sondeo de checkbox", test_checkbox_sniffing),
+        ("Menú rofi en flujo", test_rofi_streaming),
+        ("Selección por índice en rofi", test_rofi_index_selection),
+        ("Modo script de rofi", test_rofi_script_mode),
+        ("Vista agregada", test_aggregated_view),
+        ("Servidor compartido", test_shared_backend),
+        ("Socket de comandos", test_command_socket),
+        ("Completado por lotes", test_batch_completion),
+        ("Lotes de órdenes", test_batch_mutations),
+        ("Lanzadores precompilados", test_precompiled_launchers),
+        ("Suite de benchmarks", test_benchmark_suite)
     ]
     
     results = []
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Vista agregada de varios archivos de tareas
+===========================================
+
+config.txt (o --archivo en current.py) puede listar varias rutas o globs,
+una por línea: casa.md, proyecto-trabajo.md, ~/notas/*.md... La barra muestra
+entonces un único texto y un tooltip agrupado por archivo.
+
+Cada archivo conserva su propia caché: su snapshot en disco y, en --follow,
+su ArbolIncremental y su RenderizadorMemo, así que un cambio en un archivo
+solo reparsea ese archivo. Los snapshots se cargan en paralelo con un
+ThreadPoolExecutor (la E/S y los stat se solapan; un archivo sin cambios es
+un stat y una lectura de la caché).
+
+Política de orden de los grupos (--orden):
+    config      el orden de config.txt (por defecto)
+    pendientes  más tareas pendientes primero
+    reciente    el modificado más recientemente primero
+El texto de la barra es la primera tarea pendiente del primer grupo que tenga
+alguna, seguida del nombre de su archivo.
+"""
+
+from todolist_cache import obtener_snapshot, texto_primera, tooltip_con_presupuesto
+
+POLITICAS_ORDEN = ("config", "pendientes", "reciente")
+
+HILOS_CARGA = 4
+
+def presupuesto_por_archivo(presupuesto, archivos):
+    """
+    Reparto del presupuesto del tooltip entre `archivos` grupos: cada uno
+    recibe la misma parte, descontando su cabecera y la línea en blanco.
+    Al ser fijo, el tooltip de cada archivo se memoiza en su snapshot.
+    """
+    lineas, bytes_max, profundidad = presupuesto
+    if archivos <= 1:
+        return tuple(presupuesto)
+    return (
+        max(2, lineas // archivos - 2),
+        max(256, bytes_max // archivos - 128),
+        profundidad
+    )
+
+def resumen_archivo(archivo, snapshot, presupuesto, nodos=None):
+    """Lo que la vista agregada necesita de un archivo, a partir de su snapshot"""
+    return {
+        "archivo": archivo,
+        "primera": texto_primera(snapshot),
+        "pendientes": snapshot["pendientes"],
+        "mtime_ns": snapshot["clave"][3],
+        "tooltip": tooltip_con_presupuesto(archivo, snapshot, presupuesto, nodos)
+    }
+
+def resumen_faltante(archivo):
+    """Resumen de un archivo que desapareció entre la expansión y la lectura"""
+    return {"archivo": archivo, "falta": True}
+
+def cargar_resumenes(archivos, presupuesto, hilos=HILOS_CARGA):
+    """Resúmenes de todos los archivos, cargando sus snapshots en paralelo"""
+    parte = presupuesto_por_archivo(presupuesto, len(archivos))
+
+    def cargar(archivo):
+        try:
+            return resumen_archivo(archivo, obtener_snapshot(archivo), parte)
+        except FileNotFoundError:
+            return resumen_faltante(archivo)
+
+    if len(archivos) <= 1:
+        return [cargar(archivo) for archivo in archivos]
+    # Solo con varios archivos: concurrent.futures arrastra logging y threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(hilos, len(archivos))) as pool:
+        return list(pool.map(cargar, archivos))
+
+def ordenar_resumenes(resumenes, orden="config"):
+    """Aplicar la política de orden; los archivos que faltan van al final"""
+    if orden == "pendientes":
+        clave = lambda r: -r.get("pendientes", 0)
+    elif orden == "reciente":
+        clave = lambda r: -r.get("mtime_ns", 0)
+    else:
+        clave = lambda r: 0
+    # sorted es estable: a igualdad se conserva el orden de config.txt
+    return sorted(resumenes, key=lambda r: (r.get("falta", False), clave(r)))
+
+def componer_agregado(resumenes, con_tooltip=True):
+    """
+    Texto de la barra y tooltip agrupado por archivo (ya ordenados).
+    Devuelve (texto o None si no queda nada pendiente, tooltip o None).
+    """
+    texto = None
+    for resumen in resumenes:
+        if resumen.get("primera") is not None:
+            texto = f"{resumen['primera']} · {resumen['archivo'].stem}"
+            break
+    if not con_tooltip:
+        return texto, None
+
+    grupos = []
+    for resumen in resumenes:
+        nombre = resumen["archivo"].name
+        if resumen.get("falta"):
+            grupos.append(f"⚠️ {nombre}: no encontrado")
+        elif resumen["pendientes"]:
+            grupos.append(f"📄 {nombre} ({resumen['pendientes']} pendientes)\n{resumen['tooltip']}")
+        else:
+            grupos.append(f"📄 {nombre} ✅")
+    return texto, "\n\n".join(grupos)
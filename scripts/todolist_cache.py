@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Caché en disco de snapshots parseados
+=====================================
+
+Un snapshot guarda todo lo que necesitan la barra y el menú rofi para un
+markdown concreto. Vive en ~/.local/share/todolist/cache/ con una clave
+(ruta, inode, tamaño, mtime_ns, versión del parser), de modo que un archivo
+sin cambios se resuelve con un solo stat() y sin volver a parsear.
+
+Se reparte en dos archivos con la misma clave:
+
+    <h>.json        registro: texto de la barra, nº de pendientes y tooltips
+    <h>.arbol.json  árbol compacto, IDs estables y líneas del menú
+
+Cada sondeo de la barra solo lee el registro, que ocupa unos KB aunque el
+markdown sea enorme. El árbol y el menú se leen la primera vez que se piden
+(el menú rofi, el marcado por ID). Si faltan o son de otra clave, se
+vuelven a construir desde el markdown.
+
+Los dos archivos se escriben de forma atómica (temporal + rename), el árbol
+antes que el registro. Uno corrupto, de otra versión o de otro estado del
+archivo simplemente se ignora.
+"""
+
+import hashlib
+import json
+import os
+
+from todolist_core import (
+    Nodo, PRESUPUESTO_TOOLTIP, VERSION_PARSER, buscar_primera_tarea_pendiente,
+    calcular_ids, config_dir, generar_tooltip_acotado, listar_tareas_pendientes,
+    parsear_tareas
+)
+
+cache_dir = config_dir / "cache"
+
+# Campos del registro (lo que lee cada sondeo) y del árbol (bajo demanda)
+CAMPOS_REGISTRO = ("clave", "texto", "pendientes", "tooltip", "tooltips")
+CAMPOS_ARBOL = ("nodos", "ids", "menu")
+
+class Snapshot(dict):
+    """
+    Snapshot en memoria. Al cargarlo solo trae los campos del registro; los
+    del árbol se leen de <h>.arbol.json la primera vez que se accede a uno.
+    """
+
+    def __init__(self, archivo, datos):
+        super().__init__(datos)
+        self.archivo = archivo
+
+    def __missing__(self, campo):
+        if campo not in CAMPOS_ARBOL:
+            raise KeyError(campo)
+        arbol = _leer_json(ruta_arbol(self.archivo), self["clave"], CAMPOS_ARBOL)
+        if arbol is not None:
+            self.update({campo: arbol[campo] for campo in CAMPOS_ARBOL})
+        else:
+            # Falta el árbol o es de otro estado del archivo: rehacer el
+            # snapshot entero para no mezclar el registro de una versión con
+            # el árbol de otra. Lanza FileNotFoundError si ya no existe.
+            completo = parsear_snapshot(self.archivo)
+            self.clear()
+            self.update(completo)
+        return self[campo]
+
+def ruta_snapshot(archivo):
+    """Archivo de caché correspondiente a un markdown (uno por ruta)"""
+    nombre = hashlib.sha1(os.fsencode(os.path.abspath(archivo))).hexdigest()[:16]
+    return cache_dir / f"{nombre}.json"
+
+def ruta_arbol(archivo):
+    """Archivo con el árbol y el menú del snapshot de un markdown"""
+    return ruta_snapshot(archivo).with_suffix(".arbol.json")
+
+def clave_firma(archivo, firma):
+    """Clave de snapshot para una firma (inode, tamaño, mtime_ns)"""
+    return [os.path.abspath(archivo), *firma, VERSION_PARSER]
+
+def clave_snapshot(archivo, st):
+    """Clave que debe coincidir para que un snapshot sea válido"""
+    return clave_firma(archivo, (st.st_ino, st.st_size, st.st_mtime_ns))
+
+def construir_snapshot(archivo, st, nodos, render=None, clave=None):
+    """
+    Crear el snapshot a partir de los nodos ya parseados. Con un
+    RenderizadorMemo el tooltip y el menú reutilizan los fragmentos de los
+    subárboles que no cambiaron. `clave` sustituye a la calculada con `st`.
+    """
+    indices = {id(n): i for i, n in enumerate(nodos)}
+    primera = buscar_primera_tarea_pendiente(nodos)
+    menu = render.menu(nodos) if render else listar_tareas_pendientes(nodos)
+    return Snapshot(archivo, {
+        "clave": clave or clave_snapshot(archivo, st),
+        "texto": primera.texto if primera is not None else None,
+        "pendientes": len(menu),
+        "tooltip": render.tooltip_acotado(nodos) if render else generar_tooltip_acotado(nodos),
+        "nodos": [
+            [n.texto, n.nivel, n.checked, n.linea_idx,
+             indices[id(n.padre)] if n.padre is not None else -1]
+            for n in nodos
+        ],
+        "ids": calcular_ids(nodos),
+        "menu": menu
+    })
+
+def nodos_desde_snapshot(snapshot):
+    """Reconstruir la lista de Nodo (con padres e hijos) de un snapshot"""
+    nodos = []
+    for texto, nivel, checked, linea_idx, padre_idx in snapshot["nodos"]:
+        nodo = Nodo(texto, nivel, checked, linea_idx)
+        if padre_idx >= 0:
+            nodo.padre = nodos[padre_idx]
+            nodo.padre.hijos.append(nodo)
+        nodos.append(nodo)
+    return nodos
+
+def texto_primera(snapshot):
+    """Texto de la primera tarea pendiente del snapshot, o None"""
+    return snapshot["texto"]
+
+def ids_menu(snapshot):
+    """IDs de las tareas en el mismo orden que snapshot["menu"]"""
+    # El menú lista las pendientes en preorden, que es el orden del archivo
+    return [
+        id_tarea for id_tarea, (_, _, checked, _, _) in zip(snapshot["ids"], snapshot["nodos"])
+        if not checked
+    ]
+
+def tooltip_con_presupuesto(archivo, snapshot, presupuesto, nodos=None):
+    """
+    Tooltip del snapshot para un presupuesto (líneas, bytes, profundidad).
+    El de por defecto ya viene en snapshot["tooltip"]; los demás se renderizan
+    una vez y se guardan en el propio snapshot (el render es determinista).
+    """
+    presupuesto = tuple(presupuesto)
+    if presupuesto == PRESUPUESTO_TOOLTIP:
+        return snapshot["tooltip"]
+
+    clave = "/".join(str(v) for v in presupuesto)
+    tooltips = snapshot.setdefault("tooltips", {})
+    if clave not in tooltips:
+        if nodos is None:
+            nodos = nodos_desde_snapshot(snapshot)
+        tooltips[clave] = generar_tooltip_acotado(nodos, *presupuesto)
+        guardar_snapshot(archivo, snapshot)
+    return tooltips[clave]
+
+def _leer_json(ruta, clave, campos):
+    """Contenido de `ruta` si tiene la clave y los campos pedidos, o None"""
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        if datos.get("clave") != clave:
+            return None
+        # Comprobación mínima de forma: un archivo truncado o ajeno se ignora
+        if not all(k in datos for k in campos):
+            return None
+        return datos
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def cargar_snapshot(archivo, st=None):
+    """Devolver el snapshot guardado (solo el registro) si sigue siendo válido, o None"""
+    try:
+        if st is None:
+            st = os.stat(archivo)
+        clave = clave_snapshot(archivo, st)
+    except OSError:
+        return None
+    datos = _leer_json(ruta_snapshot(archivo), clave, ("texto", "pendientes", "tooltip"))
+    if datos is None:
+        return None
+    return Snapshot(archivo, datos)
+
+def _escribir_json(destino, datos):
+    """Escribir `datos` en `destino` con temporal + rename"""
+    # tempfile arrastra shutil y random: solo lo paga quien escribe
+    import tempfile
+
+    fd, temporal = tempfile.mkstemp(dir=cache_dir, prefix=".snapshot-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporal, destino)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+def guardar_snapshot(archivo, snapshot):
+    """
+    Escribir el snapshot de forma atómica; los errores no son fatales. El
+    árbol solo se reescribe si está en memoria (un snapshot cargado al que
+    se le añadió un tooltip solo rehace el registro).
+    """
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        if all(campo in snapshot for campo in CAMPOS_ARBOL):
+            arbol = {campo: snapshot[campo] for campo in ("clave", *CAMPOS_ARBOL)}
+            _escribir_json(ruta_arbol(archivo), arbol)
+        registro = {campo: snapshot[campo] for campo in CAMPOS_REGISTRO if campo in snapshot}
+        _escribir_json(ruta_snapshot(archivo), registro)
+    except OSError:
+        pass
+
+def guardar_desde_nodos(archivo, nodos, firma):
+    """
+    Refrescar el snapshot tras escribir el archivo con los nodos en memoria.
+    `firma` es la del archivo recién escrito (DocumentoTareas.firma), no un
+    stat nuevo: hay que llamarla con el bloqueo de escritura aún tomado.
+    """
+    snapshot = construir_snapshot(archivo, None, nodos, clave=clave_firma(archivo, firma))
+    guardar_snapshot(archivo, snapshot)
+    return snapshot
+
+def obtener_snapshot(archivo):
+    """
+    Snapshot actual de un markdown: desde la caché si el archivo no cambió,
+    parseando y guardando en caso contrario.
+    Lanza FileNotFoundError si el archivo no existe.
+    """
+    st = os.stat(archivo)
+    snapshot = cargar_snapshot(archivo, st)
+    if snapshot is not None:
+        return snapshot
+    return parsear_snapshot(archivo)
+
+def parsear_snapshot(archivo):
+    """
+    Parsear el markdown, construir su snapshot completo y guardarlo.
+    Lanza FileNotFoundError si el archivo no existe.
+    """
+    with open(archivo, "r", encoding="utf-8") as f:
+        # La clave se toma del archivo abierto: si cambia durante la lectura,
+        # el siguiente stat() no coincidirá y se volverá a parsear
+        st = os.fstat(f.fileno())
+        lineas = f.readlines()
+
+    snapshot = construir_snapshot(archivo, st, parsear_tareas(lineas))
+    guardar_snapshot(archivo, snapshot)
+    return snapshot
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Árbol de tareas compacto (columnar)
+===================================
+
+Representación alternativa a la lista de Nodo, solo para medir: la usa
+`bench.py memoria` y no la importa ningún programa instalado. En lugar de un
+objeto por checkbox (con su lista de hijos, su referencia al padre y una
+copia del texto) guarda columnas paralelas en `array`: nivel, marcado,
+línea, padre, primer hijo y siguiente hermano, y el texto como
+desplazamientos (inicio, fin) dentro del buffer original.
+
+Con 200k tareas ocupa unos 54 bytes por nodo frente a 276, pero parsea algo
+más despacio y no admite reenlazar solo la región editada. Los procesos
+residentes (--follow y el servidor) conservan ArbolIncremental: con él una
+edición cuesta milisegundos, mientras que con las columnas habría que
+reparsear el archivo entero (~0.8 s con 200k tareas) y perder la caché de
+render por subárbol.
+
+Las vistas NodoCompacto exponen la misma interfaz que Nodo (texto, nivel,
+checked, linea_idx, padre, hijos), así que buscar_primera_tarea_pendiente,
+generar_tooltip, listar_tareas_pendientes y marcar_tarea funcionan sin cambios
+sobre ArbolCompacto.nodos().
+"""
+
+import re
+from array import array
+
+# Mismo patrón que PATRON_TAREA pero sobre el buffer completo: los espacios
+# no pueden cruzar saltos de línea ("- [ ]" seguido directamente del salto
+# también cuenta, como en el parser por líneas) y el grupo del texto ya sale
+# sin espacios en los extremos (equivale al texto.strip() de parsear_tareas)
+PATRON_TAREA_BUFFER = re.compile(
+    r"^([^\S\n]*)[-*][^\S\n]+\[( |x)\](?:[^\S\n]+|(?=\n))(.*?)[^\S\n]*$", re.M
+)
+
+SIN_NODO = -1
+
+class NodoCompacto:
+    """Vista de un nodo de ArbolCompacto con la interfaz de Nodo"""
+    __slots__ = ("arbol", "indice")
+
+    def __init__(self, arbol, indice):
+        self.arbol = arbol
+        self.indice = indice
+
+    def __eq__(self, otro):
+        return (isinstance(otro, NodoCompacto) and otro.arbol is self.arbol
+                and otro.indice == self.indice)
+
+    def __hash__(self):
+        return hash((id(self.arbol), self.indice))
+
+    @property
+    def texto(self):
+        return self.arbol.texto(self.indice)
+
+    @property
+    def nivel(self):
+        return self.arbol.nivel[self.indice]
+
+    @property
+    def checked(self):
+        return bool(self.arbol.checked[self.indice])
+
+    @checked.setter
+    def checked(self, valor):
+        self.arbol.checked[self.indice] = 1 if valor else 0
+
+    @property
+    def linea_idx(self):
+        return self.arbol.linea[self.indice]
+
+    @property
+    def padre(self):
+        padre = self.arbol.padre[self.indice]
+        return None if padre == SIN_NODO else NodoCompacto(self.arbol, padre)
+
+    @property
+    def hijos(self):
+        return [NodoCompacto(self.arbol, i) for i in self.arbol.hijos(self.indice)]
+
+class ArbolCompacto:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.nivel = array("H")
+        self.checked = array("B")
+        self.linea = array("L")
+        self.padre = array("l")
+        self.primer_hijo = array("l")
+        self.siguiente_hermano = array("l")
+        self.texto_inicio = array("L")
+        self.texto_fin = array("L")
+        self._parsear()
+
+    def _parsear(self):
+        buffer = self.buffer
+        nivel_col, checked_col, linea_col = self.nivel, self.checked, self.linea
+        padre_col, primer_hijo, siguiente = self.padre, self.primer_hijo, self.siguiente_hermano
+        inicio_col, fin_col = self.texto_inicio, self.texto_fin
+        ultimo_hijo = array("l")
+        stack = []
+        linea = 0
+        pos = 0
+        i = 0
+
+        for m in PATRON_TAREA_BUFFER.finditer(buffer):
+            inicio = m.start()
+            linea += buffer.count("\n", pos, inicio)
+            pos = inicio
+
+            indent = m.group(1)
+            # Calcular nivel basado en espacios o tabs (misma regla que parsear_tareas)
+            if '\t' in indent:
+                nivel = len(indent)
+            else:
+                nivel = len(indent) // 4
+
+            nivel_col.append(nivel)
+            checked_col.append(m.group(2) == "x")
+            linea_col.append(linea)
+            texto_inicio, texto_fin = m.span(3)
+            inicio_col.append(texto_inicio)
+            fin_col.append(texto_fin)
+            primer_hijo.append(SIN_NODO)
+            siguiente.append(SIN_NODO)
+            ultimo_hijo.append(SIN_NODO)
+
+            while stack and nivel_col[stack[-1]] >= nivel:
+                stack.pop()
+
+            if stack:
+                padre = stack[-1]
+                padre_col.append(padre)
+                if ultimo_hijo[padre] == SIN_NODO:
+                    primer_hijo[padre] = i
+                else:
+                    siguiente[ultimo_hijo[padre]] = i
+                ultimo_hijo[padre] = i
+            else:
+                padre_col.append(SIN_NODO)
+
+            stack.append(i)
+            i += 1
+
+    def __len__(self):
+        return len(self.nivel)
+
+    def texto(self, i):
+        return self.buffer[self.texto_inicio[i]:self.texto_fin[i]]
+
+    def hijos(self, i):
+        """Índices de los hijos de i, en orden"""
+        hijo = self.primer_hijo[i]
+        while hijo != SIN_NODO:
+            yield hijo
+            hijo = self.siguiente_hermano[hijo]
+
+    def raices(self):
+        """Índices de las tareas sin padre, en orden"""
+        return (i for i in range(len(self.nivel)) if self.padre[i] == SIN_NODO)
+
+    def nodo(self, i):
+        return NodoCompacto(self, i)
+
+    def nodos(self):
+        """Vistas de todos los nodos, en el orden del archivo"""
+        return [NodoCompacto(self, i) for i in range(len(self.nivel))]
+
+    def primera_pendiente(self):
+        """
+        Índice de la primera tarea trabajable (misma regla que
+        buscar_primera_tarea_pendiente) recorriendo solo las columnas.
+        """
+        checked = self.checked
+        primer_hijo = self.primer_hijo
+        siguiente = self.siguiente_hermano
+
+        def buscar(i):
+            hijo = primer_hijo[i]
+            while hijo != SIN_NODO:
+                resultado = buscar(hijo)
+                if resultado is not None:
+                    return resultado
+                hijo = siguiente[hijo]
+            # Sin hijos trabajables: el propio nodo si está pendiente
+            return None if checked[i] else i
+
+        for raiz in self.raices():
+            resultado = buscar(raiz)
+            if resultado is not None:
+                return resultado
+        return None
@@ -0,0 +1,688 @@
+#!/usr/bin/env python3
+"""
+Núcleo compartido del todolist-tree
+===================================
+
+Configuración del archivo activo, parser de tareas markdown y las funciones
+de recorrido que usan tanto current.py (waybar) como choose_and_check.py (rofi).
+"""
+
+import glob
+import hashlib
+import heapq
+import os
+import re
+import sys
+from pathlib import Path
+
+# Sistema de configuración para archivo markdown dinámico
+config_dir = Path.home() / ".local" / "share" / "todolist"
+config_file = config_dir / "config.txt"
+# historial.txt solo se lee para migrarlo al almacén de frecencia
+historial_file = config_dir / "historial.txt"
+frecencia_file = config_dir / "frecencia.log"
+default_archivo = Path.home() / ".local" / "share" / "todolist" / "todolist.md"
+
+# Cambiar al modificar el parser o el formato de tooltip/menú
+# (invalida los snapshots guardados en disco)
+VERSION_PARSER = 3
+
+# Presupuesto por defecto del tooltip: (líneas, bytes, profundidad máxima).
+# Waybar maqueta el tooltip entero con Pango; acotarlo evita bloquear la barra
+PRESUPUESTO_TOOLTIP = (40, 4096, 5)
+# Caracteres máximos del texto de una tarea dentro del tooltip
+TOOLTIP_MAX_TEXTO = 100
+
+def leer_config():
+    """Líneas de config.txt: rutas o globs de archivos markdown, una por línea"""
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            lineas = [linea.strip() for linea in f]
+    except (OSError, UnicodeDecodeError):
+        return []
+    return [linea for linea in lineas if linea and not linea.startswith("#")]
+
+def expandir_patrones(patrones):
+    """
+    Archivos existentes para una lista de rutas o globs (con ~), en el orden
+    de los patrones, sin repetir; las coincidencias de un glob van ordenadas
+    """
+    archivos = []
+    vistos = set()
+    for patron in patrones:
+        patron = os.path.expanduser(patron)
+        if any(c in patron for c in "*?["):
+            candidatos = sorted(glob.glob(patron, recursive=True))
+        else:
+            candidatos = [patron]
+        for candidato in candidatos:
+            if os.path.isfile(candidato) and candidato not in vistos:
+                vistos.add(candidato)
+                archivos.append(Path(candidato))
+    return archivos
+
+def get_current_files(patrones=None):
+    """
+    Archivos markdown activos: los de config.txt (o los `patrones` dados);
+    el de por defecto si no existe ninguno
+    """
+    archivos = expandir_patrones(leer_config() if patrones is None else patrones)
+    return archivos or [default_archivo]
+
+def get_current_file():
+    """Obtener el archivo markdown actual (el primero de la configuración)"""
+    return get_current_files()[0]
+
+class ConfiguracionMultiple(Exception):
+    """config.txt tiene varias rutas o un glob: cambiar a un archivo las borraría"""
+
+def set_current_file(nuevo_archivo):
+    """
+    Establecer un nuevo archivo markdown como actual (escritura atómica).
+    Lanza ConfiguracionMultiple si config.txt lista varias rutas o algún glob:
+    esa configuración se edita a mano, no se sustituye por una sola ruta.
+    """
+    from todolist_escritura import escribir_atomico
+
+    entradas = leer_config()
+    if len(entradas) > 1 or any(c in entrada for entrada in entradas for c in "*?["):
+        raise ConfiguracionMultiple(
+            f"config.txt tiene varias rutas o globs ({len(entradas)} entradas); "
+            "edítalo a mano para cambiar de archivo"
+        )
+    config_dir.mkdir(parents=True, exist_ok=True)
+    escribir_atomico(config_file, f"{nuevo_archivo}\n".encode("utf-8"))
+
+def comando_propio(*argumentos, script=None):
+    """
+    Comando para volver a ejecutar el programa en curso (o `script`) con otros
+    argumentos. sys.argv[0] es el lanzador de ~/.local/bin si se instaló con
+    install.py (así el proceso nuevo también usa los .pyc precompilados) y las
+    opciones -I/-S del intérprete se conservan.
+    """
+    opciones = "".join(
+        letra for letra, activa in (("I", sys.flags.isolated), ("S", sys.flags.no_site)) if activa
+    )
+    interprete = [sys.executable, f"-{opciones}"] if opciones else [sys.executable]
+    return [*interprete, os.path.abspath(script or sys.argv[0]), *argumentos]
+
+class Nodo:
+    # Sin __dict__ por nodo: importa en procesos largos con archivos grandes
+    __slots__ = ("texto", "nivel", "checked", "linea_idx", "hijos", "padre")
+
+    def __init__(self, texto, nivel, checked, linea_idx):
+        self.texto = texto
+        self.nivel = nivel
+        self.checked = checked
+        self.linea_idx = linea_idx
+        self.hijos = []
+        self.padre = None
+
+# Checkbox con niveles según indentación (espacios o tabs)
+PATRON_TAREA = re.compile(r"^(\s*)[-*]\s+\[( |x)\]\s+(.*)")
+
+def iterar_tareas(lineas):
+    """
+    Generar los nodos de tareas en orden de aparición, ya enlazados con su
+    padre. Acepta cualquier iterable de líneas (también un archivo abierto),
+    así que quien consume puede dejar de leer en cuanto tenga lo que necesita.
+    """
+    stack = []
+
+    for idx, linea in enumerate(lineas):
+        m = PATRON_TAREA.match(linea)
+        if not m:
+            continue
+
+        indent, check, texto = m.groups()
+        # Calcular nivel basado en espacios o tabs
+        if '\t' in indent:
+            nivel = len(indent)  # 1 tab = 1 nivel
+        else:
+            nivel = len(indent) // 4  # 4 espacios = 1 nivel
+
+        nodo = Nodo(texto.strip(), nivel, check == "x", idx)
+
+        # Insertar en el árbol
+        while stack and stack[-1].nivel >= nivel:
+            stack.pop()
+
+        if stack:
+            nodo.padre = stack[-1]
+            stack[-1].hijos.append(nodo)
+
+        stack.append(nodo)
+        yield nodo
+
+def parsear_tareas(lineas):
+    return list(iterar_tareas(lineas))
+
+def iterar_subarboles(lineas):
+    """
+    Generar cada tarea raíz cuando su subárbol está completo, es decir,
+    al aparecer la siguiente raíz o al acabarse las líneas.
+    """
+    raiz = None
+    for nodo in iterar_tareas(lineas):
+        if nodo.padre is None:
+            if raiz is not None:
+                yield raiz
+            raiz = nodo
+    if raiz is not None:
+        yield raiz
+
+def buscar_en_subtareas(nodo):
+    """Buscar primera tarea pendiente en este nodo y sus hijos (DFS)"""
+    if not nodo.checked:
+        # Si este nodo no está completado
+        if not nodo.hijos:
+            # Es una hoja, es trabajable
+            return nodo
+        else:
+            # Tiene hijos, buscar en sus hijos primero
+            for hijo in nodo.hijos:
+                resultado = buscar_en_subtareas(hijo)
+                if resultado:
+                    return resultado
+            
+            # Si todos los hijos están completos pero este nodo no,
+            # este nodo debe completarse automáticamente o ser trabajable
+            return nodo
+    else:
+        # El nodo está marcado como completado
+        # Pero verificar si tiene hijos sin completar (caso de inconsistencia)
+        if nodo.hijos:
+            for hijo in nodo.hijos:
+                resultado = buscar_en_subtareas(hijo)
+                if resultado:
+                    return resultado
+    
+    return None
+
+def buscar_primera_tarea_pendiente(nodos):
+    """
+    Buscar la primera tarea pendiente siguiendo orden secuencial:
+    1. Procesar tareas de nivel 0 en orden
+    2. Para cada tarea de nivel 0:
+       - Si no tiene hijos y no está completada: es la primera
+       - Si tiene hijos: buscar primera subtarea no completada (DFS)
+       - Si todos los hijos están completados pero ella no: es la tarea
+    3. Continuar con siguiente tarea de nivel 0
+    """
+    # Buscar en tareas principales (nivel 0) en orden secuencial
+    for nodo in nodos:
+        if nodo.padre is None:  # tarea principal (nivel 0)
+            resultado = buscar_en_subtareas(nodo)
+            if resultado:
+                return resultado
+                
+    return None
+
+def buscar_primera_tarea_pendiente_lazy(lineas):
+    """
+    Igual que buscar_primera_tarea_pendiente, pero parseando bajo demanda:
+    deja de leer en cuanto se cierra el primer subárbol raíz con una tarea
+    trabajable, así que el coste depende de dónde está esa tarea y no del
+    tamaño del archivo.
+    """
+    for raiz in iterar_subarboles(lineas):
+        resultado = buscar_en_subtareas(raiz)
+        if resultado:
+            return resultado
+    return None
+
+def calcular_ids(nodos):
+    """
+    IDs estables de las tareas, en el orden de `nodos`.
+
+    El ID es un hash de la ruta de textos desde la raíz, el texto de la tarea
+    y el número de aparición de esa misma ruta (dos "Escribir tests" bajo el
+    mismo padre son 0 y 1). No depende del estado ni del número de línea, así
+    que sobrevive a marcar tareas y a editar otras partes del archivo.
+    """
+    rutas = {}
+    apariciones = {}
+    ids = []
+    for nodo in nodos:
+        padre = rutas[nodo.padre] if nodo.padre is not None else b""
+        ruta = hashlib.sha1(padre + b"\x1f" + nodo.texto.encode("utf-8")).digest()
+        rutas[nodo] = ruta
+        aparicion = apariciones.get(ruta, 0)
+        apariciones[ruta] = aparicion + 1
+        ids.append(hashlib.sha1(ruta + str(aparicion).encode()).hexdigest()[:12])
+    return ids
+
+def indexar_ids(nodos):
+    """Diccionario ID -> nodo para marcar en O(1)"""
+    return dict(zip(calcular_ids(nodos), nodos))
+
+def marcar_nodo(lineas, nodo_obj, indice=None):
+    """
+    Marcar un nodo y sus padres si corresponde.
+    Con un IndicePendientes la propagación cuesta O(profundidad).
+    Devuelve los nodos que pasaron de pendiente a hecho.
+    """
+    if indice is not None:
+        return indice.marcar(lineas, nodo_obj)
+
+    marcados = []
+
+    # Marcar nodo como hecho (en el archivo)
+    linea = lineas[nodo_obj.linea_idx]
+    nueva_linea = re.sub(r"\[ \]", "[x]", linea, count=1)
+    lineas[nodo_obj.linea_idx] = nueva_linea
+
+    # Actualizar estado en memoria
+    if not nodo_obj.checked:
+        marcados.append(nodo_obj)
+    nodo_obj.checked = True
+
+    # Subir recursivamente y marcar padres si todos sus hijos están marcados
+    padre = nodo_obj.padre
+    while padre:
+        if all(h.checked for h in padre.hijos):
+            # Marcar padre en archivo y memoria
+            linea_padre = lineas[padre.linea_idx]
+            nueva_linea_padre = re.sub(r"\[ \]", "[x]", linea_padre, count=1)
+            lineas[padre.linea_idx] = nueva_linea_padre
+            if not padre.checked:
+                marcados.append(padre)
+            padre.checked = True
+            padre = padre.padre
+        else:
+            break
+
+    return marcados
+
+def marcar_nodos(lineas, nodos_obj):
+    """
+    Marcar varios nodos con una sola pasada de propagación: primero los
+    pedidos y después, de abajo arriba, cada padre afectado una sola vez (un
+    padre con varios hijos elegidos no se revisa una vez por hijo).
+    Devuelve los nodos que pasaron de pendiente a hecho.
+    """
+    marcados = []
+    padres = set()
+    for nodo in nodos_obj:
+        if not nodo.checked:
+            lineas[nodo.linea_idx] = re.sub(r"\[ \]", "[x]", lineas[nodo.linea_idx], count=1)
+            nodo.checked = True
+            marcados.append(nodo)
+        if nodo.padre is not None:
+            padres.add(nodo.padre)
+
+    # Más nivel primero: un padre se revisa cuando sus hijos ya están resueltos
+    cola = [(-p.nivel, p.linea_idx, p) for p in padres]
+    heapq.heapify(cola)
+    while cola:
+        _, _, padre = heapq.heappop(cola)
+        if not all(h.checked for h in padre.hijos):
+            continue
+        if not padre.checked:
+            lineas[padre.linea_idx] = re.sub(r"\[ \]", "[x]", lineas[padre.linea_idx], count=1)
+            padre.checked = True
+            marcados.append(padre)
+        abuelo = padre.padre
+        if abuelo is not None and abuelo not in padres:
+            padres.add(abuelo)
+            heapq.heappush(cola, (-abuelo.nivel, abuelo.linea_idx, abuelo))
+    return marcados
+
+def desmarcar_nodo(lineas, nodo_obj, indice=None):
+    """
+    Desmarcar un nodo y sus padres marcados (un padre no puede estar hecho
+    con un hijo pendiente). Devuelve los nodos que pasaron de hecho a pendiente.
+    """
+    if indice is not None:
+        return indice.desmarcar(lineas, nodo_obj)
+
+    desmarcados = []
+    actual = nodo_obj
+    while actual is not None:
+        if actual.checked:
+            lineas[actual.linea_idx] = re.sub(r"\[x\]", "[ ]", lineas[actual.linea_idx], count=1)
+            actual.checked = False
+            desmarcados.append(actual)
+        actual = actual.padre
+    return desmarcados
+
+def buscar_por_texto(nodos, texto_seleccionado):
+    """Primera tarea con ese texto exacto, o None"""
+    for n in nodos:
+        if n.texto == texto_seleccionado:
+            return n
+    return None
+
+def marcar_tarea(lineas, nodos, texto_seleccionado, indice=None):
+    """Marcar la primera tarea con ese texto exacto y sus padres si corresponde"""
+    nodo_obj = buscar_por_texto(nodos, texto_seleccionado)
+    if not nodo_obj:
+        return False
+
+    marcar_nodo(lineas, nodo_obj, indice)
+    return True
+
+def marcar_tarea_por_id(lineas, ids, id_tarea, indice=None):
+    """Marcar la tarea con ese ID (ids = indexar_ids(nodos)); exacto y O(1)"""
+    nodo_obj = ids.get(id_tarea)
+    if nodo_obj is None:
+        return False
+
+    marcar_nodo(lineas, nodo_obj, indice)
+    return True
+
+# Marca de "primera pendiente sin calcular" en la caché de IndicePendientes
+_SIN_CALCULAR = object()
+
+class IndicePendientes:
+    """
+    Contadores de pendientes por subárbol para un árbol que vive en memoria.
+
+    Cada nodo guarda cuántos hijos directos y cuántos descendientes siguen
+    sin marcar, más la primera tarea trabajable de su subárbol (caché). Marcar
+    o desmarcar actualiza los contadores subiendo por los ancestros, y la
+    propagación al padre es una comparación con cero en lugar de recorrer
+    todos sus hijos: O(profundidad) por operación.
+
+    La primera pendiente se recalcula perezosamente solo en los nodos
+    invalidados. Cada nodo recuerda desde qué hijo buscar: al marcar tareas
+    los hijos anteriores siguen sin pendientes, así que ese puntero solo
+    avanza y el coste amortizado también es O(profundidad).
+
+    Los contadores se indexan por nodo, así que funciona con Nodo y con
+    las vistas de ArbolCompacto.
+    """
+
+    def __init__(self, nodos):
+        self._construir(nodos)
+
+    def _construir(self, nodos):
+        self.raices = [n for n in nodos if n.padre is None]
+        self.pendientes_hijos = {}
+        self.pendientes_desc = {}
+        self._primera = {}
+        self._desde = {}
+        self._primera_global = _SIN_CALCULAR
+        self._desde_global = 0
+
+        # Los hijos aparecen después que su padre: recorrer al revés es bottom-up
+        for nodo in reversed(nodos):
+            self._contar(nodo)
+
+    def _contar(self, nodo):
+        hijos_pendientes = 0
+        desc_pendientes = 0
+        for hijo in nodo.hijos:
+            desc_pendientes += self.pendientes_desc[hijo]
+            if not hijo.checked:
+                hijos_pendientes += 1
+                desc_pendientes += 1
+        self.pendientes_hijos[nodo] = hijos_pendientes
+        self.pendientes_desc[nodo] = desc_pendientes
+
+    def recalcular(self, nodos, afectados, raices_cambiadas=True):
+        """
+        Rehacer contadores y cachés de los nodos que devolvió
+        ArbolIncremental.actualizar (la zona reenlazada y sus ancestros).
+        Borrar una tarea raíz no deja ningún afectado: `raices_cambiadas`
+        (ArbolIncremental.raices_cambiadas) indica si hay que rehacer la lista
+        de raíces; sin ese dato se rehace siempre.
+        """
+        # Los nodos eliminados por ediciones no se quitan uno a uno (como en
+        # RenderizadorMemo._podar): si las entradas superan con holgura al
+        # árbol actual, reconstruir el índice en O(n) y soltar los muertos
+        if len(self.pendientes_desc) > 2 * len(nodos) + 1024:
+            self._construir(nodos)
+            return
+
+        # Un hijo siempre tiene más nivel que su padre: ordenar por nivel
+        # descendente garantiza bottom-up aunque haya varias zonas
+        for nodo in sorted(set(afectados), key=lambda n: -n.nivel):
+            self._contar(nodo)
+            self._primera.pop(nodo, None)
+            self._desde.pop(nodo, None)
+
+        if raices_cambiadas:
+            self.raices = [n for n in nodos if n.padre is None]
+        self._primera_global = _SIN_CALCULAR
+        self._desde_global = 0
+
+    def _tiene_pendientes(self, nodo):
+        return not nodo.checked or self.pendientes_desc[nodo] > 0
+
+    def _fijar(self, nodo, checked):
+        """Cambiar el estado de un nodo manteniendo contadores y cachés"""
+        if nodo.checked == checked:
+            return False
+        nodo.checked = checked
+        delta = -1 if checked else 1
+
+        self._primera.pop(nodo, None)
+        if not checked:
+            self._desde.pop(nodo, None)
+
+        padre = nodo.padre
+        if padre is not None:
+            self.pendientes_hijos[padre] += delta
+        while padre is not None:
+            self.pendientes_desc[padre] += delta
+            self._primera.pop(padre, None)
+            if not checked:
+                # Puede aparecer una pendiente en un hijo anterior
+                self._desde.pop(padre, None)
+            padre = padre.padre
+
+        self._primera_global = _SIN_CALCULAR
+        if not checked:
+            self._desde_global = 0
+        return True
+
+    def marcar(self, lineas, nodo):
+        """
+        Marcar un nodo (en memoria y en `lineas` si se pasan) y propagar a los
+        padres cuyos hijos quedan todos marcados. Devuelve los nodos marcados.
+        """
+        marcados = []
+        if self._fijar(nodo, True):
+            marcados.append(nodo)
+
+        padre = nodo.padre
+        while padre is not None and self.pendientes_hijos[padre] == 0:
+            if self._fijar(padre, True):
+                marcados.append(padre)
+            padre = padre.padre
+
+        if lineas is not None:
+            for marcado in marcados:
+                lineas[marcado.linea_idx] = re.sub(
+                    r"\[ \]", "[x]", lineas[marcado.linea_idx], count=1
+                )
+        return marcados
+
+    def desmarcar(self, lineas, nodo):
+        """
+        Desmarcar un nodo y los ancestros marcados (un padre no puede estar
+        hecho con un hijo pendiente). Devuelve los nodos desmarcados.
+        """
+        desmarcados = []
+        actual = nodo
+        while actual is not None:
+            if self._fijar(actual, False):
+                desmarcados.append(actual)
+            actual = actual.padre
+
+        if lineas is not None:
+            for desmarcado in desmarcados:
+                lineas[desmarcado.linea_idx] = re.sub(
+                    r"\[x\]", "[ ]", lineas[desmarcado.linea_idx], count=1
+                )
+        return desmarcados
+
+    def primera_en(self, nodo):
+        """Primera tarea trabajable del subárbol (misma regla que buscar_en_subtareas)"""
+        resultado = self._primera.get(nodo, _SIN_CALCULAR)
+        if resultado is not _SIN_CALCULAR:
+            return resultado
+
+        resultado = None
+        if self._tiene_pendientes(nodo):
+            hijos = nodo.hijos
+            i = self._desde.get(nodo, 0)
+            while i < len(hijos):
+                hijo = hijos[i]
+                if self._tiene_pendientes(hijo):
+                    resultado = self.primera_en(hijo)
+                    if resultado is not None:
+                        break
+                i += 1
+            self._desde[nodo] = i
+            if resultado is None and not nodo.checked:
+                resultado = nodo
+
+        self._primera[nodo] = resultado
+        return resultado
+
+    def primera(self):
+        """Primera tarea trabajable de todo el árbol (buscar_primera_tarea_pendiente)"""
+        if self._primera_global is not _SIN_CALCULAR:
+            return self._primera_global
+
+        resultado = None
+        i = self._desde_global
+        while i < len(self.raices):
+            raiz = self.raices[i]
+            if self._tiene_pendientes(raiz):
+                resultado = self.primera_en(raiz)
+                if resultado is not None:
+                    break
+            i += 1
+        self._desde_global = i
+        self._primera_global = resultado
+        return resultado
+
+def generar_tooltip(nodos):
+    """Generar tooltip con todas las tareas pendientes mostrando jerarquía visualmente"""
+    pendientes = []
+    
+    def agregar_pendientes(nodo, nivel=0):
+        if not nodo.checked:
+            # Agregar espacios según el nivel de anidación (4 espacios por nivel)
+            espacios = "    " * nivel
+            pendientes.append(f"{espacios}[ ] {nodo.texto}")
+        
+        for hijo in nodo.hijos:
+            agregar_pendientes(hijo, nivel + 1)
+    
+    for nodo in nodos:
+        if nodo.padre is None:  # raíz
+            agregar_pendientes(nodo, 0)
+    
+    return "\n".join(pendientes) if pendientes else "✅ Todas las tareas completadas"
+
+def _recortar(texto, maximo=TOOLTIP_MAX_TEXTO):
+    return texto if len(texto) <= maximo else texto[:maximo - 1] + "…"
+
+def _linea_resumen(cantidad, nivel, donde):
+    """Línea que sustituye a un trozo del árbol que no cabe en el tooltip"""
+    espacios = "    " * nivel
+    if donde is None:
+        return f"{espacios}… {cantidad} más"
+    return f"{espacios}… {cantidad} más en {_recortar(donde)}"
+
+def generar_tooltip_acotado(nodos, max_lineas=PRESUPUESTO_TOOLTIP[0],
+                            max_bytes=PRESUPUESTO_TOOLTIP[1],
+                            max_profundidad=PRESUPUESTO_TOOLTIP[2], raices=None, desc=None):
+    """
+    Tooltip con el mismo formato que generar_tooltip pero con un presupuesto
+    de líneas y bytes (UTF-8) y una profundidad máxima. Lo que no cabe se
+    resume en líneas "… N más en Padre": las tareas por debajo de la
+    profundidad máxima y, al agotarse el presupuesto, el resto del nivel.
+
+    Cada nivel abierto reserva sitio para su propia línea de resumen, así que
+    el resultado nunca pasa del presupuesto (siempre que quepa al menos un
+    resumen por nivel). Es determinista: mismo árbol y presupuesto, mismo texto.
+
+    `raices` y `desc` (nodo -> pendientes por debajo) permiten reutilizar
+    contadores ya calculados; si no se pasan se calculan en O(n).
+    """
+    if desc is None:
+        desc = IndicePendientes(nodos).pendientes_desc
+    if raices is None:
+        raices = [n for n in nodos if n.padre is None]
+    salida = []
+    usados = {"lineas": 0, "bytes": 0}
+
+    def pendientes(nodo):
+        return desc[nodo] + (0 if nodo.checked else 1)
+
+    def tam(linea):
+        # +1 byte por el salto de línea que la une a la anterior
+        return len(linea.encode("utf-8")) + 1
+
+    def hay_sitio(lineas, bytes_):
+        return (usados["lineas"] + lineas <= max_lineas
+                and usados["bytes"] + bytes_ <= max_bytes)
+
+    def agregar(linea):
+        salida.append(linea)
+        usados["lineas"] += 1
+        usados["bytes"] += tam(linea)
+
+    def recorrer(hijos, nivel, donde, reserva_lineas, reserva_bytes):
+        # reserva_*: resúmenes ya reservados por los niveles exteriores; se
+        # suma el de este nivel (cota con un número grande)
+        propia_lineas = reserva_lineas + 1
+        propia_bytes = reserva_bytes + tam(_linea_resumen(9999999, nivel, donde))
+
+        for i, hijo in enumerate(hijos):
+            if not pendientes(hijo):
+                continue
+
+            # Sitio para la línea del hijo y, si tiene pendientes debajo,
+            # para el resumen del nivel que abre
+            extra_lineas, extra_bytes = 0, 0
+            if not hijo.checked:
+                linea = f"{'    ' * nivel}[ ] {_recortar(hijo.texto)}"
+                extra_lineas += 1
+                extra_bytes += tam(linea)
+            if desc[hijo]:
+                extra_lineas += 1
+                extra_bytes += tam(_linea_resumen(9999999, nivel + 1, hijo.texto))
+
+            if not hay_sitio(propia_lineas + extra_lineas, propia_bytes + extra_bytes):
+                restantes = sum(pendientes(h) for h in hijos[i:])
+                agregar(_linea_resumen(restantes, nivel, donde))
+                return
+
+            if not hijo.checked:
+                agregar(linea)
+            if desc[hijo]:
+                if nivel < max_profundidad:
+                    recorrer(hijo.hijos, nivel + 1, hijo.texto, propia_lineas, propia_bytes)
+                else:
+                    # Por debajo de la profundidad máxima: una línea de resumen
+                    agregar(_linea_resumen(desc[hijo], nivel + 1, hijo.texto))
+
+    recorrer(raices, 0, None, 0, 0)
+    return "\n".join(salida) if salida else "✅ Todas las tareas completadas"
+
+def listar_tareas_pendientes(nodos):
+    """Obtener lista de todas las tareas pendientes con formato jerárquico usando tabs por nivel"""
+    tareas = []
+
+    def agregar_tareas(nodo):
+        if not nodo.checked:
+            # Indentación por nivel usando tabs, similar al tooltip (1 tab por nivel)
+            indent = "  " * nodo.nivel
+            indicador = ""
+            tareas.append(f"{indent}{indicador} {nodo.texto}")
+
+        # Agregar hijos (aunque el padre esté marcado, los hijos pueden estar desmarcados)
+        for hijo in nodo.hijos:
+            agregar_tareas(hijo)
+
+    for nodo in nodos:
+        if nodo.padre is None:  # raíz
+            agregar_tareas(nodo)
+
+    return tareas
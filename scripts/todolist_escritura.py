@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Escritura del markdown al marcar tareas
+=======================================
+
+Marcar una tarea cambia un único byte por checkbox (" " -> "x", y al revés al
+desmarcar). En lugar de
+reescribir el archivo completo, DocumentoTareas lee el markdown en binario,
+guarda el desplazamiento en bytes del hueco de cada checkbox durante el parseo
+y al guardar escribe solo esos bytes con os.pwrite.
+
+Antes de parchear se comprueba que el archivo sigue siendo el que se leyó
+(inode, tamaño y mtime) y que cada byte a cambiar sigue teniendo el valor leído.
+Si otro proceso o el editor lo modificó entretanto, se vuelve a leer, se
+reaplican las marcas por ID estable y se reescribe el archivo completo de
+forma atómica (temporal + fsync + rename).
+
+Concurrencia: los escritores se serializan con un flock sobre el propio
+markdown (editar_documento). Los lectores no bloquean nunca: el archivo no se
+trunca jamás, así que siempre ven una versión completa. El parche escribe de
+la tarea hacia sus padres, de modo que un lector a mitad de una propagación
+ve el estado "hijo hecho, padre pendiente", que también es válido.
+
+El snapshot de la caché se rehace antes de soltar el bloqueo, con la firma
+del archivo que se acaba de escribir: otro escritor no puede colarse entre
+la escritura y la clave del snapshot.
+"""
+
+import fcntl
+import os
+from contextlib import contextmanager
+
+from todolist_cache import guardar_desde_nodos
+from todolist_core import (
+    PATRON_TAREA, calcular_ids, desmarcar_nodo, indexar_ids, marcar_nodo, marcar_nodos,
+    parsear_tareas
+)
+
+def firma_stat(st):
+    """Identidad de una versión del archivo: (inode, tamaño, mtime_ns)"""
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def escribir_atomico(archivo, datos):
+    """
+    Reemplazar el contenido de `archivo` de forma atómica: quien lo lea verá la
+    versión anterior completa o la nueva completa, nunca una a medias.
+    Devuelve el stat del archivo escrito (el inode pasa a ser el del destino).
+    """
+    import tempfile
+
+    # Seguir enlaces simbólicos: se reemplaza el destino, no el enlace
+    destino = os.path.realpath(archivo)
+    directorio = os.path.dirname(destino)
+    fd, temporal = tempfile.mkstemp(dir=directorio, prefix=".todolist-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        try:
+            os.chmod(temporal, os.stat(destino).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(temporal, destino)
+    except BaseException:
+        try:
+            os.unlink(temporal)
+        except FileNotFoundError:
+            pass
+        raise
+    return st
+
+@contextmanager
+def bloqueo_escritura(archivo):
+    """
+    Bloqueo exclusivo (flock) entre escritores del mismo markdown.
+    Como el reemplazo atómico cambia el inode, tras obtener el bloqueo se
+    comprueba que sigue siendo el del archivo actual y si no se reintenta.
+    Lanza FileNotFoundError si el archivo no existe.
+    """
+    while True:
+        fd = os.open(archivo, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            bloqueado = os.fstat(fd)
+            try:
+                actual = os.stat(archivo)
+            except FileNotFoundError:
+                actual = None
+        except BaseException:
+            os.close(fd)
+            raise
+        if actual is not None and (actual.st_dev, actual.st_ino) == (bloqueado.st_dev, bloqueado.st_ino):
+            break
+        os.close(fd)
+        if actual is None:
+            raise FileNotFoundError(archivo)
+
+    try:
+        yield
+    finally:
+        # Cerrar el descriptor libera el flock
+        os.close(fd)
+
+@contextmanager
+def editar_documento(archivo):
+    """
+    Leer, modificar y guardar el markdown con el bloqueo de escritura:
+        with editar_documento(archivo) as documento:
+            documento.marcar(nodo)
+    Si el bloque lanza una excepción no se guarda nada. Si se escribió algo,
+    el snapshot se rehace con el bloqueo aún tomado.
+    """
+    with bloqueo_escritura(archivo):
+        documento = DocumentoTareas(archivo)
+        yield documento
+        if documento.guardar() != "sin cambios":
+            guardar_desde_nodos(archivo, documento.nodos, documento.firma)
+
+class DocumentoTareas:
+    """
+    Markdown leído para marcar tareas: líneas, nodos, desplazamiento en bytes
+    de cada checkbox y la firma del archivo en el momento de la lectura.
+    """
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        with open(archivo, "rb") as f:
+            self.firma = firma_stat(os.fstat(f.fileno()))
+            datos = f.read()
+
+        # bytes.splitlines corta en \n, \r y \r\n, igual que readlines() en
+        # modo texto, así que los índices de línea coinciden con el resto
+        crudas = datos.splitlines(True)
+        self.lineas = [linea.decode("utf-8") for linea in crudas]
+        self.nodos = parsear_tareas(self.lineas)
+
+        inicios = []
+        posicion = 0
+        for cruda in crudas:
+            inicios.append(posicion)
+            posicion += len(cruda)
+
+        self.offsets = {}
+        for nodo in self.nodos:
+            linea = self.lineas[nodo.linea_idx]
+            m = PATRON_TAREA.match(linea)
+            self.offsets[nodo] = inicios[nodo.linea_idx] + len(linea[:m.start(2)].encode("utf-8"))
+
+        self._ids = None
+        # Byte final de cada checkbox que cambió (incluye padres propagados)
+        # y las operaciones pedidas, en orden: [(nodo, hecho)]
+        self.cambios = {}
+        self.solicitados = []
+
+    @property
+    def ids(self):
+        """Índice ID estable -> nodo (se calcula al pedirlo)"""
+        if self._ids is None:
+            self._ids = indexar_ids(self.nodos)
+        return self._ids
+
+    def marcar(self, nodo, indice=None):
+        """Marcar en memoria (líneas y nodos); se escribe al llamar a guardar()"""
+        marcados = marcar_nodo(self.lineas, nodo, indice)
+        self._anotar(marcados, b"x")
+        self.solicitados.append((nodo, True))
+        return marcados
+
+    def marcar_varios(self, nodos):
+        """
+        Marcar varios nodos en memoria con una sola pasada de propagación a
+        los padres; se escriben todos juntos al llamar a guardar()
+        """
+        marcados = marcar_nodos(self.lineas, nodos)
+        self._anotar(marcados, b"x")
+        self.solicitados.extend((nodo, True) for nodo in nodos)
+        return marcados
+
+    def desmarcar(self, nodo, indice=None):
+        """Desmarcar en memoria el nodo y sus padres marcados; se escribe al guardar()"""
+        desmarcados = desmarcar_nodo(self.lineas, nodo, indice)
+        self._anotar(desmarcados, b" ")
+        self.solicitados.append((nodo, False))
+        return desmarcados
+
+    def _anotar(self, nodos, byte):
+        for nodo in nodos:
+            if self.cambios.get(nodo) is None:
+                self.cambios[nodo] = byte
+            else:
+                # Marcado y desmarcado en la misma edición: vuelve a lo leído
+                del self.cambios[nodo]
+
+    def _parchear(self):
+        """Escribir solo los bytes cambiados; False si el archivo ya no es el leído"""
+        try:
+            fd = os.open(self.archivo, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            if firma_stat(os.fstat(fd)) != self.firma:
+                return False
+            parches = [(self.offsets[nodo], byte) for nodo, byte in self.cambios.items()]
+            leido = {b"x": b" ", b" ": b"x"}
+            if any(os.pread(fd, 1, offset) != leido[byte] for offset, byte in parches):
+                return False
+            for offset, byte in parches:
+                os.pwrite(fd, byte, offset)
+            self.firma = firma_stat(os.fstat(fd))
+            return True
+        finally:
+            os.close(fd)
+
+    def guardar(self):
+        """
+        Persistir las marcas. Devuelve "sin cambios", "parche" (bytes escritos
+        en su sitio) o "reescritura" (el archivo había cambiado y se reescribió).
+        """
+        if not self.cambios:
+            return "sin cambios"
+        if self._parchear():
+            self.cambios, self.solicitados = {}, []
+            return "parche"
+
+        # El archivo cambió por debajo: reaplicar las operaciones pedidas sobre
+        # lo actual (la propagación a los padres se recalcula con el contenido nuevo)
+        ids = dict(zip(self.nodos, calcular_ids(self.nodos)))
+        actual = DocumentoTareas(self.archivo)
+        # Las marcas seguidas se reaplican juntas (una sola propagación)
+        lote = []
+        for nodo_leido, hecho in self.solicitados:
+            nodo = actual.ids.get(ids[nodo_leido])
+            if nodo is None or nodo.checked == hecho:
+                continue
+            if hecho:
+                lote.append(nodo)
+            else:
+                if lote:
+                    actual.marcar_varios(lote)
+                    lote = []
+                actual.desmarcar(nodo)
+        if lote:
+            actual.marcar_varios(lote)
+        st = escribir_atomico(self.archivo, "".join(actual.lineas).encode("utf-8"))
+
+        # Los checkbox ocupan lo mismo marcados o no: los offsets siguen valiendo
+        self.lineas, self.nodos, self.offsets = actual.lineas, actual.nodos, actual.offsets
+        self._ids = actual._ids
+        self.firma = firma_stat(st)
+        self.cambios, self.solicitados = {}, []
+        return "reescritura"
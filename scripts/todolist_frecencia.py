@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Archivos recientes por frecencia
+================================
+
+Sustituye a historial.txt. Cada archivo tiene un contador de visitas y una
+"marca de tiempo decaída" T: la puntuación de frecencia es
+sum(2 ** ((t_visita - ahora) / VIDA_MEDIA)), que en escala logarítmica se
+guarda como un solo instante T con puntuación 2 ** ((T - ahora) / VIDA_MEDIA).
+Ordenar por T equivale a ordenar por frecencia en cualquier instante, así que
+leer el top-N no necesita la hora actual ni recalcular nada.
+
+El almacén (frecencia.log) es de solo añadir, con campos separados por
+tabuladores: cada visita es una línea "v\\t<epoch>\\t<ruta>" y un olvido
+"d\\t<ruta>". Cuando crece se compacta a una línea
+"c\\t<T>\\t<visitas>\\t<ruta>" por archivo, descartando entonces los que ya
+no existen; es el único momento en que se hace stat() de las entradas.
+"""
+
+import math
+import os
+import time
+from pathlib import Path
+
+from todolist_core import config_dir, frecencia_file, historial_file
+from todolist_escritura import bloqueo_escritura
+
+# Segundos para que una visita valga la mitad
+VIDA_MEDIA = 7 * 24 * 3600
+
+# Tamaño del log a partir del cual se compacta al registrar una visita
+MAX_BYTES_LOG = 64 * 1024
+
+def _sumar_visita(T, t):
+    """Añadir una visita en `t` a la marca decaída `T` (suma en escala log2)"""
+    if T is None:
+        return t
+    alto, bajo = max(T, t), min(T, t)
+    return alto + VIDA_MEDIA * math.log2(1 + 2 ** ((bajo - alto) / VIDA_MEDIA))
+
+def _plegar(lineas):
+    """Aplicar los registros en orden: {ruta: [T, visitas]}"""
+    entradas = {}
+    for linea in lineas:
+        partes = linea.rstrip("\n").split("\t")
+        try:
+            if partes[0] == "v" and len(partes) == 3:
+                ruta = partes[2]
+                T, visitas = entradas.get(ruta, (None, 0))
+                entradas[ruta] = [_sumar_visita(T, float(partes[1])), visitas + 1]
+            elif partes[0] == "c" and len(partes) == 4:
+                entradas[partes[3]] = [float(partes[1]), int(partes[2])]
+            elif partes[0] == "d" and len(partes) == 2:
+                entradas.pop(partes[1], None)
+        except ValueError:
+            # Registro a medias o ajeno: se ignora
+            continue
+    return entradas
+
+def _migrar_historial():
+    """Convertir historial.txt (más reciente primero) al primer uso"""
+    try:
+        with open(historial_file, "r", encoding="utf-8") as f:
+            rutas = [linea.strip() for linea in f if linea.strip()]
+    except OSError:
+        return []
+    ahora = time.time()
+    # Una visita por entrada, separadas una hora para conservar el orden
+    return [f"v\t{ahora - i * 3600:.3f}\t{ruta}\n" for i, ruta in enumerate(rutas)]
+
+def leer_frecencia():
+    """Estado del almacén en una sola lectura: {ruta: [T, visitas]}"""
+    try:
+        with open(frecencia_file, "r", encoding="utf-8") as f:
+            return _plegar(f)
+    except FileNotFoundError:
+        return _plegar(_migrar_historial())
+    except OSError:
+        return {}
+
+def top_frecencia(n=10, entradas=None):
+    """Las `n` rutas con más frecencia, sin comprobar que existan"""
+    if entradas is None:
+        entradas = leer_frecencia()
+    ordenadas = sorted(entradas.items(), key=lambda e: (e[1][0], e[1][1]), reverse=True)
+    return [Path(ruta) for ruta, _ in ordenadas[:n]]
+
+def _anadir(registros):
+    """Añadir registros al log bajo el bloqueo de escritura"""
+    config_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        # Primer uso: crear el log con el historial antiguo
+        with open(frecencia_file, "x", encoding="utf-8") as f:
+            f.writelines(_migrar_historial())
+    except FileExistsError:
+        pass
+    with bloqueo_escritura(frecencia_file):
+        with open(frecencia_file, "a", encoding="utf-8") as f:
+            f.writelines(registros)
+            return f.tell()
+
+def compactar():
+    """Reescribir el log con una línea por archivo existente"""
+    import tempfile
+
+    with bloqueo_escritura(frecencia_file):
+        with open(frecencia_file, "r", encoding="utf-8") as f:
+            entradas = _plegar(f)
+        lineas = [
+            f"c\t{T:.3f}\t{visitas}\t{ruta}\n"
+            for ruta, (T, visitas) in sorted(entradas.items(), key=lambda e: e[1][0], reverse=True)
+            if os.path.exists(ruta)
+        ]
+        fd, temporal = tempfile.mkstemp(dir=config_dir, prefix=".frecencia-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(lineas)
+            os.replace(temporal, frecencia_file)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
+def registrar_visita(ruta, ahora=None):
+    """Anotar que se abrió `ruta`; compacta el log si ha crecido demasiado"""
+    if ahora is None:
+        ahora = time.time()
+    if "\t" in str(ruta) or "\n" in str(ruta):
+        # No representable en el formato de líneas
+        return
+    try:
+        tamano = _anadir([f"v\t{ahora:.3f}\t{ruta}\n"])
+        if tamano > MAX_BYTES_LOG:
+            compactar()
+    except OSError:
+        pass
+
+def olvidar(ruta):
+    """Quitar una ruta (p. ej. un archivo que ya no existe) del ranking"""
+    try:
+        _anadir([f"d\t{ruta}\n"])
+    except OSError:
+        pass
+
+def ordenar_por_frecencia(rutas, entradas=None):
+    """
+    Mezclar una lista de rutas (p. ej. resultados de búsqueda) con el ranking:
+    primero las conocidas por frecencia, después el resto en su orden original.
+    """
+    if entradas is None:
+        entradas = leer_frecencia()
+    conocidas = [r for r in rutas if str(r) in entradas]
+    conocidas.sort(key=lambda r: entradas[str(r)][0], reverse=True)
+    return conocidas + [r for r in rutas if str(r) not in entradas]
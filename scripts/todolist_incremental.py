@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Reparseo incremental del markdown de tareas
+===========================================
+
+ArbolIncremental conserva las líneas y el árbol de Nodo del último parseo.
+Al recibir el contenido nuevo calcula la región editada (prefijo y sufijo
+comunes), localiza el subárbol mínimo que la contiene y solo vuelve a enlazar
+esos nodos. El resto del árbol conserva sus objetos; a los nodos posteriores
+a la edición únicamente se les desplaza linea_idx si cambió el número de líneas.
+
+Un bloque movido de sitio aparece como una única región que va del origen al
+destino; se detecta y se aplica como un borrado seguido de una inserción, así
+que solo se reenlazan los subárboles de ambos extremos.
+
+El resultado es idéntico al de parsear_tareas sobre el contenido completo.
+
+Para los procesos residentes (--follow y el servidor) el árbol mantiene
+además, bajo demanda, un IndicePendientes (primera pendiente en O(profundidad)
+tras cada edición) y el mapa de IDs estables, que se recalcula solo cuando
+el contenido cambia.
+"""
+
+from todolist_core import IndicePendientes, Nodo, PATRON_TAREA, calcular_ids, parsear_tareas
+
+def _nivel(indent):
+    """Nivel de anidación de una indentación (misma regla que parsear_tareas)"""
+    if '\t' in indent:
+        return len(indent)
+    return len(indent) // 4
+
+def _primer_nodo_desde(nodos, linea):
+    """Índice del primer nodo con linea_idx >= linea (búsqueda binaria)"""
+    lo, hi = 0, len(nodos)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if nodos[mid].linea_idx < linea:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+# Candidatos a revisar al buscar un bloque movido (evita casos patológicos
+# con muchas líneas idénticas, p. ej. líneas en blanco)
+MAX_CANDIDATOS_MOVIMIENTO = 16
+
+def _bloque_rotado(viejas, nuevas):
+    """
+    Longitud k del bloque inicial de `viejas` que aparece al final de `nuevas`
+    (viejas = bloque + resto, nuevas = resto + bloque), o None.
+    """
+    total = len(viejas)
+    candidatos = 0
+    for k in range(1, total):
+        if viejas[k] == nuevas[0]:
+            if viejas[k:] == nuevas[:total - k] and viejas[:k] == nuevas[total - k:]:
+                return k
+            candidatos += 1
+            if candidatos >= MAX_CANDIDATOS_MOVIMIENTO:
+                break
+    return None
+
+def _sin_bloque_movido(viejas, nuevas):
+    """
+    Si `nuevas` es `viejas` con un bloque desplazado de un extremo al otro
+    (rotación), devolver el contenido intermedio sin ese bloque. Como mover
+    k líneas hacia abajo equivale a mover el resto hacia arriba, se elige la
+    interpretación con el bloque más corto. Si no hay rotación, devolver None.
+    """
+    total = len(viejas)
+    if total != len(nuevas) or total < 2:
+        return None
+
+    abajo = _bloque_rotado(viejas, nuevas)
+    if abajo is None:
+        return None
+    arriba = total - abajo
+
+    if abajo <= arriba:
+        # El bloque inicial baja al final
+        return viejas[abajo:]
+    # El bloque final sube al principio
+    return viejas[:abajo]
+
+class ArbolIncremental:
+    def __init__(self, lineas, archivo=None):
+        self.archivo = archivo
+        self.lineas = list(lineas)
+        self.nodos = parsear_tareas(self.lineas)
+        # Si la última actualización añadió o quitó tareas de nivel raíz
+        self.raices_cambiadas = False
+        self._indice = None
+        self._ids = None
+        # Estadísticas: nodos vueltos a enlazar frente a total
+        self.actualizaciones = 0
+        self.nodos_reenlazados = 0
+
+    @property
+    def indice(self):
+        """IndicePendientes del árbol, creado la primera vez y mantenido en actualizar()"""
+        if self._indice is None:
+            self._indice = IndicePendientes(self.nodos)
+        return self._indice
+
+    @property
+    def ids(self):
+        """Diccionario ID estable → nodo (se recalcula tras cada cambio de contenido)"""
+        if self._ids is None:
+            ids = calcular_ids(self.nodos)
+            self._ids = (dict(zip(ids, self.nodos)), dict(zip(self.nodos, ids)))
+        return self._ids[0]
+
+    def id_de(self, nodo):
+        """ID estable de un nodo del árbol actual"""
+        self.ids
+        return self._ids[1][nodo]
+
+    def _region_editada(self, nuevas):
+        """(inicio, fin_viejo, fin_nuevo) de la región que difiere, o None"""
+        viejas = self.lineas
+        limite = min(len(viejas), len(nuevas))
+
+        inicio = 0
+        while inicio < limite and viejas[inicio] == nuevas[inicio]:
+            inicio += 1
+        if inicio == len(viejas) == len(nuevas):
+            return None
+
+        sufijo = 0
+        while (sufijo < limite - inicio
+               and viejas[len(viejas) - 1 - sufijo] == nuevas[len(nuevas) - 1 - sufijo]):
+            sufijo += 1
+
+        return inicio, len(viejas) - sufijo, len(nuevas) - sufijo
+
+    def actualizar(self, nuevas):
+        """
+        Aplicar el contenido nuevo y devolver los nodos afectados
+        (los del subárbol reenlazado más sus ancestros).
+        """
+        nuevas = list(nuevas)
+        self.raices_cambiadas = False
+        region = self._region_editada(nuevas)
+        if region is None:
+            return []
+        inicio, fin_viejo, fin_nuevo = region
+
+        intermedio = _sin_bloque_movido(self.lineas[inicio:fin_viejo], nuevas[inicio:fin_nuevo])
+        if intermedio is not None:
+            # Movimiento de bloque: borrar en el origen e insertar en el destino
+            intermedio = self.lineas[:inicio] + intermedio + self.lineas[fin_viejo:]
+            afectados = self._aplicar(intermedio, self._region_editada(intermedio))
+            afectados += self._aplicar(nuevas, self._region_editada(nuevas))
+        else:
+            afectados = self._aplicar(nuevas, region)
+
+        self._ids = None
+        if self._indice is not None:
+            self._indice.recalcular(self.nodos, afectados, self.raices_cambiadas)
+        return afectados
+
+    def _aplicar(self, nuevas, region):
+        """Reenlazar el subárbol mínimo que contiene la región editada"""
+        inicio, fin_viejo, fin_nuevo = region
+        delta = fin_nuevo - fin_viejo
+        nodos = self.nodos
+
+        # Nodos que estaban dentro de la región editada
+        i0 = _primer_nodo_desde(nodos, inicio)
+        i1 = _primer_nodo_desde(nodos, fin_viejo)
+
+        # Tareas nuevas de la región editada
+        entradas = []
+        for idx in range(inicio, fin_nuevo):
+            m = PATRON_TAREA.match(nuevas[idx])
+            if m:
+                indent, check, texto = m.groups()
+                entradas.append(Nodo(texto.strip(), _nivel(indent), check == "x", idx))
+
+        niveles = [n.nivel for n in nodos[i0:i1]] + [n.nivel for n in entradas]
+        self.lineas = nuevas
+        self.actualizaciones += 1
+
+        if not niveles:
+            # La edición no tocaba tareas: solo cambian los números de línea
+            if delta:
+                for nodo in nodos[i1:]:
+                    nodo.linea_idx += delta
+            return []
+
+        # La zona afectada se extiende tras la región mientras haya nodos que
+        # podrían colgar de ella (nivel > mínimo de la región). El primer nodo
+        # con nivel <= mínimo busca su padre antes de la región y los que le
+        # siguen lo encuentran en él o antes, así que ya no cambian.
+        minimo = min(niveles)
+        j = i1
+        while j < len(nodos) and nodos[j].nivel > minimo:
+            j += 1
+
+        for nodo in nodos[i1:] if delta else ():
+            nodo.linea_idx += delta
+
+        # Una raíz borrada no deja afectados: avisar de que las raíces cambian
+        if any(n.padre is None for n in nodos[i0:i1]):
+            self.raices_cambiadas = True
+
+        # Estado de la pila de parseo justo antes de la región:
+        # el último nodo anterior y sus ancestros
+        ancestros = []
+        nodo = nodos[i0 - 1] if i0 > 0 else None
+        while nodo is not None:
+            ancestros.append(nodo)
+            nodo = nodo.padre
+        ancestros.reverse()
+
+        # Separar los hijos de los ancestros en "antes" y "después" de la zona
+        zona_vieja = {id(n) for n in nodos[i0:j]}
+        posteriores = {}
+        for anc in ancestros:
+            conservados = [h for h in anc.hijos if id(h) not in zona_vieja]
+            corte = _primer_nodo_desde(conservados, inicio)
+            posteriores[id(anc)] = conservados[corte:]
+            anc.hijos = conservados[:corte]
+
+        # Reenlazar la zona: nodos nuevos de la región + cola desplazada
+        zona = entradas + nodos[i1:j]
+        stack = list(ancestros)
+        for nodo in zona:
+            nodo.hijos = []
+            nodo.padre = None
+            while stack and stack[-1].nivel >= nodo.nivel:
+                stack.pop()
+            if stack:
+                nodo.padre = stack[-1]
+                stack[-1].hijos.append(nodo)
+            stack.append(nodo)
+
+        for anc in ancestros:
+            anc.hijos.extend(posteriores[id(anc)])
+
+        nodos[i0:j] = zona
+        if any(n.padre is None for n in zona):
+            self.raices_cambiadas = True
+        self.nodos_reenlazados += len(zona)
+        return ancestros + zona
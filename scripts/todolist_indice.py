@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Índice persistente de archivos markdown
+=======================================
+
+El selector "Cambiar archivo markdown" necesita la lista de markdown del
+usuario. En lugar de recorrer el home entero con rglob cada vez, se mantiene un
+índice en ~/.local/share/todolist/indice_archivos.json con una entrada por
+directorio: su mtime, sus archivos markdown (nombre, mtime, tamaño) y sus
+subdirectorios.
+
+El recorrido usa os.scandir, respeta una profundidad máxima por raíz y poda
+.git, node_modules, .cache y .local. Al refrescar, un directorio cuyo mtime
+no cambió reutiliza su listado de archivos y subdirectorios (crear, borrar o
+renombrar cambia el mtime del directorio), así que un refresco sin cambios
+cuesta un stat() por directorio y uno por markdown, sin scandir. Los
+directorios se escanean en paralelo con un ThreadPoolExecutor (scandir
+libera el GIL).
+
+Sondeo de contenido: de cada markdown se leen los primeros BYTES_SONDEO bytes
+y se cuentan los checkbox pendientes y completados. El recuento se guarda en
+la entrada del archivo y se reutiliza mientras no cambien su mtime ni su
+tamaño, así que solo se sondean los archivos nuevos o modificados, en lotes
+repartidos entre hilos. El selector oculta los archivos sin checkbox y ordena
+el resto por tareas pendientes. Como el mtime de un directorio no cambia
+cuando se edita un archivo en el sitio, los markdown de un listado
+reutilizado se vuelven a stat() y los que cambiaron se sondean de nuevo.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+from todolist_core import config_dir
+
+indice_file = config_dir / "indice_archivos.json"
+
+VERSION_INDICE = 2
+
+# Niveles de subdirectorios que se exploran bajo cada raíz
+PROFUNDIDAD_MAXIMA = 3
+
+# Directorios que nunca se exploran
+DIRECTORIOS_IGNORADOS = {".git", "node_modules", ".cache", ".local"}
+
+EXTENSIONES_MARKDOWN = (".md", ".markdown")
+
+HILOS_ESCANEO = 8
+
+# Bytes que se leen de cada archivo para contar checkbox
+BYTES_SONDEO = 64 * 1024
+
+# Archivos por tarea del pool de sondeo
+LOTE_SONDEO = 256
+
+# Mismo criterio que PATRON_TAREA, sobre bytes y en modo multilínea
+PATRON_CHECKBOX = re.compile(rb"^[ \t]*[-*][ \t]+\[( |x)\]\s", re.MULTILINE)
+
+def raices_busqueda():
+    """Ubicaciones comunes donde buscar archivos markdown"""
+    return [
+        Path.home(),
+        Path.home() / "proyectos",
+        Path.home() / "Documentos",
+        Path.home() / "Documents",
+        Path.home() / "Desktop",
+        Path.home() / "Escritorio"
+    ]
+
+def cargar_indice():
+    """Índice guardado, o uno vacío si no existe o no es válido"""
+    try:
+        with open(indice_file, "r", encoding="utf-8") as f:
+            indice = json.load(f)
+        if indice.get("version") == VERSION_INDICE and isinstance(indice.get("directorios"), dict):
+            return indice
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {"version": VERSION_INDICE, "directorios": {}}
+
+def guardar_indice(indice):
+    """Escribir el índice de forma atómica; los errores no son fatales"""
+    import tempfile
+
+    datos = {"version": VERSION_INDICE, "directorios": indice["directorios"]}
+    try:
+        config_dir.mkdir(parents=True, exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=config_dir, prefix=".indice-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temporal, indice_file)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+    except OSError:
+        pass
+
+def contar_checkboxes(ruta, limite=BYTES_SONDEO):
+    """(pendientes, completadas) en los primeros `limite` bytes; (0, 0) si no se puede leer"""
+    try:
+        with open(ruta, "rb") as f:
+            datos = f.read(limite)
+    except OSError:
+        return 0, 0
+    # La mayoría de markdown no tiene tareas: descartarlos con una búsqueda
+    # de subcadena (memchr) antes de pasar la expresión regular
+    if b"[ ]" not in datos and b"[x]" not in datos:
+        return 0, 0
+    marcas = PATRON_CHECKBOX.findall(datos)
+    pendientes = marcas.count(b" ")
+    return pendientes, len(marcas) - pendientes
+
+def escanear_directorio(ruta, anterior=None):
+    """
+    Una pasada de scandir: {archivos: [[nombre, mtime_ns, tamaño, pendientes,
+    completadas]], subdirs}. Los recuentos se copian de `anterior` si el
+    archivo no cambió; si no quedan a None hasta sondearlo.
+    """
+    recuentos = {}
+    if anterior is not None:
+        recuentos = {
+            (nombre, mtime, tamano): conteo
+            for nombre, mtime, tamano, *conteo in anterior["archivos"]
+        }
+    archivos = []
+    subdirs = []
+    with os.scandir(ruta) as entradas:
+        for entrada in entradas:
+            try:
+                if entrada.is_dir(follow_symlinks=False):
+                    if entrada.name not in DIRECTORIOS_IGNORADOS:
+                        subdirs.append(entrada.name)
+                elif entrada.name.lower().endswith(EXTENSIONES_MARKDOWN) and entrada.is_file():
+                    st = entrada.stat()
+                    conteo = recuentos.get((entrada.name, st.st_mtime_ns, st.st_size), [None, None])
+                    archivos.append([entrada.name, st.st_mtime_ns, st.st_size, *conteo])
+            except OSError:
+                continue
+    archivos.sort()
+    subdirs.sort()
+    return {"archivos": archivos, "subdirs": subdirs}
+
+def revisar_archivos(ruta, entrada):
+    """
+    Actualizar (mtime_ns, tamaño) de los archivos de un listado reutilizado.
+    Los que cambiaron pierden su recuento para que se vuelvan a sondear; los
+    que ya no se pueden leer se quitan.
+    """
+    archivos = []
+    for archivo in entrada["archivos"]:
+        try:
+            st = os.stat(os.path.join(ruta, archivo[0]))
+        except OSError:
+            continue
+        if (st.st_mtime_ns, st.st_size) != (archivo[1], archivo[2]):
+            archivo = [archivo[0], st.st_mtime_ns, st.st_size, None, None]
+        archivos.append(archivo)
+    entrada["archivos"] = archivos
+    return entrada
+
+def _visitar(ruta, anterior):
+    """
+    Listado de un directorio: el guardado (con sus archivos revisados) si su
+    mtime no cambió, uno nuevo si no. Devuelve (entrada, reutilizada) o
+    (None, False) si ya no existe.
+    """
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None, False
+    if anterior is not None and anterior.get("mtime_ns") == mtime:
+        return revisar_archivos(ruta, anterior), True
+    try:
+        entrada = escanear_directorio(ruta, anterior)
+    except OSError:
+        return None, False
+    entrada["mtime_ns"] = mtime
+    return entrada, False
+
+def _sondear_lote(lote):
+    return [contar_checkboxes(ruta) for ruta in lote]
+
+def sondear_indice(directorios, hilos=HILOS_ESCANEO):
+    """Contar checkbox de los archivos aún sin recuento; devuelve cuántos se sondearon"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    sin_contar = [
+        (os.path.join(directorio, archivo[0]), archivo)
+        for directorio, entrada in directorios.items()
+        for archivo in entrada["archivos"]
+        if archivo[3] is None
+    ]
+    lotes = [sin_contar[i:i + LOTE_SONDEO] for i in range(0, len(sin_contar), LOTE_SONDEO)]
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        resultados = pool.map(_sondear_lote, [[ruta for ruta, _ in lote] for lote in lotes])
+        for lote, conteos in zip(lotes, resultados):
+            for (_, archivo), (pendientes, completadas) in zip(lote, conteos):
+                archivo[3], archivo[4] = pendientes, completadas
+    return len(sin_contar)
+
+def actualizar_indice(raices=None, profundidad=PROFUNDIDAD_MAXIMA, hilos=HILOS_ESCANEO,
+                      indice=None, guardar=True, sondear=True):
+    """
+    Refrescar el índice de forma incremental y devolverlo. Solo conserva los
+    directorios alcanzados en este refresco (los borrados desaparecen).
+    Con `sondear` cuenta además los checkbox de los archivos nuevos o cambiados.
+    indice["estadisticas"] cuenta directorios escaneados y reutilizados y
+    archivos sondeados.
+    """
+    # concurrent.futures importa logging y threading: solo al refrescar el índice
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    if raices is None:
+        raices = raices_busqueda()
+    if indice is None:
+        indice = cargar_indice()
+    anteriores = indice["directorios"]
+
+    # Profundidad restante por directorio: una raíz dentro de otra (Documentos
+    # dentro del home) conserva su propio margen
+    pendientes = {}
+    for raiz in raices:
+        ruta = os.path.abspath(raiz)
+        pendientes[ruta] = max(pendientes.get(ruta, -1), profundidad)
+
+    nuevos = {}
+    margen = {}
+    escaneados = reutilizados = 0
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        en_curso = {}
+
+        def lanzar(ruta, restante):
+            if margen.get(ruta, -1) >= restante:
+                return
+            margen[ruta] = restante
+            if ruta in nuevos:
+                # Ya visitado con menos margen: solo hay que bajar más
+                bajar(ruta, nuevos[ruta], restante)
+                return
+            futuro = pool.submit(_visitar, ruta, anteriores.get(ruta))
+            en_curso[futuro] = ruta
+
+        def bajar(ruta, entrada, restante):
+            if restante > 0:
+                for nombre in entrada["subdirs"]:
+                    lanzar(os.path.join(ruta, nombre), restante - 1)
+
+        for ruta, restante in pendientes.items():
+            lanzar(ruta, restante)
+
+        while en_curso:
+            hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                ruta = en_curso.pop(futuro)
+                entrada, reutilizada = futuro.result()
+                if entrada is None:
+                    continue
+                if reutilizada:
+                    reutilizados += 1
+                else:
+                    escaneados += 1
+                nuevos[ruta] = entrada
+                bajar(ruta, entrada, margen[ruta])
+
+    sondeados = sondear_indice(nuevos, hilos) if sondear else 0
+
+    indice = {
+        "version": VERSION_INDICE,
+        "directorios": nuevos,
+        "estadisticas": {
+            "escaneados": escaneados, "reutilizados": reutilizados, "sondeados": sondeados
+        }
+    }
+    if guardar:
+        guardar_indice(indice)
+    return indice
+
+def archivos_indexados(indice):
+    """Archivos markdown del índice como [(Path, mtime_ns, tamaño)], más recientes primero"""
+    archivos = [
+        (Path(directorio) / nombre, mtime, tamano)
+        for directorio, entrada in indice["directorios"].items()
+        for nombre, mtime, tamano, *_ in entrada["archivos"]
+    ]
+    archivos.sort(key=lambda a: a[1], reverse=True)
+    return archivos
+
+def archivos_con_tareas(indice):
+    """
+    Archivos con algún checkbox como [(Path, pendientes, completadas)]: más
+    pendientes primero y, a igualdad, más recientes primero. Los que no tienen
+    checkbox (o aún no se sondearon) se omiten.
+    """
+    archivos = [
+        (Path(directorio) / nombre, mtime, pendientes, completadas)
+        for directorio, entrada in indice["directorios"].items()
+        for nombre, mtime, _, pendientes, completadas in entrada["archivos"]
+        if pendientes or completadas
+    ]
+    archivos.sort(key=lambda a: (a[2], a[1]), reverse=True)
+    return [(ruta, pendientes, completadas) for ruta, _, pendientes, completadas in archivos]
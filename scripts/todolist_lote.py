@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Mutaciones por lotes del markdown de tareas
+===========================================
+
+`current.py --batch <archivo|->` lee órdenes de un archivo o de stdin y las
+aplica todas sobre un único árbol parseado por markdown, con una sola
+escritura atómica al final. Cerrar cien tareas desde los mensajes de commit
+cuesta así un arranque, una lectura y una escritura, no cien.
+
+Formato de línea (una orden por línea; "#" empieza un comentario):
+    mark <id|texto>
+    unmark <id|texto>
+    add <texto>                        (al final, en la raíz)
+    add\\t<texto>\\t<padre>            (último hijo de <padre>)
+    move\\t<tarea>\\t<destino>         (último hijo de <destino>; vacío = raíz)
+Con un solo argumento basta un espacio; con dos se separan con tabuladores.
+
+Formato JSON: una lista de objetos, o un objeto por línea:
+    {"op": "mark", "tarea": "..."}
+    {"op": "add", "texto": "...", "padre": "..."}
+    {"op": "move", "tarea": "...", "destino": null}
+
+Las tareas se buscan por ID estable y, si no, por texto (prefiriendo una en
+el estado contrario al pedido). Las marcas se acumulan y se propagan a los
+padres en una sola pasada (marcar_nodos) antes de la siguiente orden que no
+sea mark; add y move reescriben líneas y el árbol se reparsea solo cuando
+alguna orden posterior lo necesita (o al sacar una tarea de debajo de un
+padre, que puede quedar con todos sus hijos hechos). Una orden que falla no detiene el lote:
+se informa en su resultado y el resto se aplica.
+"""
+
+import json
+from contextlib import ExitStack
+
+from todolist_cache import guardar_desde_nodos
+from todolist_core import (
+    PATRON_TAREA, calcular_ids, desmarcar_nodo, marcar_nodos, parsear_tareas
+)
+from todolist_escritura import bloqueo_escritura, escribir_atomico, firma_stat
+
+ORDENES_LOTE = ("mark", "unmark", "add", "move")
+
+def leer_comandos(texto):
+    """
+    Órdenes de un lote en texto o JSON. Devuelve (comandos, es_json); cada
+    comando es un dict con "op" y sus argumentos, o con "error" si la línea
+    no se pudo interpretar (se informa en su posición del resultado).
+    """
+    contenido = texto.strip()
+    if contenido.startswith("["):
+        try:
+            comandos = json.loads(contenido)
+        except ValueError as e:
+            return [{"op": None, "error": f"JSON no válido: {e}"}], True
+        if not isinstance(comandos, list):
+            return [{"op": None, "error": "se esperaba una lista de órdenes"}], True
+        return [_normalizar(c) for c in comandos], True
+
+    comandos = []
+    es_json = contenido.startswith("{")
+    for linea in texto.splitlines():
+        if not linea.strip() or linea.lstrip().startswith("#"):
+            continue
+        if linea.lstrip().startswith("{"):
+            try:
+                comandos.append(_normalizar(json.loads(linea)))
+            except ValueError as e:
+                comandos.append({"op": None, "error": f"JSON no válido: {e}"})
+            continue
+        partes = linea.rstrip("\r").split("\t") if "\t" in linea else linea.strip().split(None, 1)
+        op, argumentos = partes[0], partes[1:]
+        if op in ("mark", "unmark"):
+            comando = {"op": op, "tarea": argumentos[0] if argumentos else ""}
+        elif op == "add":
+            comando = {"op": op, "texto": argumentos[0] if argumentos else "",
+                       "padre": argumentos[1] if len(argumentos) > 1 else None}
+        elif op == "move":
+            comando = {"op": op, "tarea": argumentos[0] if argumentos else "",
+                       "destino": argumentos[1] if len(argumentos) > 1 else None}
+        else:
+            comando = {"op": op}
+        comandos.append(_normalizar(comando))
+    return comandos, es_json
+
+def _normalizar(comando):
+    """Validar un comando; los inválidos llevan "error" con el motivo"""
+    if not isinstance(comando, dict):
+        return {"op": None, "error": "cada orden debe ser un objeto"}
+    op = comando.get("op")
+    if op not in ORDENES_LOTE:
+        return {**comando, "error": f"orden desconocida: {op or '(vacía)'}"}
+    clave = "texto" if op == "add" else "tarea"
+    valor = comando.get(clave)
+    if not isinstance(valor, str) or not valor.strip():
+        return {**comando, "error": f"{op} necesita \"{clave}\""}
+    if op == "add" and "\n" in valor:
+        return {**comando, "error": "el texto no puede contener saltos de línea"}
+    return comando
+
+def _ultimo_descendiente(nodo):
+    while nodo.hijos:
+        nodo = nodo.hijos[-1]
+    return nodo
+
+def _sangria(linea):
+    return PATRON_TAREA.match(linea).group(1)
+
+class LoteTareas:
+    """
+    Un markdown cargado para aplicarle un lote de órdenes. Se crea con el
+    bloqueo de escritura ya tomado y se escribe una sola vez con guardar().
+    """
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        # newline="": conservar los finales de línea tal cual
+        with open(archivo, "r", encoding="utf-8", newline="") as f:
+            self.lineas = f.readlines()
+        self.originales = list(self.lineas)
+        self._nodos = parsear_tareas(self.lineas)
+        self._ids = None
+        self._sucio = False
+        # Firma del archivo escrito por guardar() (clave de su snapshot)
+        self.firma = None
+        # Marcas pedidas pendientes de propagar, en orden
+        self._marcas = {}
+        self.propagadas = 0
+
+        sangrias = (_sangria(l) for l in self.lineas if PATRON_TAREA.match(l))
+        self.unidad = next((("\t" if "\t" in s else "    ") for s in sangrias if s), "    ")
+
+    @property
+    def nodos(self):
+        """Árbol actual (se reparsea tras add o move, solo cuando hace falta)"""
+        if self._sucio:
+            self._nodos = parsear_tareas(self.lineas)
+            self._ids = None
+            self._sucio = False
+        return self._nodos
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = dict(zip(calcular_ids(self.nodos), self.nodos))
+        return self._ids
+
+    def buscar(self, referencia, hecha=None):
+        """
+        Tarea por ID estable o, si no, por texto. Entre varias con el mismo
+        texto se prefiere la que está en el estado `hecha` (y que no tenga ya
+        una marca pendiente en este lote).
+        """
+        nodo = self.ids.get(referencia)
+        if nodo is not None:
+            return nodo
+        candidatas = [n for n in self.nodos if n.texto == referencia]
+        for nodo in candidatas:
+            if hecha is None or (nodo.checked == hecha and nodo not in self._marcas):
+                return nodo
+        return candidatas[0] if candidatas else None
+
+    def marcar(self, nodo):
+        """Marcar en el lote; la propagación a los padres se hace junta después"""
+        self._marcas[nodo] = True
+
+    def _propagar(self):
+        if self._marcas:
+            pedidas = [n for n in self._marcas if not n.checked]
+            marcados = marcar_nodos(self.lineas, list(self._marcas))
+            self.propagadas += len(marcados) - len(pedidas)
+            self._marcas.clear()
+
+    def desmarcar(self, nodo):
+        self._propagar()
+        desmarcar_nodo(self.lineas, nodo)
+
+    def anadir(self, texto, padre=None):
+        """Nueva tarea pendiente: último hijo de `padre` o al final del archivo"""
+        self._propagar()
+        if padre is None:
+            sangria, posicion = "", len(self.lineas)
+        else:
+            # Un padre no puede quedar hecho con un hijo pendiente
+            desmarcar_nodo(self.lineas, padre)
+            sangria = _sangria(self.lineas[padre.linea_idx]) + self.unidad
+            posicion = _ultimo_descendiente(padre).linea_idx + 1
+        self._insertar(posicion, [f"{sangria}- [ ] {texto}\n"])
+        self._sucio = True
+
+    def mover(self, nodo, destino=None):
+        """Llevar `nodo` y su subárbol al final de los hijos de `destino` (None = raíz)"""
+        self._propagar()
+        if destino is not None:
+            actual = destino
+            while actual is not None:
+                if actual is nodo:
+                    raise ValueError("no se puede mover una tarea dentro de sí misma")
+                actual = actual.padre
+
+        inicio = nodo.linea_idx
+        fin = _ultimo_descendiente(nodo).linea_idx + 1
+        if destino is None:
+            nueva, posicion = "", len(self.lineas)
+        else:
+            pendiente = any(
+                not n.checked for n in self.nodos if inicio <= n.linea_idx < fin
+            )
+            if pendiente:
+                desmarcar_nodo(self.lineas, destino)
+            nueva = _sangria(self.lineas[destino.linea_idx]) + self.unidad
+            posicion = _ultimo_descendiente(destino).linea_idx + 1
+
+        vieja = _sangria(self.lineas[inicio])
+        bloque = []
+        for linea in self.lineas[inicio:fin]:
+            if linea.startswith(vieja):
+                linea = nueva + linea[len(vieja):]
+            elif linea.strip():
+                linea = nueva + linea.lstrip(" \t")
+            bloque.append(linea)
+        if not bloque[-1].endswith(("\n", "\r")):
+            bloque[-1] += "\n"
+
+        del self.lineas[inicio:fin]
+        if posicion > inicio:
+            posicion -= fin - inicio
+        self._insertar(posicion, bloque)
+        self._sucio = True
+
+        # El padre de origen pierde un hijo: si los que le quedan están todos
+        # hechos, se marca y se propaga hacia arriba como en mark
+        viejo = nodo.padre
+        if viejo is not None:
+            indice = viejo.linea_idx + (len(bloque) if posicion <= viejo.linea_idx else 0)
+            viejo = next(n for n in self.nodos if n.linea_idx == indice)
+            if viejo.hijos and all(h.checked for h in viejo.hijos):
+                self.propagadas += len(marcar_nodos(self.lineas, [viejo]))
+
+    def _insertar(self, posicion, lineas):
+        if posicion > 0 and not self.lineas[posicion - 1].endswith(("\n", "\r")):
+            self.lineas[posicion - 1] += "\n"
+        self.lineas[posicion:posicion] = lineas
+
+    def guardar(self):
+        """Propagar lo pendiente y escribir de forma atómica si algo cambió"""
+        self._propagar()
+        if self.lineas == self.originales:
+            return False
+        self.firma = firma_stat(escribir_atomico(self.archivo, "".join(self.lineas).encode("utf-8")))
+        return True
+
+def _aplicar(lotes, comando):
+    """Aplicar un comando validado; devuelve el detalle o lanza ValueError"""
+    op = comando["op"]
+
+    def localizar(referencia, hecha=None):
+        for lote in lotes.values():
+            nodo = lote.buscar(referencia, hecha)
+            if nodo is not None:
+                return lote, nodo
+        raise ValueError(f"no se encontró la tarea {referencia}")
+
+    if op == "mark":
+        lote, nodo = localizar(comando["tarea"], hecha=False)
+        lote.marcar(nodo)
+        return nodo.texto
+    if op == "unmark":
+        lote, nodo = localizar(comando["tarea"], hecha=True)
+        lote.desmarcar(nodo)
+        return nodo.texto
+    if op == "add":
+        if comando.get("padre"):
+            lote, padre = localizar(comando["padre"])
+        else:
+            lote, padre = next(iter(lotes.values())), None
+        lote.anadir(comando["texto"].strip(), padre)
+        return comando["texto"].strip()
+
+    # move: el destino tiene que estar en el mismo archivo
+    lote, nodo = localizar(comando["tarea"])
+    destino = None
+    if comando.get("destino"):
+        destino = lote.buscar(comando["destino"])
+        if destino is None:
+            raise ValueError(f"no se encontró el destino {comando['destino']} en {lote.archivo.name}")
+    texto = nodo.texto
+    lote.mover(nodo, destino)
+    return f"{texto} → {destino.texto if destino is not None else 'raíz'}"
+
+def aplicar_lote(archivos, comandos):
+    """
+    Aplicar `comandos` a `archivos` (los que existan) con su bloqueo de
+    escritura tomado durante todo el lote, en el orden de `archivos` para no
+    cruzarse con otro lote. Cada archivo modificado se escribe una vez y deja
+    su snapshot al día. Devuelve (resultados, estadísticas); cada resultado
+    es {"op", "ok", "detalle"}. Lanza FileNotFoundError si no existe ninguno
+    de los archivos.
+    """
+    with ExitStack() as pila:
+        lotes = {}
+        for archivo in archivos:
+            if archivo in lotes:
+                continue
+            try:
+                pila.enter_context(bloqueo_escritura(archivo))
+            except FileNotFoundError:
+                continue
+            lotes[archivo] = LoteTareas(archivo)
+        if not lotes:
+            raise FileNotFoundError(archivos[0])
+
+        resultados = []
+        for comando in comandos:
+            if "error" in comando:
+                resultados.append({"op": comando.get("op"), "ok": False, "detalle": comando["error"]})
+                continue
+            try:
+                detalle = _aplicar(lotes, comando)
+                resultados.append({"op": comando["op"], "ok": True, "detalle": detalle})
+            except ValueError as e:
+                resultados.append({"op": comando["op"], "ok": False, "detalle": str(e)})
+
+        escritos = [archivo for archivo, lote in lotes.items() if lote.guardar()]
+        # Con los bloqueos aún tomados: la clave es la del archivo que escribimos
+        for archivo in escritos:
+            guardar_desde_nodos(archivo, lotes[archivo].nodos, lotes[archivo].firma)
+    estadisticas = {
+        "escritos": len(escritos),
+        "propagadas": sum(lote.propagadas for lote in lotes.values())
+    }
+    return resultados, estadisticas
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Render memoizado del tooltip y del menú rofi
+============================================
+
+Cada subárbol recibe un hash de contenido al estilo Merkle: el hash de un nodo
+resume su texto, su nivel, su estado y los hashes de sus hijos. Los fragmentos
+renderizados (las líneas del tooltip y del menú de ese subárbol) se guardan en
+una caché LRU indexada por ese hash, así que un subárbol sin cambios se reutiliza
+aunque sus objetos Nodo sean nuevos o esté en otro archivo.
+
+Tras marcar una tarea o una edición pequeña solo cambian los hashes del camino
+desde el nodo tocado hasta la raíz: RenderizadorMemo.invalidar() los descarta y
+el siguiente render vuelve a generar únicamente esos fragmentos. El tooltip
+acotado se memoiza entero por (hash de las raíces, presupuesto).
+
+estadisticas() muestra aciertos, fallos y tasa de acierto de la caché.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+from todolist_core import PRESUPUESTO_TOOLTIP, generar_tooltip_acotado
+
+# Fragmentos que se guardan como máximo (tooltip + menú + tooltips acotados)
+CAPACIDAD_MEMO = 50000
+
+_FALTA = object()
+
+class CacheLRU:
+    """Diccionario con capacidad máxima que descarta lo menos usado"""
+
+    def __init__(self, capacidad=CAPACIDAD_MEMO):
+        self.capacidad = capacidad
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        valor = self.entradas.get(clave, _FALTA)
+        if valor is _FALTA:
+            self.fallos += 1
+        else:
+            self.aciertos += 1
+            self.entradas.move_to_end(clave)
+        return valor
+
+    def guardar(self, clave, valor):
+        self.entradas[clave] = valor
+        self.entradas.move_to_end(clave)
+        while len(self.entradas) > self.capacidad:
+            self.entradas.popitem(last=False)
+
+class _PendientesMemo:
+    """Vista nodo -> pendientes por debajo, calculada junto con el hash"""
+
+    def __init__(self, render):
+        self.render = render
+
+    def __getitem__(self, nodo):
+        return self.render._resumen(nodo)[1]
+
+class RenderizadorMemo:
+    def __init__(self, capacidad=CAPACIDAD_MEMO):
+        self.fragmentos = CacheLRU(capacidad)
+        # nodo -> (hash del subárbol, pendientes por debajo)
+        self._resumenes = {}
+
+    def olvidar(self):
+        """Descartar los hashes por nodo (p. ej. al cambiar de árbol); los fragmentos siguen"""
+        self._resumenes.clear()
+
+    def invalidar(self, nodos):
+        """Descartar el hash de los nodos cambiados y de todos sus ancestros"""
+        for nodo in nodos:
+            while nodo is not None:
+                self._resumenes.pop(nodo, None)
+                nodo = nodo.padre
+
+    def _resumen(self, nodo):
+        resumen = self._resumenes.get(nodo)
+        if resumen is None:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(b"x" if nodo.checked else b" ")
+            h.update(nodo.nivel.to_bytes(2, "little"))
+            h.update(nodo.texto.encode("utf-8"))
+            pendientes = 0
+            for hijo in nodo.hijos:
+                digest, debajo = self._resumen(hijo)
+                h.update(digest)
+                pendientes += debajo + (0 if hijo.checked else 1)
+            resumen = self._resumenes[nodo] = (h.digest(), pendientes)
+        return resumen
+
+    def hash(self, nodo):
+        """Hash de contenido del subárbol de `nodo`"""
+        return self._resumen(nodo)[0]
+
+    def _podar(self, nodos):
+        # Los nodos eliminados por ediciones no se invalidan: si los hashes
+        # guardados superan con holgura al árbol actual, empezar de cero
+        if len(self._resumenes) > 2 * len(nodos) + 1024:
+            self.olvidar()
+
+    def _hash_raices(self, raices):
+        h = hashlib.blake2b(digest_size=16)
+        for raiz in raices:
+            h.update(self.hash(raiz))
+        return h.digest()
+
+    def _fragmento_tooltip(self, nodo, nivel):
+        """Líneas del tooltip del subárbol (mismo formato que generar_tooltip)"""
+        clave = ("tooltip", self.hash(nodo), nivel)
+        fragmento = self.fragmentos.obtener(clave)
+        if fragmento is _FALTA:
+            partes = []
+            if not nodo.checked:
+                partes.append(f"{'    ' * nivel}[ ] {nodo.texto}")
+            for hijo in nodo.hijos:
+                parte = self._fragmento_tooltip(hijo, nivel + 1)
+                if parte:
+                    partes.append(parte)
+            fragmento = "\n".join(partes)
+            self.fragmentos.guardar(clave, fragmento)
+        return fragmento
+
+    def _fragmento_menu(self, nodo):
+        """Líneas del menú del subárbol (mismo formato que listar_tareas_pendientes)"""
+        clave = ("menu", self.hash(nodo))
+        fragmento = self.fragmentos.obtener(clave)
+        if fragmento is _FALTA:
+            fragmento = []
+            if not nodo.checked:
+                fragmento.append(f"{'  ' * nodo.nivel} {nodo.texto}")
+            for hijo in nodo.hijos:
+                fragmento.extend(self._fragmento_menu(hijo))
+            fragmento = tuple(fragmento)
+            self.fragmentos.guardar(clave, fragmento)
+        return fragmento
+
+    def tooltip(self, nodos):
+        """Equivalente memoizado de generar_tooltip"""
+        self._podar(nodos)
+        partes = [self._fragmento_tooltip(n, 0) for n in nodos if n.padre is None]
+        partes = [p for p in partes if p]
+        return "\n".join(partes) if partes else "✅ Todas las tareas completadas"
+
+    def menu(self, nodos):
+        """Equivalente memoizado de listar_tareas_pendientes"""
+        self._podar(nodos)
+        tareas = []
+        for nodo in nodos:
+            if nodo.padre is None:
+                tareas.extend(self._fragmento_menu(nodo))
+        return tareas
+
+    def tooltip_acotado(self, nodos, presupuesto=PRESUPUESTO_TOOLTIP):
+        """Equivalente memoizado de generar_tooltip_acotado"""
+        self._podar(nodos)
+        raices = [n for n in nodos if n.padre is None]
+        clave = ("acotado", self._hash_raices(raices), tuple(presupuesto))
+        tooltip = self.fragmentos.obtener(clave)
+        if tooltip is _FALTA:
+            tooltip = generar_tooltip_acotado(
+                nodos, *presupuesto, raices=raices, desc=_PendientesMemo(self)
+            )
+            self.fragmentos.guardar(clave, tooltip)
+        return tooltip
+
+    def estadisticas(self):
+        """Aciertos, fallos, tasa de acierto y tamaño de la caché de fragmentos"""
+        cache = self.fragmentos
+        consultas = cache.aciertos + cache.fallos
+        return {
+            "aciertos": cache.aciertos,
+            "fallos": cache.fallos,
+            "tasa_acierto": round(cache.aciertos / consultas, 4) if consultas else 0.0,
+            "fragmentos": len(cache.entradas),
+            "hashes": len(self._resumenes)
+        }
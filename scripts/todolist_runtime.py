@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Directorio de sockets del backend compartido
+============================================
+
+Lo usan el servidor (current.py --servidor) y el cliente de comandos
+(todolistctl.py), que tienen que coincidir en la misma ruta. Solo importa os
+(y stat, que os ya carga): todolistctl lo carga en cada clic de waybar. tempfile (que arrastra shutil y
+random) solo se importa si no hay $XDG_RUNTIME_DIR.
+
+En /tmp cualquier usuario puede crear "todolist-<uid>" antes que nosotros y
+poner sus propios sockets: un directorio que no sea nuestro, sea un enlace
+o tenga permisos para otros se rechaza con PermissionError (los clientes
+siguen entonces sin backend compartido).
+"""
+
+import os
+import stat
+
+def directorio_runtime():
+    """Directorio privado de sockets: $XDG_RUNTIME_DIR/todolist o <tmp>/todolist-<uid>"""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base and os.path.isdir(base):
+        directorio = os.path.join(base, "todolist")
+    else:
+        import tempfile
+
+        directorio = os.path.join(tempfile.gettempdir(), f"todolist-{os.getuid()}")
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    st = os.lstat(directorio)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{directorio} no es un directorio privado de este usuario")
+    return directorio
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Backend compartido para varias barras
+=====================================
+
+Con varios monitores cada instancia de waybar lanza su propio
+`current.py --follow`, y todas parsean y renderizan el mismo archivo. Aquí un
+único proceso (current.py --servidor) es el dueño del estado parseado y
+publica cada línea JSON a todos los clientes conectados a un socket Unix en
+$XDG_RUNTIME_DIR/todolist/. El trabajo de parseo no depende de cuántas barras
+haya.
+
+    cliente (current.py --follow)          servidor (current.py --servidor)
+      conectar o arrancar el servidor  ->    acepta y envía la última línea
+      copiar líneas a stdout           <-    difunde cada cambio a todos
+
+El servidor se arranca bajo demanda desde el primer cliente y termina cuando
+el último se va (tras ESPERA_ULTIMO_CLIENTE segundos, para sobrevivir a una
+recarga de waybar). Un flock sobre "<socket>.lock" garantiza un solo servidor
+por socket aunque dos clientes lo arranquen a la vez. Si el servidor
+desaparece, los clientes lo vuelven a arrancar y se reconectan.
+
+Cada combinación de opciones de salida (tooltip, presupuesto, archivos,
+orden) tiene su propio socket, así que las barras configuradas igual
+comparten servidor.
+
+Socket de comandos: junto a "backend-<h>.sock" el servidor escucha en
+"comandos-<h>.sock". Un cliente envía una línea "orden\targumento" (mark,
+unmark, next, reload, switch-file) y recibe "ok\t<detalle>" o
+"error\t<mensaje>". Las órdenes se encolan para el hilo que tiene los árboles
+en memoria (ColaComandos lo despierta con una tubería), que las ejecuta,
+publica el JSON nuevo a las barras y solo entonces responde. todolistctl.py
+es el cliente mínimo que usan los clics de waybar.
+"""
+
+import collections
+import fcntl
+import hashlib
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+from todolist_runtime import directorio_runtime
+
+# Segundos que el servidor sigue vivo sin clientes antes de salir
+ESPERA_ULTIMO_CLIENTE = 2.0
+
+# Segundos máximos que un cliente espera a que arranque el servidor
+ESPERA_ARRANQUE = 5.0
+
+# Segundos máximos para escribir una línea a un cliente antes de soltarlo
+TIMEOUT_ENVIO = 1.0
+
+# Tamaño máximo de una orden del socket de comandos
+MAX_BYTES_COMANDO = 64 * 1024
+
+ORDENES = ("mark", "unmark", "next", "reload", "switch-file")
+
+class ServidorNoDisponible(Exception):
+    """No se pudo conectar ni arrancar el servidor compartido"""
+
+def ruta_socket(argumentos, prefijo="backend"):
+    """Socket para una combinación de opciones de salida (mismas opciones, mismo socket)"""
+    h = hashlib.sha1("\0".join(argumentos).encode("utf-8"))
+    if "--archivo" in argumentos:
+        # Los patrones relativos dependen del directorio de trabajo
+        h.update(os.getcwd().encode("utf-8"))
+    return Path(directorio_runtime()) / f"{prefijo}-{h.hexdigest()[:12]}.sock"
+
+def ruta_comandos(ruta):
+    """Socket de comandos que acompaña al socket de difusión `ruta`"""
+    ruta = Path(ruta)
+    return ruta.with_name(ruta.name.replace("backend-", "comandos-", 1))
+
+class ColaComandos:
+    """
+    Órdenes recibidas por el socket de comandos, a la espera del hilo que
+    tiene el estado. fileno() se vuelve legible cuando hay alguna, así que
+    sirve de despertador para VigilanteArchivos.esperar.
+    """
+
+    def __init__(self):
+        self._lectura, self._escritura = os.pipe()
+        os.set_blocking(self._lectura, False)
+        self._ordenes = collections.deque()
+
+    def fileno(self):
+        return self._lectura
+
+    def poner(self, orden, argumento, responder):
+        """Encolar una orden; `responder(ok, detalle)` se llama al terminarla"""
+        self._ordenes.append((orden, argumento, responder))
+        os.write(self._escritura, b"!")
+
+    def tomar(self, maximo=None):
+        """Hasta `maximo` órdenes pendientes (todas si es None), en orden de llegada"""
+        try:
+            while os.read(self._lectura, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        ordenes = []
+        while self._ordenes and (maximo is None or len(ordenes) < maximo):
+            ordenes.append(self._ordenes.popleft())
+        if self._ordenes:
+            # Quedan órdenes: que el despertador siga legible
+            os.write(self._escritura, b"!")
+        return ordenes
+
+    def cerrar(self):
+        os.close(self._lectura)
+        os.close(self._escritura)
+
+def leer_orden(datos):
+    """(orden, argumento) de una línea "orden\targumento"; ValueError si no es válida"""
+    orden, _, argumento = datos.decode("utf-8").rstrip("\n").partition("\t")
+    if orden not in ORDENES:
+        raise ValueError(f"orden desconocida: {orden or '(vacía)'}")
+    return orden, argumento
+
+class ServidorDifusion:
+    """
+    Acepta clientes en `ruta` y les reenvía cada línea publicada. `bucle` se
+    ejecuta en un hilo y recibe la función publicar(linea).
+    Con `comandos` escucha además en ruta_comandos(ruta) y encola las órdenes
+    en self.comandos (una ColaComandos) para que las atienda `bucle`.
+    """
+
+    def __init__(self, ruta, espera_final=ESPERA_ULTIMO_CLIENTE, comandos=False):
+        self.ruta = Path(ruta)
+        self.espera_final = espera_final
+        self.clientes = set()
+        self.ultima = None
+        self._cerrojo = threading.Lock()
+        self.comandos = ColaComandos() if comandos else None
+
+    def publicar(self, linea):
+        """Enviar una línea (sin salto final) a todos los clientes"""
+        datos = (linea + "\n").encode("utf-8")
+        with self._cerrojo:
+            self.ultima = datos
+            for cliente in list(self.clientes):
+                self._enviar(cliente, datos)
+
+    def _enviar(self, cliente, datos):
+        try:
+            cliente.sendall(datos)
+        except OSError:
+            # El hilo principal ve el EOF y lo da de baja
+            try:
+                cliente.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def servir(self, bucle):
+        """Bucle principal; vuelve cuando no quedan clientes (o si ya hay otro servidor)"""
+        candado = self._abrir_candado()
+        if candado is None:
+            # Otro servidor ya atiende este socket
+            if self.comandos is not None:
+                self.comandos.cerrar()
+            return
+        try:
+            try:
+                self.ruta.unlink()
+            except FileNotFoundError:
+                pass
+            escucha = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            ordenes = None
+            try:
+                if self.comandos is not None:
+                    ordenes = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    try:
+                        ruta_comandos(self.ruta).unlink()
+                    except FileNotFoundError:
+                        pass
+                    ordenes.bind(str(ruta_comandos(self.ruta)))
+                    ordenes.listen(16)
+                escucha.bind(str(self.ruta))
+                escucha.listen(16)
+                self._atender(escucha, bucle, ordenes)
+            finally:
+                # Quitar los sockets antes de soltar el flock: un cliente nuevo
+                # arrancará otro servidor en lugar de conectar a uno muerto
+                for ruta in (self.ruta, ruta_comandos(self.ruta)):
+                    try:
+                        ruta.unlink()
+                    except FileNotFoundError:
+                        pass
+                escucha.close()
+                if ordenes is not None:
+                    ordenes.close()
+                for cliente in self.clientes:
+                    cliente.close()
+        finally:
+            # Borrar el candado con el flock aún tomado (_abrir_candado
+            # descarta el archivo si otro lo abrió antes de este unlink)
+            try:
+                os.unlink(candado.name)
+            except FileNotFoundError:
+                pass
+            candado.close()
+            if self.comandos is not None:
+                self.comandos.cerrar()
+
+    def _abrir_candado(self):
+        """
+        Abrir y bloquear "<socket>.lock", o None si otro servidor lo tiene.
+        Como el servidor que sale borra el archivo, tras el flock se comprueba
+        que la ruta sigue siendo el archivo bloqueado; si no, se reabre.
+        """
+        ruta = f"{self.ruta}.lock"
+        while True:
+            candado = open(ruta, "w")
+            if not self._tomar_candado(candado):
+                candado.close()
+                return None
+            try:
+                if os.stat(ruta).st_ino == os.fstat(candado.fileno()).st_ino:
+                    return candado
+            except FileNotFoundError:
+                pass
+            candado.close()
+
+    def _tomar_candado(self, candado):
+        """
+        flock exclusivo del socket. Si lo tiene otro servidor vivo, False; si
+        el otro está saliendo (ya no acepta conexiones), esperar a que lo suelte.
+        """
+        limite = time.monotonic() + ESPERA_ARRANQUE
+        while True:
+            try:
+                fcntl.flock(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                pass
+            if servidor_vivo(self.ruta) or time.monotonic() >= limite:
+                return False
+            time.sleep(0.05)
+
+    def _atender(self, escucha, bucle, ordenes=None):
+        hilo = threading.Thread(target=bucle, args=(self.publicar,), daemon=True)
+        hilo.start()
+
+        selector = selectors.DefaultSelector()
+        selector.register(escucha, selectors.EVENT_READ)
+        if ordenes is not None:
+            selector.register(ordenes, selectors.EVENT_READ)
+        # Órdenes a medio recibir: socket -> bytes leídos
+        parciales = {}
+        sin_clientes_desde = time.monotonic()
+
+        while hilo.is_alive():
+            for clave, _ in selector.select(timeout=0.25):
+                if clave.fileobj is ordenes:
+                    cliente, _ = ordenes.accept()
+                    cliente.settimeout(TIMEOUT_ENVIO)
+                    parciales[cliente] = b""
+                    selector.register(cliente, selectors.EVENT_READ)
+                elif clave.fileobj in parciales:
+                    self._recibir_orden(selector, parciales, clave.fileobj)
+                elif clave.fileobj is escucha:
+                    cliente, _ = escucha.accept()
+                    cliente.settimeout(TIMEOUT_ENVIO)
+                    with self._cerrojo:
+                        self.clientes.add(cliente)
+                        if self.ultima is not None:
+                            self._enviar(cliente, self.ultima)
+                    selector.register(cliente, selectors.EVENT_READ)
+                else:
+                    cliente = clave.fileobj
+                    try:
+                        datos = cliente.recv(4096)
+                    except OSError:
+                        datos = b""
+                    if not datos:
+                        # El cliente se fue
+                        selector.unregister(cliente)
+                        with self._cerrojo:
+                            self.clientes.discard(cliente)
+                        cliente.close()
+
+            if self.clientes:
+                sin_clientes_desde = None
+            elif sin_clientes_desde is None:
+                sin_clientes_desde = time.monotonic()
+            elif time.monotonic() - sin_clientes_desde >= self.espera_final:
+                break
+        selector.close()
+
+    def _recibir_orden(self, selector, parciales, cliente):
+        """Acumular la orden hasta el salto de línea y encolarla"""
+        try:
+            datos = cliente.recv(4096)
+        except OSError:
+            datos = b""
+        parciales[cliente] += datos
+        completa = parciales[cliente].endswith(b"\n") or not datos
+        if not completa and len(parciales[cliente]) < MAX_BYTES_COMANDO:
+            return
+
+        selector.unregister(cliente)
+        linea = parciales.pop(cliente)
+
+        def responder(ok, detalle=""):
+            # Se llama desde el hilo del bucle; el socket ya no está en el selector
+            respuesta = f"{'ok' if ok else 'error'}\t{detalle}\n"
+            try:
+                cliente.sendall(respuesta.encode("utf-8"))
+            except OSError:
+                pass
+            cliente.close()
+
+        try:
+            orden, argumento = leer_orden(linea)
+        except (ValueError, UnicodeDecodeError) as e:
+            responder(False, str(e))
+            return
+        self.comandos.poner(orden, argumento, responder)
+
+def servidor_vivo(ruta):
+    """¿Hay un servidor aceptando conexiones en `ruta`?"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as prueba:
+        try:
+            prueba.connect(str(ruta))
+            return True
+        except OSError:
+            return False
+
+def ruta_registro(ruta):
+    """Log del servidor de `ruta` ("backend-<h>.log" junto al socket)"""
+    return Path(ruta).with_suffix(".log")
+
+def arrancar_servidor(comando, registro=None):
+    """
+    Lanzar el servidor desacoplado de la barra (sin heredar su stdout). Su
+    stderr (errores y --stats) va a `registro`, porque el de la barra que lo
+    arranca no sirve para las demás ni sobrevive a que esa barra se cierre.
+    """
+    # subprocess solo hace falta para arrancar: todolistctl importa este
+    # módulo para encontrar los sockets
+    import subprocess
+
+    destino = subprocess.DEVNULL
+    if registro is not None:
+        try:
+            # En modo "a": si dos clientes lo arrancan a la vez, el que pierde
+            # el candado no debe vaciar el log del que ya está sirviendo
+            destino = open(registro, "a", encoding="utf-8")
+        except OSError:
+            pass
+    try:
+        subprocess.Popen(
+            comando, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=destino, start_new_session=True
+        )
+    finally:
+        if destino is not subprocess.DEVNULL:
+            destino.close()
+
+def conectar(ruta, comando):
+    """Conectar al servidor de `ruta`, arrancándolo con `comando` si no está"""
+    limite = time.monotonic() + ESPERA_ARRANQUE
+    arrancado = False
+    espera = 0.01
+    while True:
+        cliente = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            cliente.connect(str(ruta))
+            return cliente
+        except (FileNotFoundError, ConnectionRefusedError):
+            cliente.close()
+        if not arrancado:
+            arrancar_servidor(comando, ruta_registro(ruta))
+            arrancado = True
+        if time.monotonic() >= limite:
+            raise ServidorNoDisponible(f"No se pudo arrancar el servidor en {ruta}")
+        time.sleep(espera)
+        espera = min(espera * 2, 0.2)
+
+def seguir_cliente(ruta, comando, salida=None):
+    """
+    Copiar a `salida` (stdout) las líneas que publica el servidor, sin
+    repetir la última. Si el servidor termina, volver a arrancarlo y
+    reconectar. Lanza ServidorNoDisponible si no se puede arrancar.
+    """
+    if salida is None:
+        salida = sys.stdout
+    ultima = None
+    while True:
+        cliente = conectar(ruta, comando)
+        try:
+            with cliente.makefile("r", encoding="utf-8") as lector:
+                for linea in lector:
+                    if linea != ultima:
+                        salida.write(linea)
+                        salida.flush()
+                        ultima = linea
+        finally:
+            cliente.close()
+        # El servidor se fue (p. ej. salía justo cuando conectamos): reintentar
+        time.sleep(0.05)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Vigilancia de archivos para los modos de larga duración del todolist
+=====================================================================
+
+Observa el markdown activo, config.txt y el historial con inotify (vía ctypes,
+sin dependencias externas). Se vigilan los directorios padre en lugar de los
+archivos, así que también se detecta el patrón "escribir temporal + renombrar"
+que usan VS Code y vim. Las ráfagas de eventos se agrupan (debounce) y solo se
+informan rutas cuya firma (inode, tamaño, mtime) cambió de verdad.
+
+Si inotify no está disponible se recurre a un sondeo por lotes con stat().
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+MASCARA_DIRECTORIO = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+_CABECERA_EVENTO = struct.Struct("iIII")
+
+# Tiempo de calma que cierra una ráfaga y espera máxima antes de informar igualmente
+DEBOUNCE = 0.15
+ESPERA_MAXIMA_RAFAGA = 1.0
+INTERVALO_POLLING = 1.0
+
+def firma_archivo(ruta):
+    """Identificar el estado de un archivo sin leerlo (inode, tamaño, mtime)"""
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def _cargar_libc():
+    """Devolver libc con las funciones de inotify, o None si no existen"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+class VigilanteArchivos:
+    """
+    Esperar cambios reales en un conjunto de archivos.
+
+    Uso típico en un bucle de larga duración:
+
+        vigilante = VigilanteArchivos([archivo, config_file])
+        while True:
+            cambios = vigilante.esperar()
+            ...
+    """
+
+    def __init__(self, rutas, debounce=DEBOUNCE, intervalo_polling=INTERVALO_POLLING,
+                 usar_inotify=True):
+        self.debounce = debounce
+        self.intervalo_polling = intervalo_polling
+        self.rutas = set()
+        self.firmas = {}
+        self._fd = None
+        self._libc = None
+        self._watches = {}       # wd -> directorio
+        self._directorios = {}   # directorio -> wd
+        self._sin_watch = set()  # rutas cuyo directorio no se pudo vigilar
+
+        if usar_inotify:
+            self._iniciar_inotify()
+
+        self.actualizar_rutas(rutas)
+
+    @property
+    def usa_inotify(self):
+        return self._fd is not None
+
+    def fileno(self):
+        """Descriptor de inotify (para select) o None en modo sondeo"""
+        return self._fd
+
+    def _iniciar_inotify(self):
+        libc = _cargar_libc()
+        if libc is None:
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        self._libc = libc
+        self._fd = fd
+
+    def _vigilar_directorio(self, directorio):
+        if directorio in self._directorios:
+            return True
+        if self._fd is None:
+            return False
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directorio), MASCARA_DIRECTORIO)
+        if wd < 0:
+            return False
+        self._watches[wd] = directorio
+        self._directorios[directorio] = wd
+        return True
+
+    def actualizar_rutas(self, rutas):
+        """Cambiar el conjunto de archivos vigilados (p. ej. tras editar config.txt)"""
+        self.rutas = {Path(r) for r in rutas}
+        self.firmas = {ruta: firma_archivo(ruta) for ruta in self.rutas}
+
+        necesarios = {str(ruta.parent) for ruta in self.rutas}
+        for directorio in list(self._directorios):
+            if directorio not in necesarios:
+                self._libc.inotify_rm_watch(self._fd, self._directorios.pop(directorio))
+                self._watches = {wd: d for wd, d in self._watches.items() if d != directorio}
+
+        self._sin_watch = {
+            ruta for ruta in self.rutas if not self._vigilar_directorio(str(ruta.parent))
+        }
+
+    def _leer_eventos(self):
+        """Vaciar la cola de inotify y devolver las rutas vigiladas afectadas"""
+        afectadas = set()
+        while True:
+            try:
+                datos = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not datos:
+                break
+
+            pos = 0
+            while pos + _CABECERA_EVENTO.size <= len(datos):
+                wd, mascara, _cookie, longitud = _CABECERA_EVENTO.unpack_from(datos, pos)
+                pos += _CABECERA_EVENTO.size
+                nombre = datos[pos:pos + longitud].rstrip(b"\0")
+                pos += longitud
+
+                if mascara & IN_Q_OVERFLOW:
+                    # Se perdieron eventos: revisar todo
+                    afectadas.update(self.rutas)
+                    continue
+
+                directorio = self._watches.get(wd)
+                if directorio is None:
+                    continue
+
+                if mascara & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    # El directorio desapareció o se movió: pasar sus rutas a sondeo
+                    self._watches.pop(wd, None)
+                    self._directorios.pop(directorio, None)
+                    for ruta in self.rutas:
+                        if str(ruta.parent) == directorio:
+                            self._sin_watch.add(ruta)
+                            afectadas.add(ruta)
+                    continue
+
+                ruta = Path(directorio) / os.fsdecode(nombre)
+                if ruta in self.rutas:
+                    afectadas.add(ruta)
+        return afectadas
+
+    def _sondear(self, rutas):
+        """Comparar firmas de un lote de rutas con stat()"""
+        return {ruta for ruta in rutas if firma_archivo(ruta) != self.firmas.get(ruta)}
+
+    def _confirmar(self, candidatas):
+        """Quedarse solo con las rutas cuya firma cambió y actualizar el registro"""
+        cambiadas = set()
+        for ruta in candidatas:
+            firma = firma_archivo(ruta)
+            if firma != self.firmas.get(ruta):
+                self.firmas[ruta] = firma
+                cambiadas.add(ruta)
+        return cambiadas
+
+    def esperar(self, timeout=None, despertador=None):
+        """
+        Bloquear hasta que alguno de los archivos cambie de verdad.
+        Devuelve el conjunto de rutas cambiadas (vacío si vence el timeout).
+        `despertador` es cualquier objeto con fileno(): en cuanto es legible se
+        vuelve enseguida (sin esperar a la ráfaga) con lo que haya cambiado hasta
+        ese momento, que puede ser nada. Quien lo pasa es quien lo vacía.
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        extra = [despertador] if despertador is not None else []
+
+        while True:
+            restante = None if limite is None else max(0.0, limite - time.monotonic())
+            espera = restante
+            if self._fd is None or self._sin_watch:
+                espera = self.intervalo_polling if restante is None else min(restante, self.intervalo_polling)
+
+            candidatas = set()
+            despierto = False
+            if self._fd is not None:
+                listos, _, _ = select.select([self._fd, *extra], [], [], espera)
+                despierto = bool(extra) and despertador in listos
+                if self._fd in listos and not despierto:
+                    candidatas = self._leer_eventos()
+                    # Debounce: absorber el resto de la ráfaga del editor
+                    fin_rafaga = time.monotonic() + ESPERA_MAXIMA_RAFAGA
+                    while time.monotonic() < fin_rafaga:
+                        listos, _, _ = select.select([self._fd, *extra], [], [], self.debounce)
+                        if not listos:
+                            break
+                        if extra and despertador in listos:
+                            despierto = True
+                            break
+                        candidatas |= self._leer_eventos()
+            elif extra:
+                despierto = bool(select.select(extra, [], [], espera)[0])
+            else:
+                time.sleep(espera)
+
+            if self._sin_watch:
+                candidatas |= self._sondear(self._sin_watch)
+                # Reintentar vigilar directorios que hayan vuelto a existir
+                for ruta in list(self._sin_watch):
+                    if self._vigilar_directorio(str(ruta.parent)):
+                        self._sin_watch.discard(ruta)
+
+            cambiadas = self._confirmar(candidatas)
+            if cambiadas or despierto:
+                return cambiadas
+            if limite is not None and time.monotonic() >= limite:
+                return set()
+
+    def cerrar(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._watches.clear()
+            self._directorios.clear()
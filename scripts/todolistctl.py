@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cliente mínimo del socket de comandos
+=====================================
+
+Envía una orden al servidor residente (current.py --servidor), que ya tiene
+el árbol de tareas en memoria, la ejecuta, publica el JSON nuevo a las barras
+y responde. Este script solo importa os, socket, sys y todolist_runtime
+(que solo importa os) para encontrar los sockets en el mismo directorio que
+el servidor. Un clic de waybar no paga el arranque completo del módulo ni
+vuelve a leer config.txt ni a parsear el markdown.
+
+Uso:
+    todolistctl.py mark <id|texto>     # Marcar una tarea (y propagar a sus padres)
+    todolistctl.py unmark <id|texto>   # Desmarcarla (y a sus padres marcados)
+    todolistctl.py next                # Marcar la tarea que muestra la barra
+    todolistctl.py reload              # Releer config.txt y los markdown
+    todolistctl.py switch-file <ruta>  # Cambiar el archivo de tareas activo
+
+Si no hay ningún servidor (p. ej. waybar sin --follow), arranca uno con las
+opciones por defecto; ese camino sí importa el resto del módulo.
+"""
+
+import os
+import socket
+import sys
+
+from todolist_runtime import directorio_runtime
+
+ORDENES = {"mark": True, "unmark": True, "next": False, "reload": False, "switch-file": True}
+
+# Segundos máximos de espera a la respuesta del servidor
+TIMEOUT_RESPUESTA = 10.0
+
+def sockets_comandos():
+    """Sockets de comandos del usuario, el más reciente primero"""
+    try:
+        # Mismo directorio que el servidor (respeta XDG_RUNTIME_DIR y TMPDIR)
+        directorio = directorio_runtime()
+        nombres = [n for n in os.listdir(directorio) if n.startswith("comandos-")]
+    except OSError:
+        return []
+    rutas = [os.path.join(directorio, n) for n in nombres]
+
+    def antiguedad(ruta):
+        try:
+            return -os.stat(ruta).st_mtime_ns
+        except OSError:
+            return 0
+    return sorted(rutas, key=antiguedad)
+
+def enviar(cliente, linea):
+    """Enviar la orden por un socket ya conectado y leer la respuesta completa"""
+    cliente.settimeout(TIMEOUT_RESPUESTA)
+    cliente.sendall(linea.encode("utf-8"))
+    partes = []
+    while True:
+        datos = cliente.recv(4096)
+        if not datos:
+            break
+        partes.append(datos)
+    return b"".join(partes).decode("utf-8")
+
+def conectar_a_alguno():
+    """Socket conectado al primer servidor que responda, o None"""
+    for ruta in sockets_comandos():
+        cliente = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            cliente.connect(ruta)
+            return cliente
+        except OSError:
+            cliente.close()
+    return None
+
+def arrancar_y_conectar():
+    """Sin servidor: arrancar el de opciones por defecto y conectar a sus comandos"""
+    from todolist_core import comando_propio
+    from todolist_servidor import conectar, ruta_comandos, ruta_socket
+
+    # current.py junto a este programa: el lanzador si se instaló con install.py
+    current = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "current.py")
+    comando = comando_propio("--servidor", script=current)
+    return conectar(ruta_comandos(ruta_socket([])), comando)
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ORDENES:
+        print(__doc__.split("Uso:")[1].split("\n\n")[0].rstrip(), file=sys.stderr)
+        sys.exit(2)
+    orden = sys.argv[1]
+    argumento = " ".join(sys.argv[2:])
+    if ORDENES[orden] and not argumento:
+        print(f"{orden} necesita un argumento.", file=sys.stderr)
+        sys.exit(2)
+    if orden == "switch-file":
+        # El servidor no comparte nuestro directorio de trabajo
+        argumento = os.path.abspath(os.path.expanduser(argumento))
+    if "\n" in argumento:
+        print("El argumento no puede contener saltos de línea.", file=sys.stderr)
+        sys.exit(2)
+
+    cliente = conectar_a_alguno()
+    try:
+        if cliente is None:
+            cliente = arrancar_y_conectar()
+        with cliente:
+            respuesta = enviar(cliente, f"{orden}\t{argumento}\n")
+    except Exception as e:
+        print(f"No se pudo hablar con el servidor: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    estado, _, detalle = respuesta.rstrip("\n").partition("\t")
+    if estado != "ok":
+        print(detalle or "El servidor cerró la conexión sin responder.", file=sys.stderr)
+        sys.exit(1)
+    if detalle:
+        print(detalle)
+
+if __name__ == "__main__":
+    main()
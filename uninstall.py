@@ -22,6 +22,7 @@ class HyDETodolistUninstaller:
         self.home = Path.home()
         self.config_waybar = self.home / ".config" / "waybar"
         self.local_bin = self.home / ".local" / "bin"
+        self.local_lib = self.home / ".local" / "lib" / "todolist"
         self.modules_dir = self.config_waybar / "modules"
         self.layouts_dir = self.config_waybar / "layouts"
         self.includes_file = self.config_waybar / "includes" / "includes.json"
@@ -29,10 +30,28 @@ class HyDETodolistUninstaller:
         # Layout específico del usuario
         self.user_layout = self.layouts_dir / f"{self.user}.jsonc"
         
-        # Archivos a eliminar
-        self.files_to_remove = [
+        # Lanzadores de ~/.local/bin/ (y módulos sueltos de instalaciones anteriores)
+        self.installed_scripts = [
             self.local_bin / "current.py",
             self.local_bin / "choose_and_check.py",
+            self.local_bin / "todolist_core.py",
+            self.local_bin / "todolist_cache.py",
+            self.local_bin / "todolist_incremental.py",
+            self.local_bin / "todolist_compacto.py",
+            self.local_bin / "todolist_escritura.py",
+            self.local_bin / "todolist_render.py",
+            self.local_bin / "todolist_indice.py",
+            self.local_bin / "todolist_frecencia.py",
+            self.local_bin / "todolist_agregado.py",
+            self.local_bin / "todolist_servidor.py",
+            self.local_bin / "todolist_runtime.py",
+            self.local_bin / "todolistctl.py",
+            self.local_bin / "todolist_lote.py",
+            self.local_bin / "todolist_watcher.py",
+        ]
+        
+        # Archivos a eliminar
+        self.files_to_remove = self.installed_scripts + [
             self.modules_dir / "custom-todolist.jsonc",
         ]
         
@@ -50,6 +69,9 @@ class HyDETodolistUninstaller:
             if file_path.exists():
                 print(f"   🗑️  {file_path}")
         
+        if self.local_lib.exists():
+            print(f"   🗑️  {self.local_lib}/ (lógica precompilada)")
+        
         if self.data_dir.exists():
             print(f"   📁 {self.data_dir} (OPCIONAL - contiene tus tareas)")
         
@@ -65,12 +87,17 @@ class HyDETodolistUninstaller:
         print("🗑️  Eliminando scripts...")
         
         removed = []
-        for script_path in [self.local_bin / "current.py", self.local_bin / "choose_and_check.py"]:
+        for script_path in self.installed_scripts:
             if script_path.exists():
                 script_path.unlink()
                 removed.append(script_path.name)
                 print(f"   ✅ Eliminado: {script_path}")
         
+        if self.local_lib.exists():
+            shutil.rmtree(self.local_lib)
+            removed.append(self.local_lib.name)
+            print(f"   ✅ Eliminado: {self.local_lib}")
+        
         if not removed:
             print("   ℹ️  No se encontraron scripts para eliminar")
 